@@ -1,9 +1,223 @@
-import simpleaudio as sa
+import json
+import time
+import queue
 import threading
+import urllib.request
+from stats import TimingStats, LATENCY_BUCKETS
+
+def merge_notifications(a, b):
+    return {
+        "cameras": sorted(set(a["cameras"]) | set(b["cameras"])),
+        "alarms": a["alarms"] + b["alarms"],
+        "first": min(a["first"], b["first"]),
+        "last": max(a["last"], b["last"]),
+    }
+
+class SoundSink:
+    # Local alarm sound; a sound still playing is not started again on top,
+    # and send() returns False so the notification counts as skipped
+    def __init__(self, settings, sound_file=None):
+        import simpleaudio as sa
+        self.wave = sa.WaveObject.from_wave_file(settings.get("file", sound_file))
+        self.playing = None
+
+    def send(self, notification):
+        if self.playing is not None and self.playing.is_playing():
+            return False
+        self.playing = self.wave.play()
+
+class WebhookSink:
+    # POSTs the notification as JSON
+    def __init__(self, settings, sound_file=None):
+        self.url = settings["url"]
+        self.timeout = settings.get("timeout", 5)
+        self.headers = {"Content-Type": "application/json", **settings.get("headers", {})}
+
+    def send(self, notification):
+        body = json.dumps(notification).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+class MqttSink:
+    # Publishes the notification as JSON (needs paho-mqtt)
+    def __init__(self, settings, sound_file=None):
+        import paho.mqtt.publish as publish
+        self.publish = publish
+        self.host = settings.get("host", "127.0.0.1")
+        self.port = settings.get("port", 1883)
+        self.topic = settings.get("topic", "ssa/alarm")
+        self.qos = settings.get("qos", 1)
+
+    def send(self, notification):
+        self.publish.single(self.topic, json.dumps(notification), qos=self.qos, hostname=self.host, port=self.port)
+
+SINKS = {"sound": SoundSink, "webhook": WebhookSink, "mqtt": MqttSink}
+
+class SinkWorker(threading.Thread):
+    # Delivers to one sink on its own thread, at most once per min_interval.
+    # Only one notification waits at a time: anything arriving while the sink
+    # is busy or rate-limited is merged into it, so a slow sink delays only
+    # itself and never queues up. A sink whose send() returns False let the
+    # notification go on purpose (a sound already playing): it counts as
+    # skipped, not delivered.
+    def __init__(self, name, sink, logger, min_interval=0):
+        super().__init__(name=f"alarm-sink-{name}", daemon=True)
+        self.sink_name = name
+        self.sink = sink
+        self.logger = logger
+        self.min_interval = min_interval
+        self.cond = threading.Condition()
+        self.pending = None
+        self.closed = False
+        self.last_delivery = 0
+        self.delivered = 0
+        self.failed = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.latency = TimingStats(buckets=LATENCY_BUCKETS)
+
+    def submit(self, notification):
+        with self.cond:
+            if self.pending is None:
+                self.pending = notification
+            else:
+                self.pending = merge_notifications(self.pending, notification)
+                self.coalesced += 1
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.pending is None:
+                        if self.closed:
+                            return
+                        self.cond.wait()
+                        continue
+                    wait = self.last_delivery + self.min_interval - time.time()
+                    if wait <= 0 or self.closed:
+                        break
+                    self.cond.wait(wait)
+                notification, self.pending = self.pending, None
+            try:
+                if self.sink.send(notification) is False:
+                    self.skipped += 1
+                else:
+                    self.delivered += 1
+                    # From the first alarm in the notification to its delivery
+                    self.latency.add(time.time() - notification["first"])
+            except Exception as e:
+                self.failed += 1
+                self.logger.warning(f"Alarm sink {self.sink_name} failed: {e}")
+            self.last_delivery = time.time()
 
 class AlarmManager:
-    def __init__(self, sound_file):
-        self.sound = sa.WaveObject.from_wave_file(sound_file)
-    
-    def play_alarm(self):
-        threading.Thread(target=self.sound.play).start()
+    # One dispatcher thread for all cameras. play_alarm() only puts the event
+    # on a bounded queue (dropping it when full), so camera threads never wait.
+    # Alarms raised within coalesce_window seconds of the first one, from any
+    # camera, become one notification, which every sink gets on its own thread.
+    # Without sinks (no sound file, benchmarks) alarms are only counted.
+    def __init__(self, sound_file=None, settings=None, logger=None):
+        settings = settings or {}
+        self.logger = logger
+        self.coalesce_window = settings.get("coalesce_window", 0.5)
+        self.events = queue.Queue(maxsize=settings.get("queue_size", 64))
+        self.alarms = 0
+        self.dropped = 0
+        self.notifications = 0
+        self.workers = []
+        sinks = settings.get("sinks", [{"type": "sound"}])
+        for i, sink_cfg in enumerate(sinks):
+            kind = sink_cfg.get("type", "sound")
+            if kind == "sound" and not sink_cfg.get("file", sound_file):
+                continue
+            sink = SINKS[kind](sink_cfg, sound_file)
+            name = sink_cfg.get("name", kind)
+            if any(worker.sink_name == name for worker in self.workers):
+                name = f"{name}{i}"
+            self.workers.append(SinkWorker(name, sink, logger, sink_cfg.get("min_interval", 0)))
+        self.thread = threading.Thread(target=self._dispatch_loop, name="alarm-dispatcher", daemon=True)
+
+    def start(self):
+        if not self.workers:
+            return
+        for worker in self.workers:
+            worker.start()
+        self.thread.start()
+
+    def play_alarm(self, camera_id=None):
+        self.alarms += 1
+        if not self.workers:
+            return
+        try:
+            self.events.put_nowait((camera_id, time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _dispatch_loop(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            camera_id, ts = event
+            notification = {"cameras": [camera_id] if camera_id else [], "alarms": 1, "first": ts, "last": ts}
+            deadline = ts + self.coalesce_window
+            stop = False
+            while True:
+                try:
+                    event = self.events.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stop = True
+                    break
+                camera_id, ts = event
+                notification = merge_notifications(
+                    notification, {"cameras": [camera_id] if camera_id else [], "alarms": 1, "first": ts, "last": ts})
+            self.notifications += 1
+            for worker in self.workers:
+                worker.submit(notification)
+            if stop:
+                break
+
+    def close(self):
+        # Flushes queued alarms to the sinks before returning
+        if not self.thread.is_alive():
+            return
+        self.events.put(None)
+        self.thread.join()
+        for worker in self.workers:
+            worker.close()
+        for worker in self.workers:
+            worker.join(timeout=10)
+        if self.logger is not None:
+            self.log_stats()
+
+    def log_stats(self):
+        sinks = ", ".join(f"{w.sink_name} delivered={w.delivered} failed={w.failed} skipped={w.skipped} merged={w.coalesced} "
+                          f"latency {w.latency.summary()}" for w in self.workers)
+        self.logger.info(f"Alarms: {self.alarms} raised, {self.notifications} notifications, "
+                         f"dropped={self.dropped}; {sinks}")
+
+    def collect_metrics(self, writer):
+        writer.counter("ssa_alarm_events_dropped_total", "Alarms dropped because the dispatcher queue was full",
+                       self.dropped)
+        writer.counter("ssa_alarm_notifications_total", "Notifications after coalescing alarms",
+                       self.notifications)
+        for w in self.workers:
+            writer.counter("ssa_alarm_deliveries_total", "Notifications handed to a sink", w.delivered,
+                           sink=w.sink_name, result="delivered")
+            writer.counter("ssa_alarm_deliveries_total", "Notifications handed to a sink", w.failed,
+                           sink=w.sink_name, result="failed")
+            writer.counter("ssa_alarm_deliveries_total", "Notifications handed to a sink", w.skipped,
+                           sink=w.sink_name, result="skipped")
+            writer.counter("ssa_alarm_merged_total", "Notifications merged while a sink was busy or rate-limited",
+                           w.coalesced, sink=w.sink_name)
+            writer.histogram("ssa_alarm_delivery_latency_seconds", "Time from the first alarm to delivery",
+                             w.latency, sink=w.sink_name)
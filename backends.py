@@ -0,0 +1,212 @@
+import os
+import glob
+import shutil
+import threading
+import cv2
+import numpy as np
+
+PERSON = 0
+NMS_IOU = 0.45
+
+def exported_path(model_path, backend, imgsz, int8=False):
+    # Exports are cached next to the .pt file, one per input size and precision
+    base = f"{os.path.splitext(model_path)[0]}_{imgsz}{'_int8' if int8 else ''}"
+    return f"{base}.onnx" if backend == "onnxruntime" else f"{base}_openvino_model"
+
+def is_fresh(path, source):
+    return os.path.exists(path) and (not os.path.exists(source) or os.path.getmtime(path) >= os.path.getmtime(source))
+
+def export_model(model_path, backend, imgsz=640, int8=False):
+    # One-time export of a YOLO .pt model for onnxruntime/openvino. Files that
+    # are already in the target format are used as they are.
+    if model_path.endswith(".onnx") or model_path.endswith(".xml") or os.path.isdir(model_path):
+        return model_path
+    target = exported_path(model_path, backend, imgsz, int8)
+    if is_fresh(target, model_path):
+        return target
+
+    from ultralytics import YOLO
+    if backend == "onnxruntime":
+        fp32 = exported_path(model_path, backend, imgsz)
+        if not is_fresh(fp32, model_path):
+            os.replace(YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True), fp32)
+        if int8:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32, target, weight_type=QuantType.QUInt8)
+        return target
+
+    # OpenVINO INT8 is post-training quantization calibrated by ultralytics
+    produced = YOLO(model_path).export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(produced, target)
+    return target
+
+def letterbox_blob(frames, size):
+    # Single pass from the source resolution to the model input: one resize per
+    # frame into a padded size x size canvas, then one blobFromImages call for
+    # BGR->RGB, 1/255 scaling and HWC->NCHW. Returns the blob and, per frame,
+    # the (scale, pad_x, pad_y) needed to map boxes back.
+    canvases = []
+    transforms = []
+    for frame in frames:
+        h, w = frame.shape[:2]
+        scale = min(size / h, size / w)
+        nw, nh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+        canvas = np.full((size, size, 3), 114, np.uint8)
+        canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        canvases.append(canvas)
+        transforms.append((scale, pad_x, pad_y))
+    return cv2.dnn.blobFromImages(canvases, 1 / 255.0, swapRB=True), transforms
+
+def person_boxes(output, transform, frame_shape, confidence):
+    # output is one (4 + classes, anchors) YOLOv8 head: cx, cy, w, h, class scores
+    person = output[4 + PERSON]
+    candidates = output[:, person >= confidence]
+    if not candidates.shape[1]:
+        return []
+    # Keep boxes whose best class is a person, as ultralytics would label them
+    candidates = candidates[:, candidates[4:].argmax(0) == PERSON]
+    if not candidates.shape[1]:
+        return []
+
+    scale, pad_x, pad_y = transform
+    cx, cy, w, h = candidates[:4]
+    x1 = (cx - w / 2 - pad_x) / scale
+    y1 = (cy - h / 2 - pad_y) / scale
+    bw, bh = w / scale, h / scale
+    scores = candidates[4 + PERSON]
+    rects = np.stack([x1, y1, bw, bh], axis=1).tolist()
+    keep = cv2.dnn.NMSBoxes(rects, scores.tolist(), confidence, NMS_IOU)
+
+    height, width = frame_shape[:2]
+    humans = []
+    for i in np.array(keep).flatten():
+        x, y, bw_i, bh_i = rects[i]
+        humans.append((
+            int(min(max(x, 0), width)), int(min(max(y, 0), height)),
+            int(min(max(x + bw_i, 0), width)), int(min(max(y + bh_i, 0), height)),
+            float(scores[i]),
+        ))
+    return humans
+
+class UltralyticsBackend:
+    # PyTorch through ultralytics; it letterboxes internally
+    resizes_input = False
+
+    def __init__(self, model_path, imgsz=640, int8=False, threads=0):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def predict(self, frames, confidence):
+        results = self.model.predict(frames, conf=confidence, imgsz=self.imgsz, verbose=False)
+        return [self._humans(result, confidence) for result in results]
+
+    def _humans(self, result, confidence):
+        humans = []
+        for box in result.boxes:
+            cls = int(box.cls[0])
+            conf = float(box.conf[0])
+            if cls == PERSON and conf >= confidence:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                humans.append((x1, y1, x2, y2, conf))
+        return humans
+
+class ExportedBackend:
+    # Runtimes fed with our own letterboxed blob, straight from the full frame
+    resizes_input = True
+
+    def __init__(self, imgsz, fixed_batch):
+        self.imgsz = imgsz
+        self.fixed_batch = fixed_batch
+
+    def predict(self, frames, confidence):
+        if self.fixed_batch:
+            # Models exported without a dynamic batch axis take one frame at a time
+            return [humans for frame in frames for humans in self._predict([frame], confidence)]
+        return self._predict(frames, confidence)
+
+    def _predict(self, frames, confidence):
+        blob, transforms = letterbox_blob(frames, self.imgsz)
+        outputs = self.run(blob)
+        return [person_boxes(outputs[i], transforms[i], frame.shape, confidence) for i, frame in enumerate(frames)]
+
+class OnnxRuntimeBackend(ExportedBackend):
+    def __init__(self, model_path, imgsz=640, int8=False, threads=0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(export_model(model_path, "onnxruntime", imgsz, int8), options,
+                                            providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        super().__init__(imgsz, fixed_batch=isinstance(model_input.shape[0], int))
+
+    def run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoBackend(ExportedBackend):
+    def __init__(self, model_path, imgsz=640, int8=False, threads=0):
+        import openvino as ov
+        path = export_model(model_path, "openvino", imgsz, int8)
+        xml = path if path.endswith(".xml") else glob.glob(os.path.join(path, "*.xml"))[0]
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.model = ov.Core().compile_model(xml, "CPU", config)
+        self.output = self.model.output(0)
+        super().__init__(imgsz, fixed_batch=not self.model.input(0).get_partial_shape()[0].is_dynamic)
+
+    def run(self, blob):
+        return self.model(blob)[self.output]
+
+class HogBackend:
+    # OpenCV's HOG + linear SVM people detector: no model file, cheap enough to
+    # screen every frame. Confidence is the SVM score, not a probability.
+    # Frames wider than imgsz are downscaled first (0 keeps the input size).
+    resizes_input = True
+    win_stride = (4, 4)
+    padding = (8, 8)
+    scale = 1.1
+
+    def __init__(self, model_path=None, imgsz=640, int8=False, threads=0):
+        self.max_width = imgsz
+        self.local = threading.local()
+
+    def _hog(self):
+        # One descriptor per thread; camera threads call in concurrently
+        hog = getattr(self.local, "hog", None)
+        if hog is None:
+            hog = cv2.HOGDescriptor()
+            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            self.local.hog = hog
+        return hog
+
+    def predict(self, frames, confidence):
+        return [self._detect(frame, confidence) for frame in frames]
+
+    def _detect(self, frame, confidence):
+        h, w = frame.shape[:2]
+        scale = 1.0
+        if self.max_width and w > self.max_width:
+            scale = self.max_width / w
+            frame = cv2.resize(frame, (self.max_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        boxes, weights = self._hog().detectMultiScale(frame, winStride=self.win_stride,
+                                                      padding=self.padding, scale=self.scale)
+        humans = []
+        for (x, y, bw, bh), weight in zip(boxes, np.ravel(weights)):
+            if weight >= confidence:
+                humans.append((int(x / scale), int(y / scale), int((x + bw) / scale), int((y + bh) / scale),
+                               float(weight)))
+        return humans
+
+BACKENDS = {
+    "hog": HogBackend,
+    "ultralytics": UltralyticsBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+    "openvino": OpenVinoBackend,
+}
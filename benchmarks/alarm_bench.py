@@ -0,0 +1,113 @@
+# Alarm dispatcher under bursts: several "camera" threads raise alarms at once
+# against a local stub webhook that answers after --sink-ms. Reports how long
+# play_alarm() holds a camera thread, how many notifications the sink got after
+# coalescing, delivery latency and drops.
+#
+#   python benchmarks/alarm_bench.py --cameras 8 --bursts 20 --sink-ms 500
+#   python benchmarks/alarm_bench.py --coalesce 0 --min-interval 2 --output alarm.json
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alarm import AlarmManager
+from stats import TimingStats
+
+class StubWebhook:
+    # Loopback HTTP server that records every POST after a fixed delay
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(stub.delay)
+                stub.received.append((time.time(), json.loads(body)))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/alarm"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Alarm dispatcher burst benchmark against a stub webhook")
+    parser.add_argument("--cameras", type=int, default=8, help="threads raising alarms together")
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between bursts")
+    parser.add_argument("--sink-ms", type=float, default=200, help="webhook response delay")
+    parser.add_argument("--coalesce", type=float, default=0.5, help="coalesce_window")
+    parser.add_argument("--min-interval", type=float, default=0, help="per-sink min_interval")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stub = StubWebhook(args.sink_ms / 1000)
+    alarm = AlarmManager(settings={
+        "queue_size": args.queue_size,
+        "coalesce_window": args.coalesce,
+        "sinks": [{"type": "webhook", "url": stub.url, "min_interval": args.min_interval}],
+    }, logger=logging.getLogger("alarm_bench"))
+    alarm.start()
+
+    call_time = TimingStats(window=args.cameras * args.bursts)
+
+    def camera(camera_id):
+        for _ in range(args.bursts):
+            t0 = time.perf_counter()
+            alarm.play_alarm(camera_id)
+            call_time.add(time.perf_counter() - t0)
+            time.sleep(args.interval)
+
+    t_start = time.time()
+    threads = [threading.Thread(target=camera, args=(f"CAM{i + 1}",)) for i in range(args.cameras)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    alarm.close()
+    elapsed = time.time() - t_start
+    stub.stop()
+
+    sink = alarm.workers[0]
+    result = {
+        "alarms": alarm.alarms,
+        "dropped": alarm.dropped,
+        "notifications": alarm.notifications,
+        "delivered": len(stub.received),
+        "failed": sink.failed,
+        "merged_by_sink": sink.coalesced,
+        "alarms_delivered": sum(body["alarms"] for _, body in stub.received),
+        "play_alarm_p50_us": call_time.percentile(50) * 1e6,
+        "play_alarm_max_us": call_time.percentile(100) * 1e6,
+        "delivery_p50_ms": sink.latency.percentile(50) * 1000,
+        "delivery_p95_ms": sink.latency.percentile(95) * 1000,
+        "seconds": elapsed,
+    }
+    print(f"{result['alarms']} alarms from {args.cameras} cameras -> {result['notifications']} notifications, "
+          f"{result['delivered']} delivered ({result['alarms_delivered']} alarms, {result['merged_by_sink']} merged "
+          f"by the slow sink), dropped={result['dropped']} failed={result['failed']}")
+    print(f"play_alarm p50={result['play_alarm_p50_us']:.1f}us max={result['play_alarm_max_us']:.1f}us  "
+          f"delivery p50={result['delivery_p50_ms']:.0f}ms p95={result['delivery_p95_ms']:.0f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), **result}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# CPU latency and throughput of the detector backends on the same frames.
+# The first run of an onnxruntime/openvino backend includes the one-time export.
+#
+#   python benchmarks/backend_bench.py --backends ultralytics onnxruntime openvino --iterations 200
+#   python benchmarks/backend_bench.py --backends onnxruntime --int8 --video recordings/yard.mp4 --batch 4
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detector import HumanDetector
+from stats import TimingStats
+
+def load_frames(args):
+    if not args.video:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < 32:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames in {args.video}")
+    return frames
+
+def bench(detector, frames, iterations, batch):
+    stats = TimingStats(window=iterations)
+    detections = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        chunk = [frames[(i * batch + j) % len(frames)] for j in range(batch)]
+        t0 = time.perf_counter()
+        results = detector.detect_batch_scored(chunk)
+        stats.add(time.perf_counter() - t0)
+        detections += sum(len(humans) for humans in results)
+    elapsed = time.perf_counter() - start
+    return {
+        "batch": batch,
+        "iterations": iterations,
+        "mean_ms": stats.mean() * 1000,
+        "p50_ms": stats.percentile(50) * 1000,
+        "p95_ms": stats.percentile(95) * 1000,
+        "p99_ms": stats.percentile(99) * 1000,
+        "frames_per_second": iterations * batch / elapsed,
+        "detections": detections,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends on CPU")
+    parser.add_argument("--model", default="models/yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=["ultralytics", "onnxruntime", "openvino"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--video", help="take frames from a recording (default: random 1280x720 frames)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1])
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {w}x{h}, model {args.model} at {args.imgsz}, int8={args.int8}")
+    results = []
+    for backend in args.backends:
+        try:
+            load_start = time.perf_counter()
+            detector = HumanDetector(args.model, args.confidence, backend=backend, imgsz=args.imgsz,
+                                     int8=args.int8 and backend != "ultralytics", threads=args.threads)
+            load_time = time.perf_counter() - load_start
+        except Exception as e:
+            print(f"{backend:<12} unavailable: {e}")
+            results.append({"backend": backend, "error": str(e)})
+            continue
+        bench(detector, frames, args.warmup, 1)
+        for batch in args.batch:
+            result = {"backend": backend, "load_seconds": load_time, **bench(detector, frames, args.iterations, batch)}
+            results.append(result)
+            print(f"{backend:<12} batch={batch:<2} mean={result['mean_ms']:7.2f}ms  p50={result['p50_ms']:7.2f}  "
+                  f"p95={result['p95_ms']:7.2f}  p99={result['p99_ms']:7.2f}  "
+                  f"{result['frames_per_second']:7.1f} frames/s  (load {load_time:.1f}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "imgsz": args.imgsz, "int8": args.int8,
+                       "frame_size": [w, h], "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Evidence crops saved with and without perceptual-hash dedup. Each camera
+# sees a few people who stand still for a while, so alarm after alarm yields
+# nearly the same crop (with sensor noise and a little jitter in the box).
+#
+#   python benchmarks/dedup_bench.py --cameras 4 --alarms 200
+#   python benchmarks/dedup_bench.py --max-distance 10 --people 20
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evidence_writer import EvidenceWriter
+
+def make_people(rng, n):
+    # Person-sized patches with their own texture, on a per-person background
+    people = []
+    for _ in range(n):
+        h = int(rng.integers(160, 320))
+        w = int(h * rng.uniform(0.35, 0.5))
+        base = rng.integers(0, 255, (h // 8 + 1, w // 8 + 1, 3), dtype=np.uint8)
+        people.append(np.kron(base, np.ones((8, 8, 1), np.uint8))[:h, :w])
+    return people
+
+def run(args, dedup, folder):
+    rng = np.random.default_rng(0)
+    people = make_people(rng, args.people)
+    writer = EvidenceWriter(folder, os.path.join(folder, "events.db"), logging.getLogger("dedup_bench"),
+                            policy="block", dedup={"max_distance": args.max_distance} if dedup else None)
+    writer.start()
+    start = time.perf_counter()
+    for i in range(args.alarms):
+        for c in range(args.cameras):
+            person = people[(i // args.stay + c) % len(people)]
+            dy, dx = rng.integers(0, 4, 2)
+            crop = person[dy:, dx:]
+            noise = rng.integers(-6, 7, crop.shape, dtype=np.int16)
+            crop = np.clip(crop.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+            writer.submit(f"CAM{c + 1}", crop, (0, 0, crop.shape[1], crop.shape[0]), 0.9, (720, 1280))
+    writer.close()
+    elapsed = time.perf_counter() - start
+    files = [f for f in os.listdir(folder) if f.endswith(".jpg")]
+    result = {
+        "crops": args.alarms * args.cameras,
+        "files": len(files),
+        "bytes": sum(os.path.getsize(os.path.join(folder, f)) for f in files),
+        "seconds": elapsed,
+    }
+    if writer.dedup is not None:
+        result["dedup_ratio"] = writer.dedup.dedup_ratio()
+        result["lookup_p50_us"] = writer.dedup.lookup_time.percentile(50) * 1e6
+        result["lookup_p95_us"] = writer.dedup.lookup_time.percentile(95) * 1e6
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Evidence crops on disk with and without dedup")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--alarms", type=int, default=100, help="alarms per camera")
+    parser.add_argument("--people", type=int, default=8)
+    parser.add_argument("--stay", type=int, default=20, help="alarms in a row the same person stays in view")
+    parser.add_argument("--max-distance", type=int, default=6)
+    args = parser.parse_args()
+
+    for dedup in (False, True):
+        result = run(args, dedup, tempfile.mkdtemp(prefix="dedup_bench_"))
+        line = (f"{'dedup' if dedup else 'plain':<6} crops={result['crops']}  files={result['files']}  "
+                f"disk={result['bytes'] / 1e6:.1f}MB  {result['crops'] / result['seconds']:.0f} crops/s")
+        if dedup:
+            line += (f"  dedup={result['dedup_ratio']:.1%}  lookup p50={result['lookup_p50_us']:.0f}us "
+                     f"p95={result['lookup_p95_us']:.0f}us")
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Insert and query rates of the SQLite event store at millions of rows.
+#
+#   python benchmarks/event_store_bench.py --rows 2000000 --cameras 16
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from event_store import EventStore, make_event
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<40} {elapsed * 1000:8.2f} ms  ({len(result)} rows)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--cameras", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--db", help="database path (default: temporary file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "events_bench.db")
+    store = EventStore(path)
+    cameras = [f"CAM{i + 1}" for i in range(args.cameras)]
+    end = time.time()
+    begin = end - args.days * 86400
+    rng = random.Random(0)
+
+    print(f"Inserting {args.rows} events into {path} (batches of {args.batch})")
+    start = time.perf_counter()
+    inserted = 0
+    while inserted < args.rows:
+        n = min(args.batch, args.rows - inserted)
+        batch = []
+        for _ in range(n):
+            x1, y1 = rng.randrange(1800), rng.randrange(900)
+            batch.append(make_event(rng.choice(cameras), (x1, y1, x1 + 80, y1 + 180), rng.random(),
+                                    (1080, 1920), f"captures/bench_{inserted}.jpg",
+                                    ts=rng.uniform(begin, end)))
+        store.add_events(batch)
+        inserted += n
+    elapsed = time.perf_counter() - start
+    print(f"  {inserted / elapsed:,.0f} inserts/s ({elapsed:.1f}s)")
+
+    print("Queries")
+    day = end - 86400
+    timed("events, one camera, last 24h", lambda: store.events("CAM1", day, end))
+    timed("events, one camera, one hour", lambda: store.events("CAM1", day, day + 3600))
+    timed("counts per hour, one camera, last 7d", lambda: store.counts_per_hour("CAM1", end - 7 * 86400, end))
+    timed("counts per hour, all cameras, last 24h", lambda: store.counts_per_hour(None, day, end))
+    timed("latest 50, all cameras", lambda: store.latest(50))
+    timed("latest 50, one camera", lambda: store.latest(50, "CAM1"))
+    store.close()
+    print(f"Database size: {os.path.getsize(path) / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
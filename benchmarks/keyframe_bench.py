@@ -0,0 +1,87 @@
+# CPU per idle camera: full-rate OpenCV decoding against PyAV keyframe-only
+# decoding of the same H.264/H.265 files, played back in real time as N
+# cameras. "pyav-full" is KeyframeCamera kept awake, i.e. what a camera costs
+# while motion or a person keeps it at full rate.
+#
+#   python benchmarks/keyframe_bench.py --video recordings/yard.mp4 --cameras 1 4 8
+#   python benchmarks/keyframe_bench.py --video a.mp4 --video b.mp4 --seconds 30 --output keyframe.json
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera import Camera
+from keyframe_capture import KeyframeCamera
+
+MODES = ("opencv", "pyav-full", "keyframes")
+
+def open_camera(mode, source, idle_interval):
+    if mode == "opencv":
+        return Camera(source, replay_speed=1.0)
+    camera = KeyframeCamera(source, replay_speed=1.0, settings={"quiet_period": 1e9, "idle_interval": idle_interval})
+    if mode == "pyav-full":
+        camera.wake()
+    return camera
+
+def run(mode, videos, n_cameras, seconds, idle_interval):
+    cameras = [open_camera(mode, videos[i % len(videos)], idle_interval) for i in range(n_cameras)]
+    stop = threading.Event()
+    consumed = [0] * n_cameras
+
+    # One consumer per camera, like the CameraHandler threads minus detection
+    def consume(i):
+        while not stop.is_set():
+            seq, frame, _ = cameras[i].read_latest(timeout=0.5)
+            if frame is not None:
+                consumed[i] += 1
+
+    consumers = [threading.Thread(target=consume, args=(i,), daemon=True) for i in range(n_cameras)]
+    for t in consumers:
+        t.start()
+    time.sleep(1.0)
+    read0 = [c.frames_read for c in cameras]
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu0
+    elapsed = time.perf_counter() - wall0
+    decoded = sum(c.frames_read - r for c, r in zip(cameras, read0))
+    stop.set()
+    for t in consumers:
+        t.join()
+    for camera in cameras:
+        camera.release()
+    return {
+        "mode": mode,
+        "cameras": n_cameras,
+        "cpu_percent_per_camera": 100.0 * cpu / elapsed / n_cameras,
+        "decoded_fps_per_camera": decoded / elapsed / n_cameras,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU per idle camera with full-rate and keyframe-only decoding")
+    parser.add_argument("--video", action="append", required=True, help="H.264/H.265 file (repeatable)")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--idle-interval", type=float, default=1.0)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for n_cameras in args.cameras:
+        for mode in args.modes:
+            result = run(mode, args.video, n_cameras, args.seconds, args.idle_interval)
+            results.append(result)
+            print(f"{n_cameras:>3} cameras  {mode:<10} cpu/camera={result['cpu_percent_per_camera']:6.1f}%  "
+                  f"decoded={result['decoded_fps_per_camera']:6.1f} frames/s per camera")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"videos": args.video, "seconds": args.seconds, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+# End-to-end replay benchmark: recorded or synthetic video files are played
+# back as live cameras through the real Pipeline / CameraHandler path, for
+# 1..N cameras. The alarm is silent and the pipeline runs headless, so this
+# works on a bare Linux box. Results are printed and written as JSON.
+#
+#   python benchmarks/pipeline_bench.py --cameras 1 2 4 8 --seconds 30 --output bench.json
+#   python benchmarks/pipeline_bench.py --detector stub --stub-ms 15 --cameras 1 4 16
+#   python benchmarks/pipeline_bench.py --video recordings/yard.mp4 --cameras 2
+import os
+import sys
+import json
+import time
+import copy
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import cv2
+import numpy as np
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from alarm import AlarmManager
+from camera_handler import STAGES
+from pipeline import build_detector, Pipeline
+from stats import TimingStats
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PERSON_COLOR = (40, 200, 40)
+
+def make_video(path, width, height, fps, seconds, seed=0):
+    # A noisy static scene that a person-sized blob walks through during the
+    # middle of the clip, so both the idle and the alarm paths get exercised
+    rng = np.random.default_rng(seed)
+    background = np.tile(np.linspace(60, 160, width, dtype=np.uint8)[None, :, None], (height, 1, 3))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write {path}")
+    total = int(fps * seconds)
+    person_h, person_w = height // 2, height // 6
+    for i in range(total):
+        frame = background.copy()
+        noise = rng.integers(0, 8, (height // 8, width // 8, 1), dtype=np.uint8)
+        frame += cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)[:, :, None]
+        progress = i / total
+        if 0.3 <= progress < 0.7:
+            x = int((progress - 0.3) / 0.4 * (width - person_w))
+            y = height - person_h - height // 10
+            cv2.rectangle(frame, (x, y), (x + person_w, y + person_h), PERSON_COLOR, -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+class StubDetector:
+    # Stands in for HumanDetector without a model: finds the synthetic person
+    # by colour and sleeps for a fixed inference time per call, or with
+    # per_pixel for a time proportional to the input size (infer_ms at 640x480)
+    def __init__(self, infer_ms=10.0, per_pixel=False):
+        self.infer_time = infer_ms / 1000.0
+        self.per_pixel = per_pixel
+        self.lower = np.array([c - 20 for c in PERSON_COLOR])
+        self.upper = np.array([c + 20 for c in PERSON_COLOR])
+        self.calls = 0
+        self.pixels = 0
+
+    def detect(self, frame):
+        return [box[:4] for box in self.detect_scored(frame)]
+
+    def detect_scored(self, frame):
+        return self.detect_batch_scored([frame])[0]
+
+    def detect_batch(self, frames):
+        return [[box[:4] for box in boxes] for boxes in self.detect_batch_scored(frames)]
+
+    def detect_batch_scored(self, frames):
+        pixels = sum(frame.shape[0] * frame.shape[1] for frame in frames)
+        self.calls += len(frames)
+        self.pixels += pixels
+        if self.per_pixel:
+            time.sleep(self.infer_time * pixels / (640 * 480))
+        else:
+            time.sleep(self.infer_time * (1 + 0.25 * (len(frames) - 1)))
+        return [self._find(frame) for frame in frames]
+
+    def _find(self, frame):
+        mask = cv2.inRange(frame, self.lower, self.upper)
+        points = cv2.findNonZero(mask)
+        if points is None or len(points) < 50:
+            return []
+        x, y, w, h = cv2.boundingRect(points)
+        return [(x, y, x + w, y + h, 0.9)]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def cpu_seconds():
+    # Includes the shared-memory capture processes when psutil is available
+    if psutil is not None:
+        process = psutil.Process()
+        total = sum(process.cpu_times()[:2])
+        for child in process.children(recursive=True):
+            try:
+                total += sum(child.cpu_times()[:2])
+            except psutil.Error:
+                pass
+        return total
+    times = os.times()
+    return times.user + times.system
+
+def timing(stats):
+    mean = stats.mean()
+    return {
+        "n": stats.count,
+        "mean_ms": mean * 1000,
+        "p50_ms": stats.percentile(50) * 1000,
+        "p95_ms": stats.percentile(95) * 1000,
+        "p99_ms": stats.percentile(99) * 1000,
+        "max_ms": stats.max * 1000,
+        "fps": 1.0 / mean if mean > 0 else None,
+    }
+
+def merged(all_stats):
+    # Pools the samples of several cameras into one distribution
+    pooled = TimingStats(window=sum(len(s.samples) for s in all_stats) or 1)
+    for stats in all_stats:
+        with stats.lock:
+            samples = list(stats.samples)
+            pooled.count += stats.count
+            pooled.total += stats.total
+            pooled.max = max(pooled.max, stats.max)
+        pooled.samples.extend(samples)
+    return pooled
+
+def run_once(n_cameras, videos, cfg, detector, args, workdir):
+    camera_configs = [
+        {"id": f"BENCH{i + 1}", "detect_url": videos[i % len(videos)], "replay_speed": args.speed}
+        for i in range(n_cameras)
+    ]
+    if args.roi:
+        x1, y1, x2, y2 = args.roi
+        for cam_cfg in camera_configs:
+            cam_cfg["roi"] = {"include": [[[x1, y1], [x2, y1], [x2, y2], [x1, y2]]]}
+    run_cfg = copy.deepcopy(cfg)
+    run_cfg["capture_folder"] = os.path.join(workdir, f"captures_{n_cameras}")
+    os.makedirs(run_cfg["capture_folder"], exist_ok=True)
+    run_cfg.get("clip_recorder", {})["folder"] = os.path.join(workdir, f"clips_{n_cameras}")
+    alarm = AlarmManager()
+    stop_event = threading.Event()
+    pipeline = Pipeline(camera_configs, run_cfg, detector, alarm, os.path.join(workdir, f"events_{n_cameras}.db"),
+                        logging, stop_event)
+    pipeline.start()
+    handlers = pipeline.camera_threads
+
+    # Warm-up: model caches, motion background, first decode
+    time.sleep(args.warmup)
+    for handler in handlers:
+        handler.latency.reset()
+        for stats in handler.stages.values():
+            stats.reset()
+    processed0 = [h.frames_processed for h in handlers]
+    read0 = [h.camera.frames_read for h in handlers]
+    dropped0 = [h.camera.frames_dropped for h in handlers]
+    inferred0 = [h.frames_inferred for h in handlers]
+    shed0 = [h.frames_shed for h in handlers]
+    buffers0 = [h.buffer_stats() for h in handlers]
+    alarms0 = alarm.alarms
+    calls0, pixels0 = getattr(detector, "calls", 0), getattr(detector, "pixels", 0)
+    cpu0, wall0 = cpu_seconds(), time.perf_counter()
+    peak_rss = current_rss() or 0
+
+    end = wall0 + args.seconds
+    while time.perf_counter() < end and pipeline.all_alive():
+        time.sleep(0.25)
+        peak_rss = max(peak_rss, current_rss() or 0)
+
+    elapsed = time.perf_counter() - wall0
+    cpu = cpu_seconds() - cpu0
+    cameras = []
+    for i, handler in enumerate(handlers):
+        cameras.append({
+            "id": handler.camera_id,
+            "source": handler.detect_source,
+            "processed_fps": (handler.frames_processed - processed0[i]) / elapsed,
+            "capture_fps": (handler.camera.frames_read - read0[i]) / elapsed,
+            "dropped": handler.camera.frames_dropped - dropped0[i],
+            "inferred": handler.frames_inferred - inferred0[i],
+            "shed": handler.frames_shed - shed0[i],
+            "latency": timing(handler.latency),
+        })
+    result = {
+        "cameras": n_cameras,
+        "seconds": elapsed,
+        "all_alive": pipeline.all_alive(),
+        "processed_fps_total": sum(c["processed_fps"] for c in cameras),
+        "capture_fps_total": sum(c["capture_fps"] for c in cameras),
+        "latency": timing(merged([h.latency for h in handlers])),
+        "stages": {stage: timing(merged([h.stages[stage] for h in handlers])) for stage in STAGES},
+        "alarms": alarm.alarms - alarms0,
+        # Detector calls per processed frame (motion gate, tracker and cascade savings show up here)
+        "inferences_per_frame": (sum(c["inferred"] for c in cameras)
+                                 / max(1, sum(h.frames_processed - processed0[i] for i, h in enumerate(handlers)))),
+        "cpu_percent": 100.0 * cpu / elapsed,
+        "rss_mb": (current_rss() or 0) / 1e6,
+        "peak_rss_mb": peak_rss / 1e6,
+        "per_camera": cameras,
+    }
+    gates = [h.motion for h in handlers if h.motion is not None]
+    if gates:
+        checks = sum(g.checks for g in gates)
+        result["motion"] = {
+            "checks": checks,
+            "skipped": sum(g.skipped for g in gates),
+            "cropped": sum(g.cropped for g in gates),
+            "saved_ratio": sum(g.skipped for g in gates) / checks if checks else 0.0,
+        }
+    if hasattr(detector, "pixels"):
+        calls = detector.calls - calls0
+        result["pixels_per_inference"] = (detector.pixels - pixels0) / calls if calls else 0
+    # Frame buffer churn over the measured window (the pools make steady state allocation-free)
+    processed = max(1, sum(h.frames_processed - processed0[i] for i, h in enumerate(handlers)))
+    buffers = [h.buffer_stats() for h in handlers]
+    result["allocations_per_frame"] = sum(b[0] - b0[0] for b, b0 in zip(buffers, buffers0)) / processed
+    result["bytes_copied_per_frame"] = sum(b[1] - b0[1] for b, b0 in zip(buffers, buffers0)) / processed
+    rois = [h.roi for h in handlers if h.roi is not None]
+    if rois:
+        result["roi"] = {"crop_ratio": rois[0].crop_ratio, "dropped": sum(r.dropped for r in rois)}
+    if hasattr(detector, "stats"):
+        # Cascade hit rates and compute saved (cumulative, warm-up included)
+        result["cascade"] = detector.stats()
+
+    stop_event.set()
+    pipeline.join()
+    result["evidence"] = {
+        "submitted": pipeline.evidence.submitted,
+        "written": pipeline.evidence.written,
+        "dropped": pipeline.evidence.dropped,
+    }
+    return result
+
+def print_result(result):
+    latency = result["latency"]
+    print(f"{result['cameras']:>3} cameras  processed={result['processed_fps_total']:7.1f} fps  "
+          f"captured={result['capture_fps_total']:7.1f} fps  "
+          f"latency p50={latency['p50_ms']:.1f} p95={latency['p95_ms']:.1f} p99={latency['p99_ms']:.1f} ms  "
+          f"cpu={result['cpu_percent']:.0f}%  rss={result['rss_mb']:.0f}MB  alarms={result['alarms']}  "
+          f"inferences/frame={result['inferences_per_frame']:.2f}")
+    print(f"      buffers: allocations/frame={result['allocations_per_frame']:.2f}  "
+          f"copied/frame={result['bytes_copied_per_frame'] / 1024:.0f}KB")
+    if "pixels_per_inference" in result:
+        print(f"      pixels/inference={result['pixels_per_inference'] / 1e3:.0f}k"
+              + (f"  roi crop={result['roi']['crop_ratio']:.0%} dropped={result['roi']['dropped']}"
+                 if "roi" in result else ""))
+    for stage, stats in result["stages"].items():
+        if stats["n"]:
+            print(f"      {stage:<8} mean={stats['mean_ms']:7.2f}  p50={stats['p50_ms']:7.2f}  "
+                  f"p95={stats['p95_ms']:7.2f}  p99={stats['p99_ms']:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay video files through the camera pipeline")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--video", action="append", help="recorded file(s), used round-robin (default: synthetic)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 = as fast as it decodes")
+    parser.add_argument("--config", default=os.path.join(ROOT, "config.yaml"))
+    parser.add_argument("--detector", choices=("yolo", "stub"), default="yolo")
+    parser.add_argument("--model", help="override yolo_model_path")
+    parser.add_argument("--stub-ms", type=float, default=10.0, help="stub detector inference time")
+    parser.add_argument("--stub-per-pixel", action="store_true",
+                        help="scale the stub's inference time with the input size (--stub-ms at 640x480)")
+    parser.add_argument("--no-motion", action="store_true", help="disable the motion gate")
+    parser.add_argument("--batching", action="store_true", help="enable cross-camera batched inference")
+    parser.add_argument("--shared-memory", action="store_true", help="enable shared-memory capture")
+    parser.add_argument("--clips", action="store_true", help="enable the clip recorder")
+    parser.add_argument("--keyframes", action="store_true", help="keyframe-only decoding while idle (needs PyAV)")
+    parser.add_argument("--cascade", action="store_true", help="screen with the cascade's first stage")
+    parser.add_argument("--budget", type=float, metavar="FPS", help="global inference budget (inferences/s)")
+    parser.add_argument("--tracker", type=int, metavar="N", help="track people and infer every N frames")
+    parser.add_argument("--roi", type=float, nargs=4, metavar=("X1", "Y1", "X2", "Y2"),
+                        help="include-only ROI rectangle in fractions of the frame")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    cfg["headless"] = True
+    cfg["stats_interval"] = 10 ** 9
+    cfg.setdefault("preview_server", {})["enabled"] = False
+    cfg.setdefault("motion", {})["enabled"] = not args.no_motion and cfg["motion"].get("enabled", True)
+    cfg.setdefault("inference_batching", {})["enabled"] = args.batching
+    cfg.setdefault("shared_memory_capture", {})["enabled"] = args.shared_memory
+    cfg.setdefault("clip_recorder", {})["enabled"] = args.clips
+    cfg.setdefault("keyframe_decode", {})["enabled"] = args.keyframes
+    cfg.setdefault("cascade", {})["enabled"] = args.cascade
+    cfg.setdefault("inference_budget", {})["enabled"] = args.budget is not None
+    if args.budget is not None:
+        cfg["inference_budget"]["max_fps"] = args.budget
+    cfg.setdefault("tracker", {})["enabled"] = args.tracker is not None
+    if args.tracker is not None:
+        cfg["tracker"]["detect_interval"] = args.tracker
+    if args.model:
+        cfg["yolo_model_path"] = args.model
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    videos = args.video
+    if not videos:
+        # A few different clips so the cameras are not in lockstep
+        videos = [make_video(os.path.join(workdir, f"synthetic_{i}.avi"), args.width, args.height,
+                             args.fps, seconds=max(10.0, args.seconds / 2), seed=i) for i in range(4)]
+
+    detector = (StubDetector(args.stub_ms, args.stub_per_pixel) if args.detector == "stub"
+                else build_detector(cfg, logging))
+
+    results = []
+    for n_cameras in args.cameras:
+        result = run_once(n_cameras, videos, cfg, detector, args, workdir)
+        print_result(result)
+        results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "detector": args.detector,
+            "model": cfg["yolo_model_path"] if args.detector == "yolo" else f"stub ({args.stub_ms}ms)",
+            "videos": videos,
+            "synthetic": not args.video,
+            "resolution": None if args.video else [args.width, args.height],
+            "replay_speed": args.speed,
+            "motion": cfg["motion"]["enabled"],
+            "batching": args.batching,
+            "shared_memory": args.shared_memory,
+            "clips": args.clips,
+            "keyframes": args.keyframes,
+            "cascade": args.cascade,
+            "tracker_interval": args.tracker,
+            "roi": args.roi,
+            "inference_budget": args.budget,
+            "frame_downscale": cfg["frame_downscale"],
+            "skip_frames": cfg["skip_frames"],
+            "seconds": args.seconds,
+            "warmup": args.warmup,
+        },
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "runs": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
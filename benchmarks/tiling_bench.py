@@ -0,0 +1,127 @@
+# Cost of tiled full-resolution inference against plain full-resolution and
+# downscaled inference on the same high-resolution frames. "tiled" runs every
+# tile of every frame; "tiled+skip" is the per-camera TileGrid, which skips
+# tiles that did not change since their last inference.
+#
+#   python benchmarks/tiling_bench.py --video recordings/street_4k.mp4 --downscale 0.6
+#   python benchmarks/tiling_bench.py --backend onnxruntime --width 3840 --height 2160 --overlap 0.25
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detector import HumanDetector
+from stats import TimingStats
+from tiling import TileGrid, tile_rects
+
+def load_frames(args):
+    if not args.video:
+        # Mostly static scene with a small moving blob, like a quiet 4K camera
+        rng = np.random.default_rng(0)
+        background = rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+        frames = []
+        for i in range(16):
+            frame = background.copy()
+            x = int(args.width * (0.1 + 0.05 * i))
+            cv2.rectangle(frame, (x, args.height // 2), (x + args.width // 80, args.height // 2 + args.height // 25),
+                          (40, 200, 40), -1)
+            frames.append(frame)
+        return frames
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < 32:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames in {args.video}")
+    return frames
+
+def bench(run, frames, iterations):
+    stats = TimingStats(window=iterations)
+    detections = 0
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        boxes = run(frames[i % len(frames)])
+        stats.add(time.perf_counter() - t0)
+        detections += len(boxes)
+    return {
+        "mean_ms": stats.mean() * 1000,
+        "p50_ms": stats.percentile(50) * 1000,
+        "p95_ms": stats.percentile(95) * 1000,
+        "frames_per_second": 1.0 / stats.mean() if stats.mean() else None,
+        "detections_per_frame": detections / iterations,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tiled, full-resolution and downscaled inference")
+    parser.add_argument("--model", default="models/yolov8n.pt")
+    parser.add_argument("--backend", default="ultralytics")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.4)
+    parser.add_argument("--video", help="take frames from a recording (default: synthetic 3840x2160 frames)")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--downscale", type=float, default=0.6, help="frame_downscale of the downscaled run")
+    parser.add_argument("--cols", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=0)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    h, w = frames[0].shape[:2]
+    rects = tile_rects(frames[0].shape, args.imgsz, args.cols, args.rows, args.overlap)
+    print(f"{len(frames)} frames of {w}x{h}, {len(rects)} tiles of {rects[0][2]}x{rects[0][3]}, "
+          f"model {args.model} ({args.backend}) at {args.imgsz}")
+
+    detector = HumanDetector(args.model, args.confidence, backend=args.backend, imgsz=args.imgsz)
+    detector.warm_up()
+    grid = TileGrid({"cols": args.cols, "rows": args.rows, "overlap": args.overlap}, tile_size=args.imgsz)
+    # max_age 0 re-infers every tile of every frame
+    every_tile = TileGrid({"cols": args.cols, "rows": args.rows, "overlap": args.overlap, "max_age": 0},
+                          tile_size=args.imgsz)
+    modes = {
+        "downscaled": lambda frame: detector.detect_scored(
+            cv2.resize(frame, (0, 0), fx=args.downscale, fy=args.downscale)),
+        "tiled": lambda frame: every_tile.detect(detector, frame),
+        "tiled+skip": lambda frame: grid.detect(detector, frame),
+    }
+    # Plain full resolution: the model input as large as the frame (multiple of 32)
+    try:
+        full = HumanDetector(args.model, args.confidence, backend=args.backend, imgsz=(max(h, w) + 31) // 32 * 32)
+        full.warm_up()
+        modes["full-res"] = full.detect_scored
+    except Exception as e:
+        print(f"{'full-res':<11} unavailable: {e}")
+
+    results = []
+    for mode, run in modes.items():
+        try:
+            result = {"mode": mode, **bench(run, frames, args.iterations)}
+        except Exception as e:
+            print(f"{mode:<11} failed: {e}")
+            results.append({"mode": mode, "error": str(e)})
+            continue
+        if mode == "tiled+skip":
+            result["tiles_skipped"] = grid.skipped_ratio()
+        results.append(result)
+        print(f"{mode:<11} mean={result['mean_ms']:8.1f}ms  p50={result['p50_ms']:8.1f}  p95={result['p95_ms']:8.1f}  "
+              f"{result['frames_per_second']:6.1f} frames/s  detections/frame={result['detections_per_frame']:.2f}"
+              + (f"  tiles skipped {result['tiles_skipped']:.0%}" if "tiles_skipped" in result else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "backend": args.backend, "imgsz": args.imgsz, "frame_size": [w, h],
+                       "tiles": len(rects), "overlap": args.overlap, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
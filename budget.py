@@ -0,0 +1,81 @@
+import time
+import threading
+from collections import deque
+
+class CameraShare:
+    def __init__(self, camera_id, priority):
+        self.camera_id = camera_id
+        self.priority = priority
+        self.tokens = 1.0
+        self.last_refill = time.time()
+        self.last_request = 0.0
+        self.person = False
+        self.rate = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.recent = deque()
+
+class InferenceBudget:
+    # Global inferences-per-second budget shared by the cameras of a process.
+    # Only cameras that asked for inference recently (i.e. the motion gate saw
+    # something) compete, each with a token bucket refilled at its share of
+    # the budget: priority x person_boost while a person is being tracked.
+    # A camera without a token sheds the frame instead of queueing it, so an
+    # overloaded box loses frame rate, not latency.
+    def __init__(self, settings, workers=1):
+        self.max_fps = settings.get("max_fps", 20) / max(1, workers)
+        self.burst = max(1.0, settings.get("burst", 2))
+        self.person_boost = settings.get("person_boost", 3.0)
+        self.min_fps = settings.get("min_fps", 0.5)
+        self.demand_window = settings.get("demand_window", 1.0)
+        self.fps_window = 5.0
+        self.lock = threading.Lock()
+        self.cameras = {}
+
+    def register(self, camera_id, priority=1.0):
+        with self.lock:
+            self.cameras[camera_id] = CameraShare(camera_id, priority)
+
+    def set_priority(self, camera_id, priority):
+        with self.lock:
+            if camera_id in self.cameras:
+                self.cameras[camera_id].priority = priority
+
+    def unregister(self, camera_id):
+        with self.lock:
+            self.cameras.pop(camera_id, None)
+
+    def _weight(self, share):
+        return share.priority * (self.person_boost if share.person else 1.0)
+
+    def admit(self, camera_id, person=False):
+        # True when the camera may run inference on this frame
+        now = time.time()
+        with self.lock:
+            share = self.cameras[camera_id]
+            share.last_request = now
+            share.person = person
+            competing = sum(self._weight(s) for s in self.cameras.values()
+                            if now - s.last_request <= self.demand_window)
+            share.rate = max(self.min_fps, self.max_fps * self._weight(share) / competing)
+            share.tokens = min(self.burst, share.tokens + (now - share.last_refill) * share.rate)
+            share.last_refill = now
+            if share.tokens < 1.0:
+                share.shed += 1
+                return False
+            share.tokens -= 1.0
+            share.admitted += 1
+            share.recent.append(now)
+            while share.recent and now - share.recent[0] > self.fps_window:
+                share.recent.popleft()
+            return True
+
+    def stats(self, camera_id):
+        # (effective inference fps over the last few seconds, current share, shed count)
+        now = time.time()
+        with self.lock:
+            share = self.cameras.get(camera_id)
+            if share is None:
+                return 0.0, 0.0, 0
+            recent = sum(1 for t in share.recent if now - t <= self.fps_window)
+            return recent / self.fps_window, share.rate, share.shed
@@ -1,27 +1,479 @@
+import os
+import sys
 import cv2
+import time
 import threading
+import itertools
+import queue
+import multiprocessing as mp
+from shared_frames import SharedFrameRing
+from stats import TimingStats, LATENCY_BUCKETS
+from frame_pool import FramePool
+from stream_health import StreamWatchdog, STATES, effective_state
 
-class Camera:
-    def __init__(self, index=0):
-        self.cap = cv2.VideoCapture(index)
-        if not self.cap.isOpened():
-            raise Exception("Camera not detected")
+# Exit code of a capture process whose stream came back at another resolution
+EXIT_RESOLUTION_CHANGED = 3
+
+def parse_source(source):
+    # Device indices can arrive as strings (YAML quoting, .env files)
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+def open_capture(source, timeout=None):
+    # Network streams get open/read timeouts so a dead camera can't block a
+    # read forever; returns None when the source can't be opened
+    if timeout and isinstance(source, str) and "://" in source:
+        ms = int(timeout * 1000)
+        cap = cv2.VideoCapture(source, cv2.CAP_ANY,
+                               [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, ms])
+    else:
+        cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    return cap
+
+def scale_boxes(boxes, from_shape, to_shape):
+    sy = to_shape[0] / from_shape[0]
+    sx = to_shape[1] / from_shape[1]
+    # Anything after the coordinates (e.g. the confidence) is carried over
+    return [(int(box[0] * sx), int(box[1] * sy), int(box[2] * sx), int(box[3] * sy)) + tuple(box[4:])
+            for box in boxes]
+
+class ReplayClock:
+    # Plays a recorded file back like a live stream: paced at the file's frame
+    # rate times `speed` (0 = as fast as it decodes) and rewound at the end
+    def __init__(self, cap, speed=1.0):
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.interval = 1.0 / (fps * speed) if fps > 0 and speed > 0 else 0
+        self.next_time = time.time()
+
+    def rewind(self, cap):
+        return cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def wait(self):
+        if not self.interval:
+            return
+        self.next_time += self.interval
+        delay = self.next_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Decoding fell behind; don't try to catch up with a burst
+            self.next_time = time.time()
+
+class LatestFrameCamera:
+    # Base of the in-process cameras: a grabber thread decodes frames into
+    # pooled buffers and publishes the newest one; read_latest() lends it to
+    # the consumer until its next call. Subclasses open the source, call
+    # _start_grabber() and implement update_frames() and _close_source().
+    def __init__(self, on_frame=None, stream_cfg=None, max_free=8):
+        # Stall detection and reconnection with backoff for a dropped stream
+        self.watchdog = StreamWatchdog(stream_cfg)
+        self.pool = FramePool(max_free=max_free)
+        self.latest = None
+        self.consumed = None
         self.frame = None
+        self.frame_time = 0
+        self.seq = 0
+        self.consumed_seq = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        # Read/decode time, including waiting for a live stream to deliver
+        self.read_time = TimingStats(buckets=LATENCY_BUCKETS)
+        # Called from the grabber thread with every decoded frame (e.g. clip recording)
+        self.on_frame = on_frame
         self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
         self.running = True
-        threading.Thread(target=self.update_frames, daemon=True).start()
+        self.stopped = threading.Event()
+        self.thread = None
 
-    def update_frames(self):
-        while self.running:
-            ret, frame = self.cap.read()
-            if ret:
-                with self.lock:
-                    self.frame = frame
+    def _start_grabber(self):
+        self.thread = threading.Thread(target=self.update_frames, daemon=True)
+        self.thread.start()
+
+    @property
+    def stream_state(self):
+        return self.watchdog.current_state()
+
+    @property
+    def bytes_copied(self):
+        return self.pool.bytes_copied
+
+    @property
+    def reconnects(self):
+        return self.watchdog.reconnects
+
+    @property
+    def stalls(self):
+        return self.watchdog.stalls
+
+    def _publish(self, buffer, start):
+        # Makes a decoded pooled buffer the newest frame
+        frame = buffer.array
+        self.watchdog.frame_read()
+        self.read_time.add(time.perf_counter() - start)
+        frame_time = time.time()
+        with self.lock:
+            # The previous frame was never picked up by a consumer
+            if self.seq > self.consumed_seq:
+                self.frames_dropped += 1
+            if self.latest is not None:
+                self.latest.release()
+            self.latest = buffer
+            self.frame = frame
+            self.frame_time = frame_time
+            self.seq += 1
+            self.frames_read += 1
+            self.new_frame.notify_all()
+        if self.on_frame is not None:
+            # The buffer is reused, so the callback must copy what it keeps
+            self.on_frame(frame, frame_time, False)
 
     def read(self):
         with self.lock:
             return self.frame.copy() if self.frame is not None else None
 
+    def read_latest(self, timeout=1.0):
+        # Returns (seq, frame, capture_time) for the newest frame not yet consumed.
+        # The frame is lent without a copy and stays valid until the next call.
+        with self.lock:
+            if not self.new_frame.wait_for(lambda: self.seq > self.consumed_seq or not self.running, timeout):
+                return None, None, None
+            if self.seq == self.consumed_seq:
+                return None, None, None
+            self.consumed_seq = self.seq
+            if self.consumed is not None:
+                self.consumed.release()
+            self.consumed = self.latest.retain()
+            return self.seq, self.frame, self.frame_time
+
     def release(self):
         self.running = False
+        self.stopped.set()
+        with self.lock:
+            self.new_frame.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self._close_source()
+        with self.lock:
+            for buffer in (self.latest, self.consumed):
+                if buffer is not None:
+                    buffer.release()
+            self.latest = self.consumed = None
+
+class Camera(LatestFrameCamera):
+    def __init__(self, index=0, on_frame=None, replay_speed=None, stream_cfg=None):
+        super().__init__(on_frame, stream_cfg)
+        self.source = index
+        self.cap = open_capture(index, self.watchdog.read_timeout)
+        if self.cap is None:
+            raise Exception("Camera not detected")
+        self.replay = ReplayClock(self.cap, replay_speed) if replay_speed is not None else None
+        self._start_grabber()
+
+    def update_frames(self):
+        while self.running:
+            start = time.perf_counter()
+            shape = self.pool.shape
+            buffer = self.pool.acquire(shape) if shape is not None else None
+            ret, frame = self.cap.read(buffer.array) if buffer is not None else self.cap.read()
+            if not ret:
+                if buffer is not None:
+                    buffer.release()
+                if self.watchdog.read_failed():
+                    self.reconnect()
+                elif self.replay is not None:
+                    self.replay.rewind(self.cap)
+                continue
+            if buffer is None or frame.ctypes.data != buffer.array.ctypes.data:
+                # First frame, or the backend ignored the destination (e.g. a
+                # resolution change): its array becomes a pooled buffer
+                if buffer is not None:
+                    buffer.release()
+                buffer = self.pool.adopt(frame)
+            self._publish(buffer, start)
+            if self.replay is not None:
+                self.replay.wait()
+
+    def reconnect(self):
+        # Sleeps through the backoff; release() cuts it short
+        self.cap.release()
+        cap = self.watchdog.reconnect(lambda: open_capture(self.source, self.watchdog.read_timeout),
+                                      self.stopped.wait)
+        if cap is None:
+            self.running = False
+            return
+        with self.lock:
+            self.cap = cap
+
+    def _close_source(self):
         self.cap.release()
+
+def capture_frames(index, ring_name, slots, ready, stop_event, replay_speed=None, stream_cfg=None):
+    # Runs in its own process: decodes straight into shared-memory slots
+    watchdog = StreamWatchdog(stream_cfg)
+    cap = open_capture(index, watchdog.read_timeout)
+    ret, frame = cap.read() if cap is not None else (False, None)
+    if not ret:
+        ready.send(None)
+        if cap is not None:
+            cap.release()
+        return
+
+    ring = SharedFrameRing(ring_name, frame.shape, slots, create=True)
+    # Stream health goes to the camera handler through the ring header
+    watchdog.on_change = ring.set_health
+    watchdog.frame_read()
+    slot, buf = ring.begin_write()
+    buf[:] = frame
+    ring.add_copied(frame.nbytes)
+    ring.publish(slot, time.time())
+    ready.send(frame.shape)
+    replay = ReplayClock(cap, replay_speed) if replay_speed is not None else None
+    resized = False
+
+    try:
+        while not stop_event.is_set():
+            slot, buf = ring.begin_write()
+            ret, out = cap.read(buf)
+            if ret and out.ctypes.data != buf.ctypes.data:
+                # The backend ignored the destination (e.g. resolution change)
+                if out.shape != buf.shape:
+                    # A different resolution can't go into the ring: exit, and
+                    # the camera reports itself lost and its handler opens a new one
+                    resized = True
+                    break
+                buf[:] = out
+                ring.add_copied(out.nbytes)
+            if not ret:
+                if watchdog.read_failed():
+                    cap.release()
+                    cap = watchdog.reconnect(lambda: open_capture(index, watchdog.read_timeout), stop_event.wait)
+                    if cap is None:
+                        break
+                elif replay is not None:
+                    replay.rewind(cap)
+                continue
+            watchdog.frame_read()
+            ring.publish(slot, time.time())
+            if replay is not None:
+                replay.wait()
+    finally:
+        if cap is not None:
+            cap.release()
+        ring.close()
+        ring.unlink()
+    if resized:
+        sys.exit(EXIT_RESOLUTION_CHANGED)
+
+class SharedCamera:
+    # Same read_latest()/release() interface as Camera, but the decoding runs
+    # in a separate capture process and frames arrive through shared memory
+    _names = itertools.count()
+
+    def __init__(self, index=0, slots=4, open_timeout=15, on_frame=None, replay_speed=None, stream_cfg=None):
+        ctx = mp.get_context("spawn")
+        self.ring_name = f"ssa_{os.getpid()}_{next(SharedCamera._names)}"
+        self.stop_event = ctx.Event()
+        receiver, sender = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(target=capture_frames,
+                                   args=(index, self.ring_name, slots, sender, self.stop_event, replay_speed,
+                                         stream_cfg),
+                                   name=f"capture-{index}", daemon=True)
+        self.process.start()
+
+        shape = receiver.recv() if receiver.poll(open_timeout) else None
+        if shape is None:
+            self.stop_event.set()
+            self.process.join(timeout=2)
+            raise Exception("Camera not detected")
+        self.ring = SharedFrameRing(self.ring_name, shape, slots)
+        self.read_timeout = StreamWatchdog(stream_cfg).read_timeout
+        # Frames are copied out of the ring into pooled buffers: the writer can
+        # reuse a slot while the consumer is still working on the frame
+        self.pool = FramePool()
+        self.consumed = None
+        self.torn = 0
+        self.consumed_seq = 0
+        self.frames_dropped = 0
+        # Only frames that reach this process are seen, i.e. the consumed ones
+        self.on_frame = on_frame
+
+    @property
+    def frames_read(self):
+        return self.ring.latest_seq()
+
+    @property
+    def bytes_copied(self):
+        return self.ring.bytes_copied() + self.pool.bytes_copied
+
+    @property
+    def stream_state(self):
+        state, _, _ = self.ring.health()
+        return effective_state(STATES[state], self.ring.latest_time(), time.time(), self.read_timeout)
+
+    @property
+    def reconnects(self):
+        return self.ring.health()[1]
+
+    @property
+    def stalls(self):
+        return self.ring.health()[2]
+
+    @property
+    def running(self):
+        return self.process.is_alive()
+
+    def lost_reason(self):
+        if self.process.exitcode == EXIT_RESOLUTION_CHANGED:
+            return "stream resolution changed after a reconnect"
+        return f"capture process exited with code {self.process.exitcode}"
+
+    def read_latest(self, timeout=1.0):
+        # Same contract as Camera.read_latest: the frame stays valid until the next call
+        deadline = time.time() + timeout
+        while True:
+            while self.ring.latest_seq() <= self.consumed_seq:
+                if time.time() >= deadline or not self.process.is_alive():
+                    return None, None, None
+                time.sleep(0.002)
+            latest = self.ring.read_latest()
+            if latest is None:
+                return None, None, None
+            seq, slot, view, frame_time = latest
+            buffer = self.pool.copy(view)
+            # The writer marks a slot before reusing it; a frame overwritten
+            # during the copy is torn, so drop it and take the next one
+            if self.ring.still_valid(slot, seq):
+                break
+            buffer.release()
+            self.torn += 1
+            self.frames_dropped += 1
+        if self.consumed is not None:
+            self.consumed.release()
+        self.consumed = buffer
+        self.frames_dropped += max(0, seq - self.consumed_seq - 1)
+        self.consumed_seq = seq
+        frame = buffer.array
+        if self.on_frame is not None:
+            self.on_frame(frame, frame_time, False)
+        return seq, frame, frame_time
+
+    def release(self):
+        self.stop_event.set()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        if self.consumed is not None:
+            self.consumed.release()
+            self.consumed = None
+        self.ring.close()
+        # A capture process that exited cleanly has already removed the segment
+        if self.process.exitcode != 0:
+            self.ring.unlink()
+
+class MainStreamGrabber(threading.Thread):
+    # Opens a camera's full-resolution main stream only when evidence is needed.
+    # Requests carry boxes in detection-frame coordinates; the callback gets the
+    # main-stream frame and the boxes mapped onto it. While open, the stream is
+    # drained continuously (grab only, no conversion) so the newest frame is
+    # current. A main-stream frame that arrived more than max_skew seconds away
+    # from the detection frame would put the boxes on the wrong picture, so the
+    # detection frame is used instead. A stream opened for the request can't
+    # have a frame from before the open finished, so its first frame is
+    # measured from then rather than from the detection.
+    def __init__(self, url, camera_id, logger, keep_open=0, max_skew=0.5):
+        super().__init__(daemon=True)
+        self.url = url
+        self.camera_id = camera_id
+        self.logger = logger
+        self.keep_open = keep_open
+        self.max_skew = max_skew
+        self.requests = queue.Queue(maxsize=4)
+        self.cap = None
+        self.grab_time = 0
+        self.last_used = 0
+        self.fallbacks = 0
+        self.running = True
+
+    def submit(self, boxes, detect_frame, detect_time, on_frame):
+        try:
+            self.requests.put_nowait((boxes, detect_frame, detect_time, on_frame))
+        except queue.Full:
+            self.logger.warning(f"Camera {self.camera_id}: main stream busy, evidence request dropped")
+
+    def run(self):
+        while self.running:
+            if self.cap is None:
+                try:
+                    request = self.requests.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            else:
+                if not self.cap.grab():
+                    self.close()
+                    continue
+                self.grab_time = time.time()
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    if time.time() - self.last_used > self.keep_open:
+                        self.close()
+                    continue
+
+            boxes, detect_frame, detect_time, on_frame = request
+            frame = self.grab(detect_time)
+            if frame is None:
+                self.fallbacks += 1
+                on_frame(detect_frame, boxes)
+            else:
+                on_frame(frame, scale_boxes(boxes, detect_frame.shape, frame.shape))
+            if self.keep_open <= 0:
+                self.close()
+
+    def grab(self, detect_time):
+        # The main-stream frame closest to detect_time, or None if it is too far off
+        self.last_used = time.time()
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.url)
+            if not self.cap.isOpened():
+                self.close()
+                self.logger.warning(f"Camera {self.camera_id}: main stream unavailable, "
+                                    f"saving evidence from the detection stream")
+                return None
+            self.grab_time = 0
+            opened = time.time()
+            self.logger.debug(f"Camera {self.camera_id}: main stream opened in {opened - self.last_used:.2f}s")
+            detect_time = max(detect_time, opened)
+        if self.grab_time < detect_time:
+            # Just opened, or the drain hasn't reached the detection yet
+            if not self.cap.grab():
+                self.close()
+                self.logger.warning(f"Camera {self.camera_id}: main stream unavailable, "
+                                    f"saving evidence from the detection stream")
+                return None
+            self.grab_time = time.time()
+        # Arrival times, not capture times: the tolerance also absorbs the
+        # difference in latency between the two streams
+        skew = self.grab_time - detect_time
+        if abs(skew) > self.max_skew:
+            self.logger.warning(f"Camera {self.camera_id}: main stream frame {skew:+.2f}s from the detection, "
+                                f"saving evidence from the detection stream")
+            return None
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=5)
+        self.close()
@@ -1,102 +1,545 @@
-import os
 import cv2
 import time
-import csv
+import numpy as np
 import threading
+from camera import Camera, SharedCamera, MainStreamGrabber, parse_source
+from keyframe_capture import KeyframeCamera
+from motion import MotionGate
+from roi import RoiMask
+from tiling import TileGrid
+from tracker import Tracker
+from stream_health import LIVE, STATES, StreamWatchdog
+from stats import TimingStats, LATENCY_BUCKETS
+from overlay import draw_overlay
+from frame_pool import FramePool
+
+# Per-frame pipeline stages timed by every handler ("wait" is time spent
+# blocked on the capture stage, the rest is processing)
+STAGES = ("wait", "resize", "detect", "draw", "alarm", "display")
 
 class CameraHandler(threading.Thread):
-    def __init__(self, camera_config, cfg, detector, alarm, log_csv_path, logger, stop_event):
+    def __init__(self, camera_config, cfg, detector, alarm, evidence, logger, stop_event, clips=None, preview=None,
+                 budget=None, armed=None):
         super().__init__()
-        self.index = camera_config["index"]
         self.camera_id = camera_config["id"]
+        self.camera_config = camera_config
+        # Detection runs on the (sub)stream; the bare `index` key is still accepted
+        self.detect_source = parse_source(camera_config.get("detect_url", camera_config.get("index")))
         self.cfg = cfg
         self.detector = detector
+        self.native_resize = getattr(detector, "resizes_input", False)
         self.alarm = alarm
-        self.log_csv_path = log_csv_path
+        self.evidence = evidence
         self.logger = logger
         self.stop_event = stop_event
+        # Stops just this camera (config reload); stop_event stops them all
+        self.halt = threading.Event()
+        self.window_name = f"Camera {self.camera_id}"
+        self.preview = preview.channel(self.camera_id) if preview is not None else None
+        # Shared inference budget; a camera without a share of it sheds frames
+        self.budget = budget
+        # Cleared while disarmed: detection keeps running, alarms don't fire
+        self.armed = armed
+
+        # Pre/post-alarm clip recording fed straight from the capture stage
+        self.clips = clips.recorder(self.camera_id) if clips is not None else None
 
-        self.cap = cv2.VideoCapture(self.index)
-        if not self.cap.isOpened():
+        # Capture stage: a grabber thread keeps decoding so detection always
+        # gets the newest frame instead of working through a stale backlog.
+        # A dropped stream is reconnected with backoff (per-camera overrides)
+        self.stream_cfg = {**cfg.get("stream_watchdog", {}), **camera_config.get("stream_watchdog", {})}
+        # Reconnects of cameras replaced by reopen_camera(), each reopen counting as one
+        self.past_reconnects = 0
+        try:
+            self.camera = self.open_camera()
+        except Exception:
+            if self.clips is not None:
+                self.clips.stop()
             self.logger.error(f"Camera {self.camera_id} not detected")
             raise Exception(f"Camera {self.camera_id} not detected")
 
+        # Full-resolution evidence comes from the main stream, opened only on alarm
+        self.main_stream = None
+        if camera_config.get("capture_url"):
+            self.main_stream = MainStreamGrabber(
+                parse_source(camera_config["capture_url"]), self.camera_id, self.logger,
+                keep_open=camera_config.get("capture_keep_open", 0),
+                max_skew=camera_config.get("capture_max_skew", 0.5),
+            )
+            self.main_stream.start()
+
+        self.stream_state = LIVE
+        self.moving = False
         self.last_alarm_time = 0
         self.human_present = False
         self.detection_counter = 0
+        self.last_humans = []
         self.frame_count = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.frames_inferred = 0
+        self.frames_tracked = 0
+        self.frames_shed = 0
+        self.alarms = 0
+        # Reused frame buffers: the detector input and, only while a window or
+        # preview client is watching, the frame the overlay is drawn into
+        self.small_frame = None
+        self.display_pool = FramePool(max_free=2)
+        self.allocations = 0
+        self.bytes_copied = 0
+        self.latency = TimingStats(buckets=LATENCY_BUCKETS)
+        self.stages = {stage: TimingStats(buckets=LATENCY_BUCKETS) for stage in STAGES}
+
+        self.motion = None
+        self.roi = None
+        self.roi_cfg = None
+        self.tiles = None
+        self.tracker = None
+        self.window_shown = False
+        # A config reload hands the new entry to the camera thread, which
+        # applies it between frames
+        self.pending_config = None
+        self.configure(camera_config)
+        self.last_stats_time = time.time()
+
+    def open_camera(self):
+        # replay_speed plays a recorded file back in a loop like a live stream
+        cfg, camera_config = self.cfg, self.camera_config
+        on_frame = self.clips.push if self.clips is not None else None
+        replay_speed = camera_config.get("replay_speed")
+        # Idle cameras decode keyframes only; motion or a person wakes full-rate decoding
+        keyframe_cfg = {**cfg.get("keyframe_decode", {}), **camera_config.get("keyframe_decode", {})}
+        shared = cfg.get("shared_memory_capture", {})
+        if keyframe_cfg.get("enabled") and isinstance(self.detect_source, str):
+            return KeyframeCamera(self.detect_source, on_frame=on_frame, replay_speed=replay_speed,
+                                  stream_cfg=self.stream_cfg, settings=keyframe_cfg)
+        if shared.get("enabled"):
+            return SharedCamera(self.detect_source, slots=shared.get("slots", 4), on_frame=on_frame,
+                                replay_speed=replay_speed, stream_cfg=self.stream_cfg)
+        return Camera(self.detect_source, on_frame=on_frame, replay_speed=replay_speed, stream_cfg=self.stream_cfg)
+
+    def reopen_camera(self):
+        # The capture stage gave up on a stream it can't carry on with (a
+        # shared-memory ring can't change resolution): open a new one with the
+        # watchdog's backoff. False when the camera is being stopped.
+        def attempt():
+            try:
+                return self.open_camera()
+            except Exception:
+                return None
+        camera = StreamWatchdog(self.stream_cfg).reconnect(
+            attempt, lambda delay: self.halt.wait(delay) or self.stop_event.is_set())
+        if camera is None:
+            return False
+        self.past_reconnects += self.camera.reconnects + 1
+        self.camera.release()
+        self.camera = camera
+        self.logger.info(f"Camera {self.camera_id} reopened")
+        return True
+
+    def configure(self, camera_config):
+        # Everything that can change without reopening the stream. Per-camera
+        # entries override the global ones; state (motion background, tracks,
+        # tile boxes) is kept when a component stays enabled
+        cfg = self.cfg
+        self.camera_config = camera_config
+        # Headless mode never touches HighGUI and only draws overlays for preview clients
+        self.headless = cfg.get("headless", False)
+
+        motion_cfg = {**cfg.get("motion", {}), **camera_config.get("motion", {})}
+        if not motion_cfg.get("enabled"):
+            self.motion = None
+        elif self.motion is None:
+            self.motion = MotionGate(motion_cfg)
+        else:
+            self.motion.configure(motion_cfg)
+
+        # Only the ROI's bounding crop is sent to the motion gate and the detector
+        roi_cfg = camera_config.get("roi", {})
+        if roi_cfg != self.roi_cfg:
+            self.roi_cfg = roi_cfg
+            self.roi = RoiMask(roi_cfg) if roi_cfg.get("include") or roi_cfg.get("exclude") else None
+
+        # Tiled full-resolution inference for small, distant people
+        tiling_cfg = {**cfg.get("tiling", {}), **camera_config.get("tiling", {})}
+        tile_size = getattr(self.detector, "imgsz", 640) or 640
+        if not tiling_cfg.get("enabled"):
+            self.tiles = None
+        elif self.tiles is None:
+            self.tiles = TileGrid(tiling_cfg, tile_size=tile_size)
+        else:
+            self.tiles.configure(tiling_cfg, tile_size=tile_size)
+
+        # With the tracker, alarms fire on newly confirmed track IDs instead of
+        # detection_frames_required consecutive hits (which becomes min_hits)
+        tracker_cfg = {**cfg.get("tracker", {}), **camera_config.get("tracker", {})}
+        if not tracker_cfg.get("enabled"):
+            self.tracker = None
+        elif self.tracker is None:
+            self.tracker = Tracker(tracker_cfg, min_hits=cfg["detection_frames_required"])
+        else:
+            self.tracker.configure(tracker_cfg, min_hits=cfg["detection_frames_required"])
+
+        if self.main_stream is not None:
+            self.main_stream.keep_open = camera_config.get("capture_keep_open", 0)
+            self.main_stream.max_skew = camera_config.get("capture_max_skew", 0.5)
+        if self.budget is not None:
+            self.budget.set_priority(self.camera_id, camera_config.get("priority", 1.0))
 
     def run(self):
         self.logger.info(f"Camera {self.camera_id} started")
-        while not self.stop_event.is_set():
-            ret, frame = self.cap.read()
-            if not ret:
+        try:
+            self.process_frames()
+        except Exception:
+            self.logger.exception(f"Camera {self.camera_id} crashed")
+            raise
+        finally:
+            # Stats first: a released shared-memory camera can't report its counters
+            self.log_stats()
+            self.camera.release()
+            if self.main_stream is not None:
+                self.main_stream.stop()
+            if self.clips is not None:
+                self.clips.stop()
+            if self.window_shown:
+                cv2.destroyWindow(self.window_name)
+            self.logger.info(f"Camera {self.camera_id} stopped")
+
+    def process_frames(self):
+        stages = self.stages
+        while not self.stop_event.is_set() and not self.halt.is_set():
+            if self.pending_config is not None:
+                camera_config, self.pending_config = self.pending_config, None
+                self.configure(camera_config)
+            t_wait = time.perf_counter()
+            seq, frame, capture_time = self.camera.read_latest(timeout=0.5)
+            if frame is None or self.stream_state != LIVE:
+                self.check_stream()
+            if frame is None:
+                if not self.camera.running:
+                    # The capture stage gave up (stopped, or the stream can't be used any more)
+                    if self.stop_event.is_set() or self.halt.is_set():
+                        break
+                    reason = self.camera.lost_reason() if hasattr(self.camera, "lost_reason") else "capture stopped"
+                    self.logger.warning(f"Camera {self.camera_id} lost: {reason}, reopening")
+                    if not self.reopen_camera():
+                        break
                 continue
 
             self.frame_count += 1
             if self.frame_count % self.cfg["skip_frames"] != 0:
+                self.frames_skipped += 1
                 continue
 
-            small_frame = cv2.resize(frame, (0,0), fx=self.cfg["frame_downscale"], fy=self.cfg["frame_downscale"])
-            humans = self.detector.detect(small_frame)
-            humans = [
-                (
-                    int(x1 / self.cfg["frame_downscale"]),
-                    int(y1 / self.cfg["frame_downscale"]),
-                    int(x2 / self.cfg["frame_downscale"]),
-                    int(y2 / self.cfg["frame_downscale"])
-                )
-                for (x1, y1, x2, y2) in humans
-                if (y2 - y1) >= self.cfg["min_box_height"]
-            ]
-
-            human_detected = len(humans) > 0
-
-            # Draw boxes
-            for (x1, y1, x2, y2) in humans:
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0,0,255), 2)
-                cv2.putText(frame, f"Person {self.camera_id}", (x1, y1-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
-
-            cv2.putText(frame, time.strftime("%Y-%m-%d %H:%M:%S"),
-                        (10, frame.shape[0]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,255), 1)
-
-            # Detection logic
-            self.detection_counter = self.detection_counter + 1 if human_detected else 0
-
-            if self.detection_counter >= self.cfg["detection_frames_required"] and not self.human_present:
+            t_resize = time.perf_counter()
+            stages["wait"].add(t_resize - t_wait)
+            # Exported backends letterbox the full frame in one resize themselves
+            # and tiles are cut from the full-resolution frame
+            downscale = 1 if self.native_resize or self.tiles is not None else self.setting("frame_downscale")
+            small_frame = frame if downscale == 1 else self.resize(frame, downscale)
+            t_detect = time.perf_counter()
+            stages["resize"].add(t_detect - t_resize)
+            self.moving = False
+            if self.tracker is not None:
+                humans, new_tracks = self.track_humans(small_frame, downscale, frame.shape, capture_time)
+                alarm_due = len(new_tracks) > 0
+            else:
+                humans = self.find_humans(small_frame, downscale)
+                if humans is None:
+                    # Shed by the inference budget: keep the last boxes, no decision on this frame
+                    humans, alarm_due = self.last_humans, False
+                else:
+                    # Detection logic
+                    self.last_humans = humans
+                    self.detection_counter = self.detection_counter + 1 if humans else 0
+                    alarm_due = (self.detection_counter >= self.cfg["detection_frames_required"]
+                                 and not self.human_present)
+                    if alarm_due:
+                        self.human_present = True
+                    elif self.detection_counter == 0:
+                        self.human_present = False
+            if (humans or self.moving) and hasattr(self.camera, "wake"):
+                self.camera.wake()
+            t_draw = time.perf_counter()
+            stages["detect"].add(t_draw - t_detect)
+
+            # Draw boxes into a display copy, never into the captured frame
+            display = None
+            if not self.headless or (self.preview is not None and self.preview.due):
+                display = self.display_pool.copy(frame)
+                draw_overlay(display.array, humans, self.camera_id)
+            t_alarm = time.perf_counter()
+            stages["draw"].add(t_alarm - t_draw)
+
+            if alarm_due and (self.armed is None or self.armed.is_set()):
                 current_time = time.time()
                 if (current_time - self.last_alarm_time) > self.cfg["alarm_cooldown"]:
                     self.logger.info(f"HUMAN DETECTED! [{self.camera_id}]")
-                    self.alarm.play_alarm()
+                    self.alarm.play_alarm(self.camera_id)
+                    self.alarms += 1
                     self.last_alarm_time = current_time
+                    if self.clips is not None:
+                        self.clips.trigger()
 
                     # Capture cropped images
-                    for (x1, y1, x2, y2) in humans:
-                        cropped = frame[y1:y2, x1:x2]
-                        timestamp = time.strftime("%Y%m%d_%H%M%S")
-                        filename = os.path.join(self.cfg["capture_folder"], f"{self.camera_id}_human_{timestamp}.jpg")
-                        cv2.imwrite(filename, cropped)
-                        self.logger.info(f"Cropped image saved: {filename}")
-                        with open(self.log_csv_path, "a", newline="") as f:
-                            writer = csv.writer(f)
-                            writer.writerow([timestamp, self.camera_id, filename])
-
-                self.human_present = True
-            elif self.detection_counter == 0:
-                self.human_present = False
-
-            cv2.imshow(f"Camera {self.camera_id}", frame)
+                    if self.main_stream is not None:
+                        self.bytes_copied += frame.nbytes
+                        self.main_stream.submit(humans, frame.copy(), capture_time, self.save_crops)
+                    else:
+                        self.save_crops(frame, humans)
+
+            t_display = time.perf_counter()
+            stages["alarm"].add(t_display - t_alarm)
+            self.frames_processed += 1
+            self.latency.add(time.time() - capture_time)
+            if time.time() - self.last_stats_time >= self.cfg.get("stats_interval", 30):
+                self.log_stats()
+
+            if display is not None and self.preview is not None and self.preview.due:
+                self.preview.publish(display.array, humans, drawn=True, buffer=display)
+
+            if self.headless:
+                if display is not None:
+                    display.release()
+                if self.window_shown:
+                    # Switched to headless by a config reload
+                    cv2.destroyWindow(self.window_name)
+                    self.window_shown = False
+                stages["display"].add(time.perf_counter() - t_display)
+                continue
+
+            cv2.imshow(self.window_name, display.array)
+            self.window_shown = True
+            display.release()
 
             # Check if window was closed
-            if cv2.getWindowProperty(f"Camera {self.camera_id}", cv2.WND_PROP_VISIBLE) < 1:
+            if cv2.getWindowProperty(self.window_name, cv2.WND_PROP_VISIBLE) < 1:
                 self.logger.info(f"Window closed for {self.camera_id}, stopping thread.")
                 self.stop_event.set()
                 break
 
             # Small delay to reduce CPU
             cv2.waitKey(1)
+            stages["display"].add(time.perf_counter() - t_display)
+
+    def stop(self):
+        self.halt.set()
+        if self.is_alive():
+            self.join()
+
+    def setting(self, key):
+        # Per-camera entries override the global config
+        return self.camera_config.get(key, self.cfg[key])
+
+    def save_crops(self, frame, humans):
+        # Encoding and disk I/O happen on the evidence writer's threads
+        for (x1, y1, x2, y2, conf) in humans:
+            crop = frame[y1:y2, x1:x2].copy()
+            self.bytes_copied += crop.nbytes
+            self.evidence.submit(self.camera_id, crop, (x1, y1, x2, y2), conf, frame.shape)
+
+    def resize(self, frame, downscale):
+        # Downscales into the reused detector input buffer (same size rule as fx/fy)
+        h, w = frame.shape[:2]
+        size = (int(round(w * downscale)), int(round(h * downscale)))
+        if self.small_frame is None or self.small_frame.shape[:2] != (size[1], size[0]):
+            self.small_frame = np.empty((size[1], size[0]) + frame.shape[2:], frame.dtype)
+            self.allocations += 1
+        return cv2.resize(frame, size, dst=self.small_frame)
+
+    def buffer_stats(self):
+        # (allocations, bytes copied) of this camera's frame buffers so far
+        pool = getattr(self.camera, "pool", None)
+        allocations = self.allocations + self.display_pool.allocations + (pool.allocations if pool else 0)
+        copied = self.bytes_copied + self.display_pool.bytes_copied + getattr(self.camera, "bytes_copied", 0)
+        return allocations, copied
+
+    def find_humans(self, small_frame, downscale):
+        # Boxes are (x1, y1, x2, y2, confidence) in full-frame coordinates;
+        # None when the inference budget shed the frame
+        boxes = self.detect_humans(small_frame)
+        if boxes is None:
+            return None
+        # min_box_height is in frame_downscale pixels whatever resolution the
+        # detector ran at (full frame for native-resize backends and tiling)
+        min_height = self.cfg["min_box_height"] * downscale / self.setting("frame_downscale")
+        return [
+            (
+                int(x1 / downscale),
+                int(y1 / downscale),
+                int(x2 / downscale),
+                int(y2 / downscale),
+                conf
+            )
+            for (x1, y1, x2, y2, conf) in boxes
+            if (y2 - y1) >= min_height
+        ]
+
+    def track_humans(self, small_frame, downscale, frame_shape, capture_time):
+        # Inference only when the tracker asks for it; in between, the tracks'
+        # predicted boxes stand in for detections. Returns (boxes, new tracks).
+        self.tracker.predict(capture_time)
+        if not self.tracker.needs_detection():
+            self.tracker.skip()
+            self.frames_tracked += 1
+            return self.tracker.boxes(frame_shape), []
+        humans = self.find_humans(small_frame, downscale)
+        if humans is None:
+            self.tracker.skip()
+            return self.tracker.boxes(frame_shape), []
+        new_tracks = self.tracker.update(humans, capture_time)
+        if new_tracks:
+            self.logger.info(f"Camera {self.camera_id}: new track(s) "
+                             f"{', '.join(str(t.id) for t in new_tracks)}")
+        return self.tracker.boxes(frame_shape), new_tracks
+
+    def detect_humans(self, small_frame):
+        if self.roi is None:
+            return self.detect_region(small_frame)
+        x1, y1, x2, y2 = self.roi.crop(small_frame.shape)
+        if x2 <= x1 or y2 <= y1:
+            return []
+        boxes = self.detect_region(small_frame[y1:y2, x1:x2])
+        if boxes is None:
+            return None
+        boxes = [(bx1 + x1, by1 + y1, bx2 + x1, by2 + y1, conf) for (bx1, by1, bx2, by2, conf) in boxes]
+        return self.roi.filter(boxes, small_frame.shape)
+
+    def detect_region(self, small_frame):
+        tracking = self.detection_counter > 0 or (self.tracker is not None and len(self.tracker.tracks) > 0)
+        if self.motion is None:
+            if not self.admit(tracking):
+                return None
+            return self.infer(small_frame)
+
+        # Keep inferring while a person is being tracked so someone standing still isn't lost
+        region = self.motion.gate(small_frame, force=tracking)
+        if region is None:
+            return []
+        self.moving = True
+        if not self.admit(tracking):
+            return None
+        if self.tiles is not None:
+            # The tile grid is fixed per frame size; tiles under the motion
+            # region are re-inferred and the rest skip themselves when unchanged
+            return self.infer(small_frame, region)
+        x1, y1, x2, y2 = region
+        boxes = self.infer(small_frame[y1:y2, x1:x2])
+        return [(bx1 + x1, by1 + y1, bx2 + x1, by2 + y1, conf) for (bx1, by1, bx2, by2, conf) in boxes]
+
+    def infer(self, frame, region=None):
+        self.frames_inferred += 1
+        if self.tiles is not None:
+            return self.tiles.detect(self.detector, frame, region)
+        return self.detector.detect_scored(frame)
+
+    def admit(self, person):
+        if self.budget is None or self.budget.admit(self.camera_id, person):
+            return True
+        self.frames_shed += 1
+        return False
+
+    def check_stream(self):
+        # Logs stream state changes made by the capture stage's watchdog
+        state = self.camera.stream_state
+        if state == self.stream_state:
+            return
+        log = self.logger.info if state == LIVE else self.logger.warning
+        log(f"Camera {self.camera_id}: stream {state} "
+            f"(reconnects={self.camera.reconnects}, stalls={self.camera.stalls})")
+        self.stream_state = state
+
+    def log_stats(self):
+        self.last_stats_time = time.time()
+        motion = ""
+        if self.motion is not None:
+            motion = (f" motion: inferences saved {self.motion.saved_ratio():.1%} "
+                      f"({self.motion.skipped}/{self.motion.checks}), cropped={self.motion.cropped}")
+        if self.tracker is not None:
+            motion += (f" tracker: {len(self.tracker.tracks)} tracks, "
+                       f"frames tracked without inference={self.frames_tracked}")
+        if self.tiles is not None:
+            motion += (f" tiles: {len(self.tiles.rects)} per frame, "
+                       f"skipped unchanged {self.tiles.skipped_ratio():.1%}")
+        if isinstance(self.camera, KeyframeCamera):
+            motion += (f" keyframe decode: {self.camera.decode_ratio():.1%} of packets decoded, "
+                       f"wakeups={self.camera.wakeups}")
+        if self.roi is not None:
+            motion += f" roi: crop {self.roi.crop_ratio:.0%} of frame, dropped={self.roi.dropped}"
+        allocations, copied = self.buffer_stats()
+        frames = max(1, self.frames_processed)
+        motion += f" buffers: {allocations / frames:.2f} allocations/frame, {copied / frames / 1024:.0f}KB copied/frame"
+        if self.budget is not None:
+            fps, share, shed = self.budget.stats(self.camera_id)
+            motion += f" budget: {fps:.1f} inferences/s (share {share:.1f}/s), shed={shed}"
+        self.logger.info(
+            f"Camera {self.camera_id}: read={self.camera.frames_read} "
+            f"dropped={self.camera.frames_dropped} "
+            f"stream={self.camera.stream_state} reconnects={self.past_reconnects + self.camera.reconnects} "
+            f"capture-to-decision {self.latency.summary()}{motion}"
+        )
+
+    def collect_metrics(self, writer):
+        # Called from the metrics server thread; only reads counters
+        cam = self.camera_id
+        writer.counter("ssa_frames_read_total", "Frames decoded by the capture stage",
+                       self.camera.frames_read, camera=cam)
+        writer.counter("ssa_frames_dropped_total", "Decoded frames replaced before detection picked them up",
+                       self.camera.frames_dropped, camera=cam)
+        state = self.camera.stream_state
+        for name in STATES:
+            writer.gauge("ssa_stream_state", "Capture stream state (1 for the current one)",
+                         int(name == state), camera=cam, state=name)
+        writer.counter("ssa_stream_reconnects_total", "Capture stream reconnections",
+                       self.past_reconnects + self.camera.reconnects, camera=cam)
+        writer.counter("ssa_stream_stalls_total", "Capture stream stalls", self.camera.stalls, camera=cam)
+        writer.counter("ssa_frames_skipped_total", "Frames not sent to the detector",
+                       self.frames_skipped, camera=cam, reason="skip_frames")
+        if self.motion is not None:
+            writer.counter("ssa_frames_skipped_total", "Frames not sent to the detector",
+                           self.motion.skipped, camera=cam, reason="motion")
+        if self.tracker is not None:
+            writer.counter("ssa_frames_skipped_total", "Frames not sent to the detector",
+                           self.frames_tracked, camera=cam, reason="tracker")
+        if self.budget is not None:
+            fps, share, shed = self.budget.stats(self.camera_id)
+            writer.counter("ssa_frames_skipped_total", "Frames not sent to the detector",
+                           shed, camera=cam, reason="budget")
+            writer.gauge("ssa_inference_effective_fps", "Inferences per second over the last few seconds",
+                         fps, camera=cam)
+            writer.gauge("ssa_inference_share_fps", "Current share of the inference budget", share, camera=cam)
+        if self.tiles is not None:
+            writer.counter("ssa_tiles_total", "Tiles considered for tiled inference", self.tiles.tiles_run,
+                           camera=cam, result="inferred")
+            writer.counter("ssa_tiles_total", "Tiles considered for tiled inference", self.tiles.tiles_skipped,
+                           camera=cam, result="unchanged")
+        if isinstance(self.camera, KeyframeCamera):
+            writer.counter("ssa_packets_total", "Compressed packets demuxed by keyframe-only capture",
+                           self.camera.packets_read, camera=cam, result="read")
+            writer.counter("ssa_packets_total", "Compressed packets demuxed by keyframe-only capture",
+                           self.camera.packets_decoded, camera=cam, result="decoded")
+            writer.counter("ssa_decode_wakeups_total", "Switches from keyframe-only to full-rate decoding",
+                           self.camera.wakeups, camera=cam)
+            writer.gauge("ssa_decode_full_rate", "1 while the camera decodes every frame",
+                         int(self.camera.full_rate), camera=cam)
+        if self.roi is not None:
+            writer.counter("ssa_roi_dropped_total", "Detections dropped outside the ROI", self.roi.dropped,
+                           camera=cam)
+            writer.gauge("ssa_roi_crop_ratio", "Share of the frame's pixels sent to the detector",
+                         self.roi.crop_ratio, camera=cam)
+        writer.counter("ssa_frames_inferred_total", "Frames sent to the detector", self.frames_inferred, camera=cam)
+        writer.counter("ssa_frames_processed_total", "Frames that went through the whole pipeline",
+                       self.frames_processed, camera=cam)
+        writer.counter("ssa_alarms_total", "Alarms raised", self.alarms, camera=cam)
+        allocations, copied = self.buffer_stats()
+        writer.counter("ssa_frame_allocations_total", "Frame buffers allocated", allocations, camera=cam)
+        writer.counter("ssa_frame_bytes_copied_total", "Bytes copied between frame buffers", copied, camera=cam)
 
-        self.cap.release()
-        cv2.destroyWindow(f"Camera {self.camera_id}")
-        self.logger.info(f"Camera {self.camera_id} stopped")
+        stage_help = "Time per frame spent in each pipeline stage"
+        read_time = getattr(self.camera, "read_time", None)
+        if read_time is not None:
+            writer.histogram("ssa_stage_seconds", stage_help, read_time, camera=cam, stage="read")
+        for stage, stats in self.stages.items():
+            writer.histogram("ssa_stage_seconds", stage_help, stats, camera=cam, stage=stage)
+        writer.histogram("ssa_capture_latency_seconds", "Time from frame capture to the alarm decision",
+                         self.latency, camera=cam)
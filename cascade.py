@@ -0,0 +1,128 @@
+import time
+import threading
+
+class CascadeDetector:
+    # Same interface as HumanDetector. A cheap screen detector looks at every
+    # frame; the confirm detector (the main model) only runs on the frames it
+    # flags, on a padded crop around the screen boxes or on the whole frame.
+    # Only confirmed boxes are returned, so detection_frames_required counts
+    # confirmed hits.
+    def __init__(self, screen, confirm, settings, logger=None, stats_interval=30):
+        self.screen = screen
+        self.confirm = confirm
+        self.confirm_on = settings.get("confirm_on", "crops")
+        self.crop_padding = settings.get("crop_padding", 0.5)
+        self.full_frame_ratio = settings.get("full_frame_ratio", 0.6)
+        # The confirm model sees whatever the camera hands in
+        self.resizes_input = getattr(confirm, "resizes_input", False)
+        self.logger = logger
+        self.stats_interval = stats_interval
+
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.flagged = 0
+        self.confirmed = 0
+        self.last_stats_time = time.time()
+
+    @property
+    def imgsz(self):
+        return self.confirm.imgsz
+
+    @property
+    def confidence(self):
+        return self.confirm.confidence
+
+    @confidence.setter
+    def confidence(self, value):
+        self.confirm.confidence = value
+
+    def detect(self, frame):
+        return [box[:4] for box in self.detect_scored(frame)]
+
+    def detect_scored(self, frame):
+        return self.detect_batch_scored([frame])[0]
+
+    def detect_batch(self, frames):
+        return [[box[:4] for box in boxes] for boxes in self.detect_batch_scored(frames)]
+
+    def detect_batch_scored(self, frames):
+        screened = self.screen.detect_batch_scored(frames)
+        flagged = [i for i, boxes in enumerate(screened) if boxes]
+        results = [[] for _ in frames]
+        if flagged:
+            regions = [self._region(frames[i], screened[i]) for i in flagged]
+            crops = [frames[i][y1:y2, x1:x2] for i, (x1, y1, x2, y2) in zip(flagged, regions)]
+            confirmed = self.confirm.detect_batch_scored(crops)
+            for i, (x1, y1, _, _), boxes in zip(flagged, regions, confirmed):
+                results[i] = [(bx1 + x1, by1 + y1, bx2 + x1, by2 + y1, conf)
+                              for (bx1, by1, bx2, by2, conf) in boxes]
+
+        with self.lock:
+            self.frames += len(frames)
+            self.flagged += len(flagged)
+            self.confirmed += sum(1 for humans in results if humans)
+        if self.logger is not None and time.time() - self.last_stats_time >= self.stats_interval:
+            self.log_stats()
+        return results
+
+    def warm_up(self, width=640, height=480):
+        # A blank frame never gets past the screen, so warm both stages directly
+        return self.screen.warm_up(width, height) + self.confirm.warm_up(width, height)
+
+    def _region(self, frame, boxes):
+        # Padded union of the screen boxes; close to the whole frame means just use the frame
+        h, w = frame.shape[:2]
+        if self.confirm_on == "frame":
+            return (0, 0, w, h)
+        x1 = min(box[0] for box in boxes)
+        y1 = min(box[1] for box in boxes)
+        x2 = max(box[2] for box in boxes)
+        y2 = max(box[3] for box in boxes)
+        pad_x = int((x2 - x1) * self.crop_padding)
+        pad_y = int((y2 - y1) * self.crop_padding)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(w, x2 + pad_x), min(h, y2 + pad_y)
+        if (x2 - x1) * (y2 - y1) >= self.full_frame_ratio * w * h:
+            return (0, 0, w, h)
+        return (x1, y1, x2, y2)
+
+    def stats(self):
+        # Hit rates, plus the saving against running the confirm model on every
+        # frame, estimated from its measured cost per image
+        with self.lock:
+            frames, flagged, confirmed = self.frames, self.flagged, self.confirmed
+        screen_time = self.screen.predict_time.total
+        confirm_time = self.confirm.predict_time.total
+        confirm_images = self.confirm.frames_inferred
+        per_image = confirm_time / confirm_images if confirm_images else 0.0
+        always_heavy = frames * per_image
+        return {
+            "frames": frames,
+            "screen_hit_rate": flagged / frames if frames else 0.0,
+            "confirm_rate": confirmed / flagged if flagged else 0.0,
+            "heavy_runs_saved": 1 - confirm_images / frames if frames else 0.0,
+            "compute_saved": 1 - (screen_time + confirm_time) / always_heavy if always_heavy else 0.0,
+        }
+
+    def log_stats(self):
+        self.last_stats_time = time.time()
+        stats = self.stats()
+        if not stats["frames"]:
+            return
+        self.logger.info(
+            f"Cascade: frames={stats['frames']} screen hits={stats['screen_hit_rate']:.1%} "
+            f"confirmed={stats['confirm_rate']:.1%} of hits | heavy runs saved {stats['heavy_runs_saved']:.1%}, "
+            f"compute saved {stats['compute_saved']:.1%} | screen {self.screen.predict_time.summary()} | "
+            f"confirm {self.confirm.predict_time.summary()}"
+        )
+
+    def collect_metrics(self, writer):
+        self.screen.collect_metrics(writer, stage="screen")
+        self.confirm.collect_metrics(writer, stage="confirm")
+        with self.lock:
+            frames, flagged, confirmed = self.frames, self.flagged, self.confirmed
+        writer.counter("ssa_cascade_frames_total", "Frames screened by the cascade", frames)
+        writer.counter("ssa_cascade_flagged_total", "Frames flagged by the screen stage", flagged)
+        writer.counter("ssa_cascade_confirmed_total", "Flagged frames confirmed by the main model", confirmed)
+        writer.gauge("ssa_cascade_compute_saved_ratio", "Estimated compute saved against always running the main model",
+                     self.stats()["compute_saved"])
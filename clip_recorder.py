@@ -0,0 +1,245 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+class ClipManager:
+    # Owns the per-camera pre-roll buffers, the global memory cap and the
+    # thread that turns finished clips into video files. The cap covers the
+    # pre-rolls, clips being recorded and clips waiting for the writer. A
+    # frame in both a pre-roll and a clip is the same bytes object, so frames
+    # are reference-counted by id() and each one is counted once.
+    def __init__(self, settings, logger):
+        self.logger = logger
+        self.folder = settings.get("folder", "clips")
+        self.pre_roll = settings.get("pre_roll", 10)
+        self.post_roll = settings.get("post_roll", 10)
+        self.max_width = settings.get("max_width", 960)
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, settings.get("jpeg_quality", 70)]
+        self.fourcc = cv2.VideoWriter_fourcc(*settings.get("fourcc", "mp4v"))
+        self.extension = settings.get("extension", ".mp4")
+        self.max_clip_length = settings.get("max_clip_length", 60)
+        self.memory_cap = int(settings.get("memory_cap_mb", 512) * 1024 * 1024)
+        os.makedirs(self.folder, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.recorders = []
+        self.refs = {}
+        self.held_bytes = 0
+        self.evicted = 0
+        self.clip_frames_dropped = 0
+        self.clips = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="clip-writer", daemon=True)
+
+    def start(self):
+        self.writer.start()
+
+    def recorder(self, camera_id):
+        recorder = ClipRecorder(self, camera_id)
+        with self.lock:
+            self.recorders.append(recorder)
+        recorder.start()
+        return recorder
+
+    def remove(self, recorder):
+        with self.lock:
+            if recorder in self.recorders:
+                self.recorders.remove(recorder)
+            for _, jpeg in recorder.ring:
+                self._drop(jpeg)
+            recorder.ring.clear()
+
+    def close(self):
+        self.clips.put(None)
+        self.writer.join()
+
+    def _hold(self, jpeg):
+        key = id(jpeg)
+        if key in self.refs:
+            self.refs[key] += 1
+        else:
+            self.refs[key] = 1
+            self.held_bytes += len(jpeg)
+
+    def _drop(self, jpeg):
+        key = id(jpeg)
+        self.refs[key] -= 1
+        if not self.refs[key]:
+            del self.refs[key]
+            self.held_bytes -= len(jpeg)
+
+    def start_clip(self, recorder):
+        # A clip starts from the pre-roll and holds its frames until the
+        # writer is done with them
+        with self.lock:
+            clip = list(recorder.ring)
+            for _, jpeg in clip:
+                self._hold(jpeg)
+        return clip
+
+    def store(self, recorder, ts, jpeg, recording=False):
+        # Returns whether a recording clip may keep the frame too
+        with self.lock:
+            recorder.ring.append((ts, jpeg))
+            self._hold(jpeg)
+            if recording:
+                self._hold(jpeg)
+            while recorder.ring and ts - recorder.ring[0][0] > self.pre_roll:
+                self._drop(recorder.ring.popleft()[1])
+            self._enforce_cap()
+            if not recording:
+                return False
+            if self.held_bytes > self.memory_cap:
+                # Only clips are left over the cap: the clip skips the frame
+                # until the writer catches up, and it is just pre-roll again
+                self._drop(jpeg)
+                self.clip_frames_dropped += 1
+                self._enforce_cap()
+                return False
+            return True
+
+    def _enforce_cap(self):
+        # Over the cap: evict the oldest pre-roll frame across all cameras,
+        # which shortens the longest-idle pre-rolls first. Frames a clip also
+        # holds would free nothing, so they are left alone.
+        while self.held_bytes > self.memory_cap:
+            oldest = None
+            for r in self.recorders:
+                for i, (ts, jpeg) in enumerate(r.ring):
+                    if self.refs[id(jpeg)] == 1:
+                        if oldest is None or ts < oldest[0]:
+                            oldest = (ts, r, i)
+                        break
+            if oldest is None:
+                return
+            _, victim, i = oldest
+            jpeg = victim.ring[i][1]
+            del victim.ring[i]
+            self._drop(jpeg)
+            self.evicted += 1
+
+    def _write_loop(self):
+        while True:
+            item = self.clips.get()
+            if item is None:
+                return
+            camera_id, alarm_time, frames = item
+            try:
+                self._write_clip(camera_id, alarm_time, frames)
+            except Exception:
+                self.logger.exception(f"Failed to write clip for {camera_id}")
+            finally:
+                with self.lock:
+                    for _, jpeg in frames:
+                        self._drop(jpeg)
+
+    def _write_clip(self, camera_id, alarm_time, frames):
+        if not frames:
+            return
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(alarm_time))
+        filename = os.path.join(self.folder, f"{camera_id}_clip_{stamp}{self.extension}")
+        suffix = 1
+        while os.path.exists(filename):
+            filename = os.path.join(self.folder, f"{camera_id}_clip_{stamp}-{suffix}{self.extension}")
+            suffix += 1
+
+        duration = frames[-1][0] - frames[0][0]
+        fps = min(30.0, max(1.0, (len(frames) - 1) / duration)) if duration > 0 else 1.0
+        writer = None
+        for _, jpeg in frames:
+            image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            if writer is None:
+                size = (image.shape[1], image.shape[0])
+                writer = cv2.VideoWriter(filename, self.fourcc, fps, size)
+            if (image.shape[1], image.shape[0]) != size:
+                image = cv2.resize(image, size)
+            writer.write(image)
+        if writer is None:
+            return
+        writer.release()
+        with self.lock:
+            held, evicted, dropped = self.held_bytes, self.evicted, self.clip_frames_dropped
+        self.logger.info(f"Clip saved: {filename} ({len(frames)} frames, {duration:.1f}s at {fps:.1f} fps) "
+                         f"| buffered={held / 1e6:.1f}MB evicted={evicted} clip_frames_dropped={dropped}")
+
+class ClipRecorder(threading.Thread):
+    # Per-camera recorder: frames are pushed from the capture side, encoded
+    # here, and kept as a short JPEG ring until an alarm turns them into a clip
+    def __init__(self, manager, camera_id):
+        super().__init__(name=f"clip-{camera_id}", daemon=True)
+        self.manager = manager
+        self.camera_id = camera_id
+        self.frames = queue.Queue(maxsize=8)
+        self.ring = deque()
+        self.triggered = threading.Event()
+        self.clip = None
+        self.alarm_time = 0
+        self.record_until = 0
+        self.dropped = 0
+        self.running = True
+
+    def push(self, frame, ts, owned=True):
+        # Downscale right away so the queue never holds full-resolution frames;
+        # frames we don't own (shared-memory views) are copied
+        h, w = frame.shape[:2]
+        if self.manager.max_width and w > self.manager.max_width:
+            scale = self.manager.max_width / w
+            frame = cv2.resize(frame, (self.manager.max_width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        elif not owned:
+            frame = frame.copy()
+        try:
+            self.frames.put_nowait((frame, ts))
+        except queue.Full:
+            self.dropped += 1
+
+    def trigger(self):
+        self.triggered.set()
+
+    def run(self):
+        while self.running:
+            try:
+                frame, ts = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                frame = None
+
+            if self.triggered.is_set():
+                self.triggered.clear()
+                if self.clip is None:
+                    self.clip = self.manager.start_clip(self)
+                    self.alarm_time = time.time()
+                # A new alarm during the post-roll extends the clip
+                self.record_until = time.time() + self.manager.post_roll
+
+            if frame is not None:
+                ok, jpeg = cv2.imencode(".jpg", frame, self.manager.encode_params)
+                if ok:
+                    jpeg = jpeg.tobytes()
+                    if self.manager.store(self, ts, jpeg, recording=self.clip is not None):
+                        self.clip.append((ts, jpeg))
+
+            if self.clip is not None:
+                if time.time() >= self.record_until:
+                    self._finish_clip()
+                elif time.time() - self.alarm_time >= self.manager.max_clip_length:
+                    # Alarms that keep extending the post-roll get a series of
+                    # clips, so each one can be written and freed
+                    self._finish_clip()
+                    self.clip = []
+                    self.alarm_time = time.time()
+        self._finish_clip()
+
+    def _finish_clip(self):
+        if self.clip:
+            self.manager.clips.put((self.camera_id, self.alarm_time, self.clip))
+        self.clip = None
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=5)
+        self.manager.remove(self)
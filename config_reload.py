@@ -0,0 +1,68 @@
+import os
+import signal
+import threading
+import yaml
+
+CONFIG_PATH = "config.yaml"
+
+# Read by the camera threads on every frame: applied in place
+# (frame_downscale, min_box_height, detection_frames_required, skip_frames,
+# alarm_cooldown, stats_interval, detection_confidence, ...).
+# Held by each camera's components: pushed into the running cameras, which
+# keep their streams open (CameraHandler.configure).
+HANDLER_KEYS = ("motion", "tracker", "tiling", "headless", "detection_frames_required")
+# Decide how a camera's stream is opened: every camera is restarted, the model is kept.
+CAPTURE_KEYS = ("shared_memory_capture", "stream_watchdog", "keyframe_decode")
+# The same for one camera's entry: only that camera is restarted. Its other
+# keys (frame_downscale, priority, roi, motion, ...) apply in place.
+CAMERA_CAPTURE_KEYS = ("detect_url", "index", "capture_url", "replay_speed", "stream_watchdog", "keyframe_decode")
+# Owned by process-wide services: only take effect after a restart.
+RESTART_KEYS = ("yolo_model_path", "detector_backend", "cascade", "inference_batching", "inference_budget",
+                "evidence_writer", "clip_recorder", "preview_server", "metrics_server", "workers",
+                "log_folder", "capture_folder", "event_db", "alarm_sound_file", "watch_config")
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+class ConfigWatcher:
+    # Reports when the config file should be reloaded: its modification time
+    # changed, or a reload was requested (SIGHUP where available)
+    def __init__(self, path, logger, interval=2.0):
+        self.path = path
+        self.logger = logger
+        self.interval = interval
+        self.mtime = self._mtime()
+        self.last_check = 0.0
+        self.requested = threading.Event()
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.requested.set())
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self, now):
+        # Returns the new config, or None when nothing changed or it doesn't parse
+        if not self.requested.is_set():
+            if now - self.last_check < self.interval:
+                return None
+            self.last_check = now
+            mtime = self._mtime()
+            if mtime is None or mtime == self.mtime:
+                return None
+            self.mtime = mtime
+        self.requested.clear()
+        try:
+            cfg = load_config(self.path)
+            if not isinstance(cfg, dict) or not isinstance(cfg.get("cameras"), list):
+                raise ValueError("no camera list")
+            camera_ids = [cam_cfg["id"] for cam_cfg in cfg["cameras"]]
+            if len(set(camera_ids)) != len(camera_ids):
+                raise ValueError("duplicate camera ids")
+            return cfg
+        except Exception as e:
+            self.logger.error(f"Config reload failed, keeping the running config: {e}")
+            return None
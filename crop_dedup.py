@@ -0,0 +1,84 @@
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from stats import TimingStats, LATENCY_BUCKETS
+
+def dhash(image, size=8):
+    # Difference hash: size x size bits of "brighter than the pixel to the
+    # right" on a grayscale thumbnail; robust to scale, JPEG noise and small shifts
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), "big")
+
+def box_iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+class CropIndex:
+    # Recent saved crops per camera, oldest first, at most max_entries each; the
+    # oldest saved crop is evicted first (FIFO), and a match does not move or
+    # refresh an entry, which keeps the list in save order for lookup. A crop
+    # is a duplicate of one saved less than max_age seconds ago when their
+    # hashes are within max_distance bits and their boxes overlap by at least
+    # min_iou: the same person in the same place. lookup() then returns the
+    # earlier file. Entries age from when their file was saved, so a person
+    # who stays put is saved again every max_age seconds, and a new intrusion
+    # elsewhere in the frame is never folded into an old capture. A miss is
+    # recorded right away under the filename it is about to be saved as, so a
+    # near-identical crop on another encoder thread already matches it.
+    def __init__(self, settings=None):
+        settings = settings or {}
+        self.max_distance = settings.get("max_distance", 6)
+        self.max_entries = settings.get("max_entries", 256)
+        self.max_age = settings.get("max_age", 120)
+        self.min_iou = settings.get("min_iou", 0.5)
+        self.lock = threading.Lock()
+        self.cameras = {}
+        self.lookups = 0
+        self.duplicates = 0
+        self.lookup_time = TimingStats(buckets=LATENCY_BUCKETS)
+
+    def lookup(self, camera_id, crop, box, filename):
+        # Returns (key, filename of the matching crop or None)
+        start = time.perf_counter()
+        key = (dhash(crop), tuple(box))
+        now = time.time()
+        match = None
+        with self.lock:
+            self.lookups += 1
+            entries = self.cameras.setdefault(camera_id, OrderedDict())
+            for (hash_, saved_box), (saved, ts) in reversed(entries.items()):
+                if now - ts > self.max_age:
+                    break
+                if (hash_ ^ key[0]).bit_count() <= self.max_distance and box_iou(saved_box, box) >= self.min_iou:
+                    match = saved
+                    self.duplicates += 1
+                    break
+            if match is None:
+                self._add(entries, key, filename, now)
+        self.lookup_time.add(time.perf_counter() - start)
+        return key, match
+
+    def _add(self, entries, key, filename, ts):
+        entries[key] = (filename, ts)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def update(self, camera_id, key, filename):
+        # The crop was saved under another name, or not at all (filename None)
+        with self.lock:
+            entries = self.cameras.get(camera_id, {})
+            if key in entries:
+                if filename is None:
+                    del entries[key]
+                else:
+                    entries[key] = (filename, entries[key][1])
+
+    def dedup_ratio(self):
+        return self.duplicates / self.lookups if self.lookups else 0.0
@@ -0,0 +1,278 @@
+# Long-running detection daemon. The model is loaded and warmed up once;
+# start/stop only open and close the cameras, and arm/disarm only switch the
+# alarm, so protection resumes without paying for imports and model loading.
+# Controlled with one JSON object per line on a localhost TCP socket:
+#
+#   {"cmd": "status"} / "start" / "stop" / "arm" / "disarm" / "shutdown"
+#
+#   python daemon.py
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import socketserver
+from config_reload import CONFIG_PATH, ConfigWatcher, load_config
+
+PROCESS_START = time.perf_counter()
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Settings the loaded detector was built from
+DETECTOR_KEYS = ("yolo_model_path", "detector_backend", "cascade")
+COMMANDS = ("status", "start", "stop", "arm", "disarm", "shutdown")
+
+def send_command(cmd, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=5.0):
+    # Client side: returns the daemon's reply; raises OSError when it isn't running
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps({"cmd": cmd}) + "\n").encode())
+        reply = sock.makefile("rb").readline()
+    if not reply:
+        raise ConnectionError("No reply from the detection daemon")
+    return json.loads(reply)
+
+class DetectionDaemon:
+    def __init__(self, cfg, logger):
+        self.cfg = cfg
+        self.logger = logger
+        daemon_cfg = cfg.get("daemon", {})
+        self.autostart = daemon_cfg.get("autostart", True)
+        self.armed = threading.Event()
+        if daemon_cfg.get("armed", True):
+            self.armed.set()
+        self.loaded = threading.Event()
+        self.shutdown_event = threading.Event()
+        self.lock = threading.Lock()
+        self.detector = None
+        self.alarm = None
+        self.event_db_path = None
+        self.pipeline = None
+        self.stop_event = None
+        self.load_error = None
+        # Seconds: imports, model, warm_up, cold_start (process start to ready),
+        # rearm (last start command to a decision on every camera)
+        self.timings = {}
+
+    def load(self):
+        try:
+            self._load()
+        except Exception as e:
+            # Keep serving, so clients can see why start fails
+            self.load_error = str(e)
+            self.logger.exception("Detection daemon: loading the detector failed")
+        finally:
+            self.loaded.set()
+
+    def _load(self):
+        # Heavy modules (OpenCV, the model runtime) are only imported here
+        t_start = time.perf_counter()
+        from alarm import AlarmManager
+        from event_store import EventStore
+        from backends import export_model
+        from pipeline import build_detector
+        t_imports = time.perf_counter()
+
+        cfg = self.cfg
+        if cfg.get("workers", 0) > 0:
+            self.logger.warning("Detection daemon: cameras run in this process, 'workers' is ignored")
+            cfg["workers"] = 0
+        os.makedirs(cfg["capture_folder"], exist_ok=True)
+        self.event_db_path = os.path.join(cfg["log_folder"], cfg["event_db"])
+        EventStore(self.event_db_path).close()
+        backend = cfg.get("detector_backend", {})
+        if backend.get("name", "ultralytics") != "ultralytics":
+            export_model(cfg["yolo_model_path"], backend["name"], backend.get("imgsz", 640), backend.get("int8", False))
+        detector = build_detector(cfg, self.logger)
+        self.alarm = AlarmManager(cfg["alarm_sound_file"], cfg.get("alarm_dispatcher", {}), self.logger)
+        self.alarm.start()
+        t_model = time.perf_counter()
+
+        warm_up = detector.warm_up()
+        t_ready = time.perf_counter()
+        self.detector = detector
+        self.timings.update(
+            imports=t_imports - t_start,
+            model=t_model - t_imports,
+            warm_up=t_ready - t_model,
+            cold_start=t_ready - PROCESS_START,
+        )
+        self.logger.info(
+            f"Detection daemon ready in {self.timings['cold_start']:.2f}s "
+            f"(imports {self.timings['imports']:.2f}s, model {self.timings['model']:.2f}s, "
+            f"warm-up {self.timings['warm_up']:.2f}s, first predict {warm_up * 1000:.0f}ms)"
+        )
+
+    def start(self):
+        self.loaded.wait()
+        if self.detector is None:
+            return {"ok": False, "error": f"detector not loaded: {self.load_error}"}
+        from pipeline import Pipeline
+        with self.lock:
+            if self.pipeline is not None:
+                return {"ok": False, "error": "detection is already running"}
+            t_start = time.perf_counter()
+            stop_event = threading.Event()
+            pipeline = Pipeline(self.cfg["cameras"], self.cfg, self.detector, self.alarm, self.event_db_path,
+                                self.logger, stop_event, armed=self.armed)
+            try:
+                pipeline.start()
+            except Exception as e:
+                stop_event.set()
+                pipeline.join()
+                return {"ok": False, "error": str(e)}
+            self.pipeline, self.stop_event = pipeline, stop_event
+        threading.Thread(target=self._time_rearm, args=(pipeline, stop_event, t_start), daemon=True).start()
+        return {"ok": True}
+
+    def _time_rearm(self, pipeline, stop_event, t_start):
+        # Protection has resumed once every camera has made a decision on a frame
+        while not stop_event.is_set():
+            if all(t.frames_processed for t in pipeline.camera_threads):
+                self.timings["rearm"] = time.perf_counter() - t_start
+                self.logger.info(f"Detection daemon: all cameras live {self.timings['rearm']:.2f}s after start")
+                return
+            time.sleep(0.01)
+
+    def stop(self):
+        with self.lock:
+            if self.pipeline is None:
+                return {"ok": False, "error": "detection is not running"}
+            self.stop_event.set()
+            self.pipeline.join()
+            self.pipeline = self.stop_event = None
+        self.logger.info("Detection daemon: cameras stopped, model kept loaded")
+        return {"ok": True}
+
+    def arm(self):
+        self.armed.set()
+        self.logger.info("Detection daemon: armed")
+        return {"ok": True}
+
+    def disarm(self):
+        self.armed.clear()
+        self.logger.info("Detection daemon: disarmed, detection keeps running without alarms")
+        return {"ok": True}
+
+    def shutdown(self):
+        self.shutdown_event.set()
+        return {"ok": True}
+
+    def status(self):
+        pipeline = self.pipeline
+        cameras = {}
+        if pipeline is not None:
+            for t in list(pipeline.camera_threads):
+                cameras[t.camera_id] = {
+                    "alive": t.is_alive(),
+                    "frames_processed": t.frames_processed,
+                    "alarms": t.alarms,
+                    "humans": len(t.last_humans),
+                }
+        return {
+            "ok": True,
+            "state": "loading" if not self.loaded.is_set() else "running" if pipeline is not None else "stopped",
+            "armed": self.armed.is_set(),
+            "error": self.load_error,
+            "cameras": cameras,
+            "timings": {key: round(value, 3) for key, value in self.timings.items()},
+            "uptime": round(time.perf_counter() - PROCESS_START, 1),
+        }
+
+    def handle(self, cmd):
+        if cmd not in COMMANDS:
+            return {"ok": False, "error": f"unknown command: {cmd}"}
+        return getattr(self, cmd)()
+
+    def apply_config(self, new_cfg):
+        # Same rules as main.py while running; stopped, the next start uses it.
+        # The loaded detector is kept either way.
+        new_cfg["workers"] = 0
+        with self.lock:
+            if self.pipeline is not None:
+                self.pipeline.reload(new_cfg)
+                return
+            for key in DETECTOR_KEYS:
+                if self.cfg.get(key) != new_cfg.get(key):
+                    self.logger.warning(f"Config reload: '{key}' changed, restart the daemon to apply it")
+                if key in self.cfg:
+                    new_cfg[key] = self.cfg[key]
+                else:
+                    new_cfg.pop(key, None)
+            self.cfg.update(new_cfg)
+            for key in [key for key in self.cfg if key not in new_cfg]:
+                del self.cfg[key]
+        if self.detector is not None:
+            self.detector.confidence = self.cfg["detection_confidence"]
+        self.logger.info("Config reloaded, applied at the next start")
+
+    def run(self):
+        # Main thread: load, optionally start, then look after windows and config changes
+        headless = self.cfg.get("headless", False)
+        watcher = ConfigWatcher(CONFIG_PATH, self.logger) if self.cfg.get("watch_config", True) else None
+        self.load()
+        if self.autostart and self.detector is not None:
+            self.start()
+        while not self.shutdown_event.is_set():
+            if watcher is not None:
+                new_cfg = watcher.poll(time.time())
+                if new_cfg is not None:
+                    self.apply_config(new_cfg)
+            # A closed camera window stops the cameras, as in main.py
+            if self.stop_event is not None and self.stop_event.is_set():
+                self.stop()
+            if headless or self.pipeline is None:
+                self.shutdown_event.wait(0.5)
+            else:
+                import cv2
+                cv2.waitKey(100)
+        if self.pipeline is not None:
+            self.stop()
+        if self.alarm is not None:
+            self.alarm.close()
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.detection.handle(json.loads(line).get("cmd"))
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host, port, detection):
+        super().__init__((host, port), ControlHandler)
+        self.detection = detection
+
+def main():
+    cfg = load_config(CONFIG_PATH)
+    from logger import setup_logger
+    logger = setup_logger(cfg["log_folder"])
+    daemon_cfg = cfg.get("daemon", {})
+    host, port = daemon_cfg.get("host", DEFAULT_HOST), daemon_cfg.get("port", DEFAULT_PORT)
+
+    daemon = DetectionDaemon(cfg, logger)
+    try:
+        server = ControlServer(host, port, daemon)
+    except OSError as e:
+        logger.error(f"Detection daemon: cannot listen on {host}:{port} ({e}); is it already running?")
+        sys.exit(1)
+    # Listen first, so clients see "loading" instead of a refused connection
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Detection daemon listening on {host}:{port}")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        logger.info("KeyboardInterrupt detected. Exiting...")
+        if daemon.pipeline is not None:
+            daemon.stop()
+    finally:
+        server.shutdown()
+        server.server_close()
+    logger.info("Detection daemon stopped")
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@ import cv2
 from ultralytics import YOLO
 import time
 import os
-import csv
 import winsound
 from dotenv import load_dotenv
+from event_store import EventStore, make_event
+from camera import open_capture
+from stream_health import StreamWatchdog
 
 load_dotenv()
 
@@ -13,23 +15,22 @@ RTSP_URL = os.getenv("RTSP_URL")
 ALARM_COOLDOWN = int(os.getenv("ALARM_COOLDOWN", 5))
 DETECTION_FRAMES_REQUIRED = int(os.getenv("DETECTION_FRAMES_REQUIRED", 2))
 CAPTURE_FOLDER = os.getenv("CAPTURE_FOLDER", "captures")
-LOG_FILE = os.getenv("LOG_FILE", "detection_log.csv")
+EVENT_DB = os.getenv("EVENT_DB", "events.db")
 MODEL_PATH = os.getenv("MODEL_PATH", "yolov8n.pt")
 
 os.makedirs(CAPTURE_FOLDER, exist_ok=True)
 model = YOLO(MODEL_PATH)
 
 # OPEN CAMERA
-cap = cv2.VideoCapture(RTSP_URL)
-if not cap.isOpened():
+# A dropped stream is reconnected with backoff instead of spinning on failed reads
+watchdog = StreamWatchdog({"read_timeout": float(os.getenv("READ_TIMEOUT", 10))})
+cap = open_capture(RTSP_URL, watchdog.read_timeout)
+if cap is None:
     print(f"ERROR: Cannot connect to Dahua camera {CAMERA_ID}")
     exit()
 
-# LOG FILE SETUP
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Timestamp", "CameraID", "ImageFile"])
+# EVENT STORE SETUP
+store = EventStore(EVENT_DB)
 
 print(f"Starting human detection on {CAMERA_ID}. Press 'q' to quit.")
 
@@ -40,8 +41,15 @@ detection_counter = 0
 while True:
     ret, frame = cap.read()
     if not ret:
-        print("Failed to grab frame")
+        if watchdog.read_failed():
+            print(f"Stream {CAMERA_ID} stalled, reconnecting (reconnects so far: {watchdog.reconnects})")
+            cap.release()
+            cap = watchdog.reconnect(lambda: open_capture(RTSP_URL, watchdog.read_timeout),
+                                     lambda delay: time.sleep(delay))
         continue
+    if watchdog.state != "live":
+        print(f"Stream {CAMERA_ID} live")
+    watchdog.frame_read()
 
     results = model(frame)
 
@@ -73,6 +81,7 @@ while True:
             winsound.Beep(1000, 400)
             last_alarm_time = current_time
 
+            events = []
             for r in results:
                 for obj in r.boxes:
                     cls = int(obj.cls[0])
@@ -83,10 +92,9 @@ while True:
                         filename = os.path.join(CAPTURE_FOLDER, f"{CAMERA_ID}_human_{timestamp}.jpg")
                         cv2.imwrite(filename, cropped)
                         print(f"Captured cropped image: {filename}")
-
-                        with open(LOG_FILE, "a", newline="") as f:
-                            writer = csv.writer(f)
-                            writer.writerow([timestamp, CAMERA_ID, filename])
+                        events.append(make_event(CAMERA_ID, (x1, y1, x2, y2), float(obj.conf[0]),
+                                                 frame.shape, filename))
+            store.add_events(events)
 
         human_present = True
     elif detection_counter == 0:
@@ -97,5 +105,6 @@ while True:
         break
 
 cap.release()
+store.close()
 cv2.destroyAllWindows()
 print("Program terminated.")
@@ -1,18 +1,54 @@
-from ultralytics import YOLO
+import time
+import threading
+import numpy as np
+from stats import TimingStats, LATENCY_BUCKETS
+from backends import BACKENDS
 
 class HumanDetector:
-    def __init__(self, model_path, confidence=0.5):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, confidence=0.5, backend="ultralytics", imgsz=640, int8=False, threads=0):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown detector backend: {backend}")
+        self.backend = BACKENDS[backend](model_path, imgsz=imgsz, int8=int8, threads=threads)
+        self.backend_name = backend
+        self.imgsz = imgsz
         self.confidence = confidence
+        # Exported backends resize straight from the full frame, so callers
+        # should not downscale first
+        self.resizes_input = self.backend.resizes_input
+        # YOLO.predict is not thread-safe; camera threads share one model
+        self.lock = threading.Lock()
+        self.predict_time = TimingStats(buckets=LATENCY_BUCKETS)
+        self.frames_inferred = 0
 
     def detect(self, frame):
-        results = self.model.predict(frame, conf=self.confidence, verbose=False)
-        humans = []
-        for result in results:
-            for box in result.boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                if cls == 0 and conf >= self.confidence:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    humans.append((x1, y1, x2, y2))
+        return [box[:4] for box in self.detect_scored(frame)]
+
+    def detect_scored(self, frame):
+        # Same as detect() with the confidence appended: (x1, y1, x2, y2, conf)
+        return self.detect_batch_scored([frame])[0]
+
+    def detect_batch(self, frames):
+        return [[box[:4] for box in boxes] for boxes in self.detect_batch_scored(frames)]
+
+    def detect_batch_scored(self, frames):
+        with self.lock:
+            start = time.perf_counter()
+            humans = self.backend.predict(frames, self.confidence)
+            self.predict_time.add(time.perf_counter() - start)
+            self.frames_inferred += len(frames)
         return humans
+
+    def warm_up(self, width=640, height=480):
+        # The first predict pays for lazy allocations and kernel selection; run
+        # it on a blank frame before the cameras start and keep it out of the stats
+        frame = np.zeros((height, width, 3), np.uint8)
+        with self.lock:
+            start = time.perf_counter()
+            self.backend.predict([frame], self.confidence)
+            return time.perf_counter() - start
+
+    def collect_metrics(self, writer, **labels):
+        writer.histogram("ssa_detector_predict_seconds", "Duration of one model predict call (single or batched)",
+                         self.predict_time, backend=self.backend_name, **labels)
+        writer.counter("ssa_detector_frames_total", "Frames run through the model", self.frames_inferred,
+                       backend=self.backend_name, **labels)
@@ -0,0 +1,194 @@
+import os
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera_id TEXT NOT NULL,
+    x1 INTEGER,
+    y1 INTEGER,
+    x2 INTEGER,
+    y2 INTEGER,
+    confidence REAL,
+    frame_width INTEGER,
+    frame_height INTEGER,
+    capture_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_camera_ts ON events (camera_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+"""
+
+COLUMNS = ("ts", "camera_id", "x1", "y1", "x2", "y2", "confidence", "frame_width", "frame_height", "capture_path")
+
+def make_event(camera_id, box=None, confidence=None, frame_shape=None, capture_path=None, ts=None):
+    x1, y1, x2, y2 = box if box is not None else (None, None, None, None)
+    height, width = frame_shape[:2] if frame_shape is not None else (None, None)
+    return (ts if ts is not None else time.time(), camera_id, x1, y1, x2, y2,
+            confidence, width, height, capture_path)
+
+class EventStore:
+    # Detection events in SQLite (WAL mode), indexed by camera and timestamp
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def add_events(self, events):
+        # One transaction per batch; each event is a tuple in COLUMNS order
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                events,
+            )
+
+    def events(self, camera_id=None, since=None, until=None, limit=None):
+        where, params = self._filter(camera_id, since, until)
+        sql = f"SELECT * FROM events{where} ORDER BY ts"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._query(sql, params)
+
+    def latest(self, n=10, camera_id=None):
+        where, params = self._filter(camera_id, None, None)
+        return self._query(f"SELECT * FROM events{where} ORDER BY ts DESC LIMIT ?", params + [n])
+
+    def counts_per_hour(self, camera_id=None, since=None, until=None):
+        # Hours are bucketed on the local clock, as format_time prints them:
+        # each second minus its local seconds past the hour, which also lines
+        # up in half-hour timezones; (hour_start epoch seconds, count) pairs
+        where, params = self._filter(camera_id, since, until)
+        local = "CAST(strftime('%s', CAST(ts AS INTEGER), 'unixepoch', 'localtime') AS INTEGER)"
+        sql = (f"SELECT CAST(ts AS INTEGER) - {local} % 3600 AS hour, COUNT(*) AS events "
+               f"FROM events{where} GROUP BY hour ORDER BY hour")
+        return [(row["hour"], row["events"]) for row in self._query(sql, params)]
+
+    def import_csv(self, csv_path, batch_size=10000):
+        # One-shot import of the old detection_log.csv (Timestamp, CameraID, ImageFile)
+        imported = 0
+        batch = []
+        with open(csv_path, newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    ts = time.mktime(time.strptime(row["Timestamp"], "%Y%m%d_%H%M%S"))
+                except (KeyError, ValueError):
+                    continue
+                batch.append(make_event(row["CameraID"], capture_path=row.get("ImageFile"), ts=ts))
+                if len(batch) >= batch_size:
+                    self.add_events(batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            self.add_events(batch)
+            imported += len(batch)
+        return imported
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _filter(self, camera_id, since, until):
+        clauses, params = [], []
+        if camera_id:
+            clauses.append("camera_id = ?")
+            params.append(camera_id)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _query(self, sql, params):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+# --- Command line ---
+
+def parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Unrecognised time: {value}")
+
+def format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+def print_events(rows):
+    for row in rows:
+        box = f"({row['x1']},{row['y1']},{row['x2']},{row['y2']})" if row["x1"] is not None else "-"
+        conf = f"{row['confidence']:.2f}" if row["confidence"] is not None else "-"
+        print(f"{format_time(row['ts'])}  {row['camera_id']:<10} box={box} conf={conf} {row['capture_path'] or ''}")
+
+def default_db_path():
+    try:
+        import yaml
+        with open("config.yaml") as f:
+            cfg = yaml.safe_load(f)
+        return os.path.join(cfg["log_folder"], cfg.get("event_db", "events.db"))
+    except (OSError, KeyError, ImportError):
+        return os.path.join("logs", "events.db")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the detection event store")
+    parser.add_argument("--db", default=None, help="database path (default: from config.yaml)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    events = sub.add_parser("events", help="events by camera and time range")
+    events.add_argument("--camera")
+    events.add_argument("--since", type=parse_time, help="'YYYY-MM-DD[ HH:MM[:SS]]' or epoch seconds")
+    events.add_argument("--until", type=parse_time)
+    events.add_argument("--limit", type=int)
+
+    hourly = sub.add_parser("hourly", help="event counts per hour")
+    hourly.add_argument("--camera")
+    hourly.add_argument("--since", type=parse_time)
+    hourly.add_argument("--until", type=parse_time)
+
+    latest = sub.add_parser("latest", help="latest N events")
+    latest.add_argument("-n", type=int, default=10)
+    latest.add_argument("--camera")
+
+    importer = sub.add_parser("import", help="import an existing detection_log.csv")
+    importer.add_argument("csv_path")
+
+    args = parser.parse_args(argv)
+    store = EventStore(args.db or default_db_path())
+    try:
+        if args.command == "events":
+            print_events(store.events(args.camera, args.since, args.until, args.limit))
+        elif args.command == "hourly":
+            for hour, count in store.counts_per_hour(args.camera, args.since, args.until):
+                print(f"{format_time(hour)}  {count}")
+        elif args.command == "latest":
+            print_events(store.latest(args.n, args.camera))
+        elif args.command == "import":
+            print(f"Imported {store.import_csv(args.csv_path)} events from {args.csv_path}")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
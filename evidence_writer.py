@@ -0,0 +1,186 @@
+import os
+import time
+import queue
+import itertools
+import threading
+import cv2
+from stats import TimingStats
+from event_store import EventStore, make_event
+from crop_dedup import CropIndex
+
+class EvidenceWriter:
+    # Takes cropped person images off the camera threads: a pool of encoder
+    # threads JPEG-encodes and writes the crops, and a single sink thread
+    # records the events in the event store in batched transactions.
+    def __init__(self, capture_folder, event_db_path, logger, workers=2, queue_size=64,
+                 policy="drop", flush_interval=1.0, jpeg_quality=90, stats_interval=30, dedup=None):
+        self.capture_folder = capture_folder
+        self.store = EventStore(event_db_path)
+        self.logger = logger
+        self.policy = policy
+        self.flush_interval = flush_interval
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.stats_interval = stats_interval
+        # Near-duplicate crops are not encoded again; their events reference the earlier file
+        self.dedup = CropIndex(dedup) if dedup and dedup.get("enabled", True) else None
+
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.rows = queue.Queue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.encode_time = TimingStats()
+
+        self.encoders = [threading.Thread(target=self._encode_loop, name=f"evidence-encoder-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        self.sink = threading.Thread(target=self._sink_loop, name="evidence-sink", daemon=True)
+
+    def start(self):
+        for encoder in self.encoders:
+            encoder.start()
+        self.sink.start()
+
+    def submit(self, camera_id, crop, box=None, confidence=None, frame_shape=None):
+        # The crop must not be modified by the caller afterwards (pass a copy)
+        now = time.time()
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+        # Millisecond suffix plus a running counter: several crops in the same
+        # second (or the same alarm) never share a filename
+        filename = os.path.join(
+            self.capture_folder,
+            f"{camera_id}_human_{timestamp}_{int(now * 1000) % 1000:03d}_{next(self.sequence)}.jpg"
+        )
+        event = make_event(camera_id, box, confidence, frame_shape, ts=now)
+        job = (event, filename, crop)
+        if self.policy == "block":
+            self.jobs.put(job)
+        else:
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                with self.lock:
+                    self.dropped += 1
+                self.logger.warning(f"Evidence queue full, dropped crop from {camera_id}")
+                # The detection is still recorded, just without a capture
+                self.rows.put(event)
+                return None
+        with self.lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self.jobs.qsize())
+        return filename
+
+    def close(self):
+        for _ in self.encoders:
+            self.jobs.put(None)
+        for encoder in self.encoders:
+            encoder.join()
+        self.rows.put(None)
+        self.sink.join()
+        self.store.close()
+
+    def _encode_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            event, filename, crop = job
+            camera_id = event[1]
+            key = None
+            box = event[2:6]
+            if self.dedup is not None and box[0] is not None:
+                key, original = self.dedup.lookup(camera_id, crop, box, filename)
+                if original is not None:
+                    self.logger.info(f"Duplicate crop from {camera_id}, same as {original}")
+                    self.rows.put(event[:-1] + (original,))
+                    continue
+            start = time.perf_counter()
+            try:
+                ok, jpeg = cv2.imencode(".jpg", crop, self.encode_params)
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                saved = self._write_new(filename, jpeg)
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                self.logger.error(f"Failed to save crop from {camera_id}: {e}")
+                if key is not None:
+                    self.dedup.update(camera_id, key, None)
+                self.rows.put(event)
+                continue
+            if key is not None and saved != filename:
+                self.dedup.update(camera_id, key, saved)
+            filename = saved
+            self.encode_time.add(time.perf_counter() - start)
+            with self.lock:
+                self.written += 1
+            self.logger.info(f"Cropped image saved: {filename}")
+            self.rows.put(event[:-1] + (filename,))
+
+    def _write_new(self, filename, jpeg):
+        # Exclusive create: an existing capture is never overwritten
+        base, ext = os.path.splitext(filename)
+        for attempt in itertools.count():
+            candidate = filename if attempt == 0 else f"{base}-{attempt}{ext}"
+            try:
+                with open(candidate, "xb") as f:
+                    f.write(jpeg.tobytes())
+                return candidate
+            except FileExistsError:
+                continue
+
+    def _sink_loop(self):
+        pending = []
+        last_flush = last_stats = time.time()
+        running = True
+        while running:
+            try:
+                row = self.rows.get(timeout=self.flush_interval)
+                if row is None:
+                    running = False
+                else:
+                    pending.append(row)
+            except queue.Empty:
+                pass
+            now = time.time()
+            if pending and (not running or now - last_flush >= self.flush_interval):
+                self._flush(pending)
+                pending = []
+                last_flush = now
+            if now - last_stats >= self.stats_interval or not running:
+                self.log_stats()
+                last_stats = now
+
+    def _flush(self, rows):
+        try:
+            self.store.add_events(rows)
+        except Exception as e:
+            self.logger.error(f"Failed to record {len(rows)} events in {self.store.path}: {e}")
+
+    def log_stats(self):
+        with self.lock:
+            if not self.submitted and not self.dropped:
+                return
+            self.logger.info(
+                f"Evidence writer: queued={self.jobs.qsize()} max_depth={self.max_depth} "
+                f"submitted={self.submitted} written={self.written} dropped={self.dropped} "
+                f"failed={self.failed} encode {self.encode_time.summary()}"
+                + (f" duplicates={self.dedup.duplicates} ({self.dedup.dedup_ratio():.1%}) "
+                   f"lookup {self.dedup.lookup_time.summary(1e6, 'us')}" if self.dedup is not None else "")
+            )
+
+    def collect_metrics(self, writer):
+        with self.lock:
+            written, dropped, failed = self.written, self.dropped, self.failed
+        writer.counter("ssa_evidence_written_total", "Evidence crops saved", written)
+        writer.counter("ssa_evidence_dropped_total", "Evidence crops dropped on a full queue", dropped)
+        writer.counter("ssa_evidence_failed_total", "Evidence crops that failed to encode or write", failed)
+        writer.gauge("ssa_evidence_queue_depth", "Crops waiting to be encoded", self.jobs.qsize())
+        if self.dedup is not None:
+            writer.counter("ssa_evidence_duplicates_total", "Near-duplicate crops referenced instead of saved",
+                           self.dedup.duplicates)
+            writer.histogram("ssa_evidence_dedup_lookup_seconds", "Perceptual-hash lookup time per crop",
+                             self.dedup.lookup_time)
@@ -0,0 +1,69 @@
+import threading
+import numpy as np
+
+class FrameBuffer:
+    # A pooled frame. Whoever holds it owns one reference: retain() before
+    # handing it to another holder, release() when done. At zero references
+    # the array goes back to its pool and will be overwritten.
+    __slots__ = ("array", "pool", "refs")
+
+    def __init__(self, array, pool):
+        self.array = array
+        self.pool = pool
+        self.refs = 1
+
+    def retain(self):
+        with self.pool.lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        pool = self.pool
+        with pool.lock:
+            self.refs -= 1
+            if self.refs == 0 and self.array.shape == pool.shape and len(pool.free) < pool.max_free:
+                pool.free.append(self.array)
+
+class FramePool:
+    # Reusable frame buffers of one shape (e.g. one camera's decode target or
+    # display buffer), so steady state allocates nothing. A shape change (new
+    # stream resolution) drops the free buffers. Counts allocations and the
+    # bytes copied into pooled frames for the per-frame stats.
+    def __init__(self, max_free=8):
+        self.max_free = max_free
+        self.lock = threading.Lock()
+        self.shape = None
+        self.free = []
+        self.allocations = 0
+        self.bytes_allocated = 0
+        self.bytes_copied = 0
+
+    def acquire(self, shape):
+        shape = tuple(shape)
+        with self.lock:
+            if shape != self.shape:
+                self.shape = shape
+                self.free = []
+            if self.free:
+                return FrameBuffer(self.free.pop(), self)
+            self.allocations += 1
+            self.bytes_allocated += int(np.prod(shape))
+        return FrameBuffer(np.empty(shape, np.uint8), self)
+
+    def adopt(self, array):
+        # Wraps an array allocated elsewhere (e.g. the first decoded frame)
+        with self.lock:
+            if array.shape != self.shape:
+                self.shape = array.shape
+                self.free = []
+            self.allocations += 1
+            self.bytes_allocated += array.nbytes
+        return FrameBuffer(array, self)
+
+    def copy(self, frame):
+        # A pooled copy of frame, e.g. to draw an overlay into
+        buffer = self.acquire(frame.shape)
+        np.copyto(buffer.array, frame)
+        with self.lock:
+            self.bytes_copied += frame.nbytes
+        return buffer
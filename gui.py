@@ -1,51 +1,141 @@
 import tkinter as tk
 from tkinter import messagebox
 import subprocess
-import os
-import signal
+import sys
+import threading
+from daemon import send_command, DEFAULT_HOST, DEFAULT_PORT
 
-# Path to your main.py script
-SCRIPT_PATH = "main.py"
+# Path to the detection daemon; it is started on the first Start click and
+# keeps the model loaded, so later Start/Stop clicks only open/close the cameras
+DAEMON_SCRIPT = "daemon.py"
+REFRESH_MS = 1000
+# Start opens every camera before replying; RTSP opens can take many seconds
+START_TIMEOUT = 120.0
 
 class HumanDetectionGUI:
-    def __init__(self, root):
+    def __init__(self, root, host=DEFAULT_HOST, port=DEFAULT_PORT):
         self.root = root
         self.root.title("Human Detection Control")
-        self.root.geometry("300x150")
-        self.process = None
+        self.root.geometry("320x300")
+        self.host = host
+        self.port = port
+        self.daemon_process = None
+        self.pending_start = False
+        # A start command runs on its own thread; its reply is shown by refresh()
+        self.starting = False
+        self.start_reply = None
 
         # Start button
         self.start_btn = tk.Button(root, text="Start Detection", command=self.start_detection, width=20)
-        self.start_btn.pack(pady=20)
+        self.start_btn.pack(pady=(15, 5))
 
         # Stop button
         self.stop_btn = tk.Button(root, text="Stop Detection", command=self.stop_detection, width=20)
-        self.stop_btn.pack(pady=10)
+        self.stop_btn.pack(pady=5)
 
-        # Exit button
+        # Arm / disarm: cameras keep running, only the alarm is switched
+        self.arm_btn = tk.Button(root, text="Arm", command=lambda: self.command("arm"), width=20)
+        self.arm_btn.pack(pady=5)
+        self.disarm_btn = tk.Button(root, text="Disarm", command=lambda: self.command("disarm"), width=20)
+        self.disarm_btn.pack(pady=5)
+
+        # Exit button (the daemon keeps running)
         self.exit_btn = tk.Button(root, text="Exit", command=self.exit_app, width=20)
-        self.exit_btn.pack(pady=10)
+        self.exit_btn.pack(pady=5)
+
+        self.status_label = tk.Label(root, text="", justify="left")
+        self.status_label.pack(pady=5)
+        self.refresh()
+
+    def send(self, cmd, timeout=5.0):
+        return send_command(cmd, self.host, self.port, timeout)
+
+    def command(self, cmd):
+        try:
+            reply = self.send(cmd)
+        except ConnectionRefusedError:
+            messagebox.showwarning("Warning", "Detection daemon is not running!")
+            return
+        except OSError as e:
+            messagebox.showwarning("Warning", f"Detection daemon is not responding: {e}")
+            return
+        if not reply["ok"]:
+            messagebox.showwarning("Warning", reply["error"])
+        self.refresh(schedule=False)
 
     def start_detection(self):
-        if self.process is None:
-            # Run main.py in a new process
-            self.process = subprocess.Popen(["python", SCRIPT_PATH])
-            messagebox.showinfo("Info", "Detection started!")
-        else:
-            messagebox.showwarning("Warning", "Detection is already running!")
+        try:
+            self.send("status")
+        except ConnectionRefusedError:
+            # No daemon yet: launch it, then send start once it answers
+            if self.daemon_process is None or self.daemon_process.poll() is not None:
+                self.daemon_process = subprocess.Popen([sys.executable, DAEMON_SCRIPT])
+            self.pending_start = True
+            self.status_label.config(text="Starting detection daemon...")
+            return
+        except OSError as e:
+            messagebox.showwarning("Warning", f"Detection daemon is not responding: {e}")
+            return
+        self.start_in_background()
+
+    def start_in_background(self):
+        # Keeps the Tk thread free while the daemon opens the cameras
+        if self.starting:
+            return
+        self.starting = True
+
+        def run():
+            try:
+                self.start_reply = self.send("start", timeout=START_TIMEOUT)
+            except OSError as e:
+                self.start_reply = {"ok": False, "error": f"start failed: {e}"}
+            self.starting = False
+
+        threading.Thread(target=run, daemon=True).start()
 
     def stop_detection(self):
-        if self.process is not None:
-            # Terminate the process
-            os.kill(self.process.pid, signal.SIGTERM)
-            self.process = None
-            messagebox.showinfo("Info", "Detection stopped!")
-        else:
-            messagebox.showwarning("Warning", "Detection is not running!")
+        self.pending_start = False
+        self.command("stop")
+
+    def refresh(self, schedule=True):
+        # Reschedule first so no error can end the status loop
+        if schedule:
+            self.root.after(REFRESH_MS, self.refresh)
+        try:
+            status = self.send("status")
+        except OSError:
+            status = None
+        if status is not None and self.pending_start and status["state"] != "loading":
+            self.pending_start = False
+            if status["state"] == "stopped":
+                self.start_in_background()
+        self.status_label.config(text=self.describe(status))
+        reply, self.start_reply = self.start_reply, None
+        if reply is not None:
+            if reply["ok"]:
+                messagebox.showinfo("Info", "Detection started!")
+            else:
+                messagebox.showwarning("Warning", reply["error"])
+
+    def describe(self, status):
+        if status is None:
+            return "Starting detection daemon..." if self.pending_start else "Detection daemon not running"
+        lines = [f"Detection: {status['state']}, {'armed' if status['armed'] else 'disarmed'}"]
+        if self.starting:
+            lines.append("Opening cameras...")
+        if status["error"]:
+            lines.append(f"Error: {status['error']}")
+        timings = status["timings"]
+        if "cold_start" in timings:
+            lines.append(f"Cold start: {timings['cold_start']:.1f}s")
+        if "rearm" in timings:
+            lines.append(f"Last start to live: {timings['rearm']:.2f}s")
+        for camera_id, cam in status["cameras"].items():
+            state = "live" if cam["alive"] else "stopped"
+            lines.append(f"{camera_id}: {state}, {cam['frames_processed']} frames, {cam['alarms']} alarms")
+        return "\n".join(lines)
 
     def exit_app(self):
-        if self.process is not None:
-            os.kill(self.process.pid, signal.SIGTERM)
         self.root.destroy()
 
 
@@ -2,7 +2,8 @@ import cv2
 import simpleaudio as sa
 import time
 import os
-import csv
+from event_store import EventStore, make_event
+from detector import HumanDetector
 
 # CONFIGURATION
 ALARM_SOUND_FILE = "alarm.wav"
@@ -17,7 +18,7 @@ CAMERA_ID = "CAM1"
 # Directories for saving data
 CAPTURE_FOLDER = "captures"
 os.makedirs(CAPTURE_FOLDER, exist_ok=True)
-LOG_FILE = "detection_log.csv"
+EVENT_DB = "events.db"
 
 # LOAD ALARM SOUND
 alarm_sound = sa.WaveObject.from_wave_file(ALARM_SOUND_FILE)
@@ -30,20 +31,17 @@ if not cap.isOpened():
 
 print("Starting professional human detection. Press 'q' to quit.")
 
-# SETUP HOG HUMAN DETECTOR
-hog = cv2.HOGDescriptor()
-hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+# SETUP HOG HUMAN DETECTOR (same interface as the YOLO detector; imgsz=0 keeps
+# the downscaled frame as is, confidence is the minimum SVM score)
+detector = HumanDetector(None, 0.0, backend="hog", imgsz=0)
 
 last_alarm_time = 0
 human_present = False
 detection_counter = 0
 frame_count = 0
 
-# LOG FILE SETUP
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Timestamp", "CameraID", "ImageFile"])
+# EVENT STORE SETUP
+store = EventStore(EVENT_DB)
 
 # MAIN LOOP
 while True:
@@ -58,26 +56,21 @@ while True:
         small_frame = cv2.resize(frame, (0, 0), fx=FRAME_DOWNSCALE, fy=FRAME_DOWNSCALE)
 
         # Detect humans
-        boxes, weights = hog.detectMultiScale(
-            small_frame,
-            winStride=(4, 4),
-            padding=(8, 8),
-            scale=1.1
-        )
+        boxes = detector.detect_scored(small_frame)
 
         human_detected = False
 
-        for (x, y, w, h) in boxes:
-            if h < MIN_BOX_HEIGHT:
+        for (bx1, by1, bx2, by2, weight) in boxes:
+            if by2 - by1 < MIN_BOX_HEIGHT:
                 continue
 
             human_detected = True
 
             # Scale to original frame
-            x1 = int(x / FRAME_DOWNSCALE)
-            y1 = int(y / FRAME_DOWNSCALE)
-            x2 = int((x + w) / FRAME_DOWNSCALE)
-            y2 = int((y + h) / FRAME_DOWNSCALE)
+            x1 = int(bx1 / FRAME_DOWNSCALE)
+            y1 = int(by1 / FRAME_DOWNSCALE)
+            x2 = int(bx2 / FRAME_DOWNSCALE)
+            y2 = int(by2 / FRAME_DOWNSCALE)
 
             # Draw bounding box and overlay info
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
@@ -100,23 +93,23 @@ while True:
                 last_alarm_time = current_time
 
                 # AUTO CAPTURE CROPPED HUMAN IMAGE
-                for (x, y, w, h) in boxes:
-                    if h < MIN_BOX_HEIGHT:
+                events = []
+                for (bx1, by1, bx2, by2, weight) in boxes:
+                    if by2 - by1 < MIN_BOX_HEIGHT:
                         continue
-                    x1 = int(x / FRAME_DOWNSCALE)
-                    y1 = int(y / FRAME_DOWNSCALE)
-                    x2 = int((x + w) / FRAME_DOWNSCALE)
-                    y2 = int((y + h) / FRAME_DOWNSCALE)
+                    x1 = int(bx1 / FRAME_DOWNSCALE)
+                    y1 = int(by1 / FRAME_DOWNSCALE)
+                    x2 = int(bx2 / FRAME_DOWNSCALE)
+                    y2 = int(by2 / FRAME_DOWNSCALE)
                     cropped = frame[y1:y2, x1:x2]
                     timestamp = time.strftime("%Y%m%d_%H%M%S")
                     filename = os.path.join(CAPTURE_FOLDER, f"{CAMERA_ID}_human_{timestamp}.jpg")
                     cv2.imwrite(filename, cropped)
                     print(f"Captured cropped image: {filename}")
 
-                    # Log detection
-                    with open(LOG_FILE, "a", newline="") as f:
-                        writer = csv.writer(f)
-                        writer.writerow([timestamp, CAMERA_ID, filename])
+                    # Log detection (HOG reports an SVM score rather than a probability)
+                    events.append(make_event(CAMERA_ID, (x1, y1, x2, y2), weight, frame.shape, filename))
+                store.add_events(events)
 
             human_present = True
         elif detection_counter == 0:
@@ -129,5 +122,6 @@ while True:
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 cap.release()
+store.close()
 cv2.destroyAllWindows()
 print("Program terminated.")
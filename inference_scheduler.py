@@ -0,0 +1,170 @@
+import threading
+import time
+from stats import TimingStats
+
+
+class InferenceRequest:
+    def __init__(self, camera_id, frame):
+        self.camera_id = camera_id
+        self.frame = frame
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.humans = []
+
+
+class CameraDetector:
+    # Drop-in replacement for HumanDetector handed to each CameraHandler
+    def __init__(self, scheduler, camera_id):
+        self.scheduler = scheduler
+        self.camera_id = camera_id
+        self.resizes_input = getattr(scheduler.detector, "resizes_input", False)
+
+    def detect(self, frame):
+        return [box[:4] for box in self.detect_scored(frame)]
+
+    def detect_scored(self, frame):
+        return self.scheduler.detect(self.camera_id, frame)
+
+    def detect_batch_scored(self, frames):
+        # Already a batch (e.g. the tiles of one frame): straight to the model,
+        # since the scheduler only keeps one pending frame per camera
+        return self.scheduler.detector.detect_batch_scored(frames)
+
+    @property
+    def imgsz(self):
+        return getattr(self.scheduler.detector, "imgsz", 640)
+
+
+class InferenceScheduler(threading.Thread):
+    def __init__(self, detector, logger, stop_event, max_batch=8, max_wait=0.02, stats_interval=30):
+        super().__init__(daemon=True)
+        self.detector = detector
+        self.logger = logger
+        self.stop_event = stop_event
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.stats_interval = stats_interval
+
+        self.cond = threading.Condition()
+        self.pending = {}  # camera_id -> newest InferenceRequest, oldest first
+        self.cameras = set()
+        self.last_submit = {}  # camera_id -> (perf_counter of last submit, gap before it)
+
+        self.batch_sizes = TimingStats()
+        self.fill_wait = TimingStats()
+        self.infer_time = TimingStats()
+        self.per_frame = TimingStats()
+        self.superseded = 0
+        self.last_stats_time = time.time()
+
+    def for_camera(self, camera_id):
+        with self.cond:
+            self.cameras.add(camera_id)
+        return CameraDetector(self, camera_id)
+
+    def remove_camera(self, camera_id):
+        with self.cond:
+            self.cameras.discard(camera_id)
+            self.last_submit.pop(camera_id, None)
+            request = self.pending.pop(camera_id, None)
+        if request is not None:
+            request.done.set()
+
+    def submit(self, camera_id, frame):
+        request = InferenceRequest(camera_id, frame)
+        with self.cond:
+            previous = self.pending.pop(camera_id, None)
+            self.pending[camera_id] = request
+            last = self.last_submit.get(camera_id)
+            gap = request.submitted - last[0] if last else None
+            self.last_submit[camera_id] = (request.submitted, gap)
+            if previous is not None:
+                self.superseded += 1
+            self.cond.notify()
+        if previous is not None:
+            # Only the latest frame per camera is worth inferring
+            previous.done.set()
+        return request
+
+    def detect(self, camera_id, frame):
+        request = self.submit(camera_id, frame)
+        while not request.done.wait(0.1):
+            if self.stop_event.is_set():
+                return []
+        return request.humans
+
+    def run(self):
+        self.logger.info(f"Inference scheduler started (max_batch={self.max_batch}, "
+                         f"max_wait={self.max_wait * 1000:.0f}ms)")
+        while not self.stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._run_batch(batch)
+            if time.time() - self.last_stats_time >= self.stats_interval:
+                self.log_stats()
+
+        with self.cond:
+            leftovers = list(self.pending.values())
+            self.pending.clear()
+        for request in leftovers:
+            request.done.set()
+        self.log_stats()
+        self.logger.info("Inference scheduler stopped")
+
+    def _collect_batch(self):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.pending, timeout=0.1):
+                return []
+            # The deadline runs from the oldest waiting frame, so frames queued
+            # while the previous batch was running are not held back again
+            batch_limit = min(self.max_batch, max(1, self._active_cameras()))
+            deadline = next(iter(self.pending.values())).submitted + self.max_wait
+            while len(self.pending) < batch_limit and not self.stop_event.is_set():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            camera_ids = list(self.pending)[:batch_limit]
+            return [self.pending.pop(camera_id) for camera_id in camera_ids]
+
+    def _active_cameras(self):
+        # Cameras worth waiting for: those with a frame pending, plus those that
+        # submitted within their last frame interval. A camera whose motion gate
+        # has closed stops submitting and drops out after one interval.
+        now = time.perf_counter()
+        active = 0
+        for camera_id, (submitted, gap) in self.last_submit.items():
+            if camera_id in self.pending or (gap is not None and now - submitted <= gap + self.max_wait):
+                active += 1
+        return active
+
+    def _run_batch(self, batch):
+        start = time.perf_counter()
+        try:
+            results = self.detector.detect_batch_scored([request.frame for request in batch])
+        except Exception:
+            self.logger.exception("Batched inference failed")
+            results = [[] for _ in batch]
+        elapsed = time.perf_counter() - start
+
+        for request, humans in zip(batch, results):
+            request.humans = humans
+            request.frame = None
+            request.done.set()
+
+        self.batch_sizes.add(len(batch))
+        self.fill_wait.add(start - batch[0].submitted)
+        self.infer_time.add(elapsed)
+        self.per_frame.add(elapsed / len(batch))
+
+    def log_stats(self):
+        self.last_stats_time = time.time()
+        if not self.batch_sizes.count:
+            return
+        self.logger.info(
+            f"Inference batches: n={self.batch_sizes.count} "
+            f"avg_size={self.batch_sizes.mean():.2f} superseded={self.superseded} | "
+            f"wait {self.fill_wait.summary()} | "
+            f"batch {self.infer_time.summary()} | "
+            f"per-frame {self.per_frame.summary()}"
+        )
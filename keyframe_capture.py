@@ -0,0 +1,161 @@
+import time
+from camera import LatestFrameCamera
+
+def open_container(source, timeout=None):
+    # PyAV demuxer for a file or stream URL; None when it can't be opened
+    import av
+    options = {"rtsp_transport": "tcp"} if source.startswith("rtsp://") else {}
+    try:
+        container = av.open(source, options=options, timeout=timeout if "://" in source else None)
+    except Exception:
+        return None
+    if not container.streams.video:
+        container.close()
+        return None
+    # Slice threads add no frame delay, unlike frame threads
+    container.streams.video[0].thread_type = "SLICE"
+    return container
+
+class KeyframeCamera(LatestFrameCamera):
+    # Capture through PyAV that decodes only keyframes while the camera is
+    # idle (at most one per idle_interval seconds). Every packet is still
+    # demuxed and the packets since the last keyframe are kept, so wake()
+    # switches to full-rate decoding at once: the current GOP is decoded from
+    # its keyframe to catch up, and the first full-rate frame is clean. After
+    # quiet_period seconds without another wake() it falls back to keyframes.
+    # A GOP longer than max_gop_packets isn't kept, and waking up in it waits
+    # for the next keyframe. Same interface as Camera (read_latest, release, counters).
+    def __init__(self, source, on_frame=None, replay_speed=None, stream_cfg=None, settings=None):
+        if not isinstance(source, str):
+            raise Exception("Keyframe decoding needs a file or stream URL")
+        # Decoded arrays come from PyAV, so buffers are only counted, not reused
+        super().__init__(on_frame, stream_cfg, max_free=0)
+        settings = settings or {}
+        self.source = source
+        self.quiet_period = settings.get("quiet_period", 10.0)
+        self.idle_interval = settings.get("idle_interval", 1.0)
+        self.max_gop_packets = settings.get("max_gop_packets", 600)
+        self.container = open_container(source, self.watchdog.read_timeout)
+        if self.container is None:
+            raise Exception("Camera not detected")
+        # A recorded file plays back like a live stream, paced by packet timestamps
+        self.replay_speed = replay_speed
+        self.packets_read = 0
+        self.packets_decoded = 0
+        self.wakeups = 0
+        self.active_until = 0
+        self.full_rate = False
+        self._start_grabber()
+
+    def wake(self):
+        # Motion or a detection: full-rate decoding for the next quiet_period seconds
+        self.active_until = time.time() + self.quiet_period
+
+    def decode_ratio(self):
+        return self.packets_decoded / self.packets_read if self.packets_read else 0.0
+
+    def update_frames(self):
+        stream, packets, gop = self._start_demux()
+        last_idle_decode = 0
+        clock = None
+        while self.running:
+            start = time.perf_counter()
+            try:
+                packet = next(packets)
+            except StopIteration:
+                packet = None
+            except Exception:
+                packet = None
+            if packet is None or packet.size == 0:
+                if packet is not None and self.replay_speed is not None:
+                    # End of a recorded file: rewind and keep playing
+                    self.container.seek(0)
+                    stream, packets, gop = self._start_demux()
+                    clock = None
+                    continue
+                if self.watchdog.read_failed():
+                    self.reconnect()
+                    if not self.running:
+                        break
+                    stream, packets, gop = self._start_demux()
+                    clock = None
+                continue
+            self.packets_read += 1
+            if packet.is_keyframe:
+                gop.clear()
+                gop.append(packet)
+            elif gop and len(gop) < self.max_gop_packets:
+                gop.append(packet)
+            else:
+                # No keyframe seen yet, or the GOP is too long to keep whole:
+                # a partial GOP would decode into corrupt frames
+                gop.clear()
+
+            if self.replay_speed and packet.pts is not None:
+                pts = float(packet.pts * stream.time_base)
+                if clock is None:
+                    clock = (time.time(), pts)
+                delay = clock[0] + (pts - clock[1]) / self.replay_speed - time.time()
+                if delay > 0:
+                    self.stopped.wait(delay)
+                elif delay < -1:
+                    clock = None
+
+            codec = stream.codec_context
+            if time.time() < self.active_until:
+                if not self.full_rate:
+                    if not gop:
+                        # Nothing to catch up from: start at the next keyframe
+                        continue
+                    # Catch up from the GOP's keyframe so references are complete
+                    self.full_rate = True
+                    self.wakeups += 1
+                    codec.flush_buffers()
+                    decode = list(gop)
+                else:
+                    decode = [packet]
+            else:
+                if self.full_rate:
+                    self.full_rate = False
+                    codec.flush_buffers()
+                if not packet.is_keyframe or time.time() - last_idle_decode < self.idle_interval:
+                    continue
+                last_idle_decode = time.time()
+                decode = [packet]
+
+            frame = None
+            try:
+                for p in decode:
+                    for decoded in codec.decode(p):
+                        frame = decoded
+                    self.packets_decoded += 1
+                if frame is None and not self.full_rate:
+                    # A lone keyframe can sit in the decoder's delay; drain it
+                    for decoded in codec.decode(None):
+                        frame = decoded
+                    codec.flush_buffers()
+            except Exception:
+                codec.flush_buffers()
+                continue
+            if frame is None:
+                continue
+            self._publish(self.pool.adopt(frame.to_ndarray(format="bgr24")), start)
+
+    def _start_demux(self):
+        stream = self.container.streams.video[0]
+        stream.codec_context.flush_buffers()
+        return stream, self.container.demux(stream), []
+
+    def reconnect(self):
+        # Sleeps through the backoff; release() cuts it short
+        self.container.close()
+        container = self.watchdog.reconnect(lambda: open_container(self.source, self.watchdog.read_timeout),
+                                            self.stopped.wait)
+        if container is None:
+            self.running = False
+            return
+        self.container = container
+        self.full_rate = False
+
+    def _close_source(self):
+        self.container.close()
@@ -1,5 +1,6 @@
 import logging
 import os
+from logging.handlers import QueueHandler, QueueListener
 
 def setup_logger(log_folder):
     os.makedirs(log_folder, exist_ok=True)
@@ -13,3 +14,15 @@ def setup_logger(log_folder):
         ]
     )
     return logging
+
+def setup_worker_logger(log_queue):
+    # Worker processes forward records to the supervisor, which owns the log files
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    return logging
+
+def start_log_listener(log_queue):
+    listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,56 +1,96 @@
 import os
-import csv
-import yaml
+import time
 import threading
+import multiprocessing as mp
 import cv2
-from detector import HumanDetector
 from alarm import AlarmManager
 from logger import setup_logger
-from camera_handler import CameraHandler
-
-# --- Load Config ---
-with open("config.yaml") as f:
-    cfg = yaml.safe_load(f)
-
-logger = setup_logger(cfg["log_folder"])
-os.makedirs(cfg["capture_folder"], exist_ok=True)
-log_csv_path = os.path.join(cfg["log_folder"], cfg["log_file"])
-if not os.path.exists(log_csv_path):
-    with open(log_csv_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Timestamp", "CameraID", "ImageFile"])
-
-# --- Initialize detector and alarm ---
-detector = HumanDetector(cfg["yolo_model_path"], cfg["detection_confidence"])
-alarm = AlarmManager(cfg["alarm_sound_file"])
-
-# --- Event to stop all cameras ---
-stop_event = threading.Event()
-
-# --- Start all cameras ---
-camera_threads = []
-for cam_cfg in cfg["cameras"]:
-    cam_thread = CameraHandler(cam_cfg, cfg, detector, alarm, log_csv_path, logger, stop_event)
-    cam_thread.start()
-    camera_threads.append(cam_thread)
-
-logger.info("All cameras started. Close any window or press ESC to quit.")
-
-# --- Global quit handling ---
-try:
-    while not stop_event.is_set():
-        key = cv2.waitKey(100)
-        if key == 27:  # ESC key
-            logger.info("ESC pressed. Exiting...")
-            stop_event.set()
-            break
-except KeyboardInterrupt:
-    logger.info("KeyboardInterrupt detected. Exiting...")
-    stop_event.set()
-
-# --- Wait for all threads to finish ---
-for t in camera_threads:
-    t.join()
-
-cv2.destroyAllWindows()
-logger.info("All cameras stopped. Program terminated.")
+from pipeline import build_detector, Pipeline
+from supervisor import Supervisor
+from event_store import EventStore
+from backends import export_model
+from config_reload import CONFIG_PATH, ConfigWatcher, load_config
+
+def run_threads(cfg, alarm, event_db_path, logger):
+    # --- Initialize detector ---
+    detector = build_detector(cfg, logger)
+
+    # --- Event to stop all cameras ---
+    stop_event = threading.Event()
+
+    # --- Start all cameras ---
+    pipeline = Pipeline(cfg["cameras"], cfg, detector, alarm, event_db_path, logger, stop_event)
+    pipeline.start()
+    if cfg.get("headless", False):
+        logger.info("All cameras started (headless). Press Ctrl+C to quit.")
+    else:
+        logger.info("All cameras started. Close any window or press ESC to quit.")
+
+    # --- Config changes (file saved, or SIGHUP) are applied to the running cameras ---
+    watcher = ConfigWatcher(CONFIG_PATH, logger) if cfg.get("watch_config", True) else None
+
+    # --- Global quit handling ---
+    try:
+        while not stop_event.is_set():
+            if watcher is not None:
+                new_cfg = watcher.poll(time.time())
+                if new_cfg is not None:
+                    pipeline.reload(new_cfg)
+            # Read every time: a config reload can switch headless on or off
+            if cfg.get("headless", False):
+                stop_event.wait(0.5)
+                continue
+            key = cv2.waitKey(100)
+            if key == 27:  # ESC key
+                logger.info("ESC pressed. Exiting...")
+                stop_event.set()
+                break
+    except KeyboardInterrupt:
+        logger.info("KeyboardInterrupt detected. Exiting...")
+        stop_event.set()
+
+    # --- Wait for all threads to finish ---
+    pipeline.join()
+
+    if not cfg.get("headless", False):
+        cv2.destroyAllWindows()
+
+def run_workers(cfg, alarm, event_db_path, logger):
+    # Each worker process owns a shard of the cameras and its own detector;
+    # this process keeps the alarm, the log file and shutdown
+    ctx = mp.get_context("spawn")
+    stop_event = ctx.Event()
+    supervisor = Supervisor(ctx, cfg, alarm, event_db_path, logger, stop_event)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        logger.info("KeyboardInterrupt detected. Exiting...")
+        stop_event.set()
+        supervisor.shutdown()
+
+def main():
+    # --- Load Config ---
+    cfg = load_config(CONFIG_PATH)
+
+    logger = setup_logger(cfg["log_folder"])
+    os.makedirs(cfg["capture_folder"], exist_ok=True)
+    event_db_path = os.path.join(cfg["log_folder"], cfg["event_db"])
+    # Create the schema once here rather than racing on it from every worker
+    EventStore(event_db_path).close()
+    # Same for the one-time model export of the onnxruntime/openvino backends
+    backend = cfg.get("detector_backend", {})
+    if backend.get("name", "ultralytics") != "ultralytics":
+        export_model(cfg["yolo_model_path"], backend["name"], backend.get("imgsz", 640), backend.get("int8", False))
+
+    alarm = AlarmManager(cfg["alarm_sound_file"], cfg.get("alarm_dispatcher", {}), logger)
+    alarm.start()
+
+    if cfg.get("workers", 0) > 0:
+        run_workers(cfg, alarm, event_db_path, logger)
+    else:
+        run_threads(cfg, alarm, event_db_path, logger)
+    alarm.close()
+    logger.info("All cameras stopped. Program terminated.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsWriter:
+    # Collects samples in the Prometheus text format. Samples of one metric are
+    # grouped under a single HELP/TYPE header whatever order they arrive in.
+    def __init__(self):
+        self.families = {}
+
+    def _family(self, name, kind, help_text):
+        if name not in self.families:
+            self.families[name] = (kind, help_text, [])
+        return self.families[name][2]
+
+    def counter(self, name, help_text, value, **labels):
+        self._family(name, "counter", help_text).append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def gauge(self, name, help_text, value, **labels):
+        self._family(name, "gauge", help_text).append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def histogram(self, name, help_text, stats, **labels):
+        # stats is a TimingStats created with buckets
+        buckets, cumulative, total, count = stats.histogram()
+        lines = self._family(name, "histogram", help_text)
+        for bound, value in zip(buckets + (float("inf"),), cumulative):
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': format_value(float(bound))})} {value}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(float(total))}")
+        lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+    def text(self):
+        out = []
+        for name, (kind, help_text, lines) in self.families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+class MetricsServer:
+    # http://host:port/metrics  Prometheus text exposition. Nothing is computed
+    # on the camera threads: collect(writer) reads their counters per scrape.
+    def __init__(self, host, port, collect, logger):
+        self.host = host
+        self.port = port
+        self.collect = collect
+        self.logger = logger
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Metrics server listening on http://{self.host}:{self.httpd.server_address[1]}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def render(self):
+        writer = MetricsWriter()
+        self.collect(writer)
+        return writer.text()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    return self.send_error(404)
+                try:
+                    body = server.render().encode()
+                except Exception:
+                    server.logger.exception("Failed to collect metrics")
+                    return self.send_error(500)
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    def __init__(self, settings):
+        self.background = None
+        self.frames_seen = 0
+        self.checks = 0
+        self.skipped = 0
+        self.cropped = 0
+        self.configure(settings)
+
+    def configure(self, settings):
+        # Also used by a config reload; the background is kept unless the
+        # thumbnail size it was learned at changed
+        thumb_width = settings.get("thumbnail_width", 160)
+        if self.background is not None and thumb_width != self.thumb_width:
+            self.background = None
+            self.frames_seen = 0
+        self.thumb_width = thumb_width
+        self.pixel_threshold = settings.get("pixel_threshold", 25)
+        self.min_area = settings.get("min_area", 0.002)  # fraction of the thumbnail
+        self.warmup_frames = settings.get("warmup_frames", 25)
+        self.learning_rate = settings.get("learning_rate", 0.05)
+        self.padding = settings.get("padding", 0.15)
+        self.min_crop = settings.get("min_crop", 96)
+        self.full_frame_ratio = settings.get("full_frame_ratio", 0.6)
+
+    def gate(self, frame, force=False):
+        # Returns None when inference can be skipped, otherwise the (x1, y1, x2, y2)
+        # region of the frame that should go to the detector
+        self.checks += 1
+        h, w = frame.shape[:2]
+        region = self._motion_region(frame)
+
+        if region is None and not force:
+            self.skipped += 1
+            return None
+        if region is None:
+            return (0, 0, w, h)
+
+        x1, y1, x2, y2 = region
+        if (x2 - x1) * (y2 - y1) >= self.full_frame_ratio * w * h:
+            return (0, 0, w, h)
+        self.cropped += 1
+        return region
+
+    def saved_ratio(self):
+        return self.skipped / self.checks if self.checks else 0.0
+
+    def _motion_region(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.thumb_width / w
+        thumb = cv2.resize(frame, (self.thumb_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.frames_seen = 0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        self.frames_seen += 1
+
+        # Until the background model settles, treat the whole frame as moving
+        if self.frames_seen <= self.warmup_frames:
+            return (0, 0, w, h)
+
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        if cv2.countNonZero(mask) < self.min_area * mask.size:
+            return None
+
+        x, y, bw, bh = cv2.boundingRect(mask)
+        pad_x, pad_y = bw * self.padding, bh * self.padding
+        x1 = max(0, int((x - pad_x) / scale))
+        y1 = max(0, int((y - pad_y) / scale))
+        x2 = min(w, int((x + bw + pad_x) / scale))
+        y2 = min(h, int((y + bh + pad_y) / scale))
+
+        # Very small crops get blown up by the model's letterbox; give it some context
+        if x2 - x1 < self.min_crop:
+            cx = (x1 + x2) // 2
+            x1, x2 = max(0, cx - self.min_crop // 2), min(w, cx + self.min_crop // 2)
+        if y2 - y1 < self.min_crop:
+            cy = (y1 + y2) // 2
+            y1, y2 = max(0, cy - self.min_crop // 2), min(h, cy + self.min_crop // 2)
+        return (x1, y1, x2, y2)
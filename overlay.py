@@ -0,0 +1,14 @@
+import cv2
+import time
+
+def draw_overlay(frame, humans, camera_id):
+    # Boxes may carry extra fields (confidence) after the coordinates
+    for box in humans:
+        x1, y1, x2, y2 = box[:4]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,0,255), 2)
+        cv2.putText(frame, f"Person {camera_id}", (x1, y1-10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
+
+    cv2.putText(frame, time.strftime("%Y-%m-%d %H:%M:%S"),
+                (10, frame.shape[0]-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,255), 1)
+    return frame
@@ -0,0 +1,216 @@
+from camera_handler import CameraHandler
+from evidence_writer import EvidenceWriter
+from clip_recorder import ClipManager
+from preview_server import PreviewServer
+from metrics import MetricsServer
+from cascade import CascadeDetector
+from budget import InferenceBudget
+from config_reload import RESTART_KEYS, HANDLER_KEYS, CAPTURE_KEYS, CAMERA_CAPTURE_KEYS
+from inference_scheduler import InferenceScheduler
+
+def build_detector(cfg, logger=None):
+    # Imported here so the pipeline can run with other detectors without ultralytics
+    from detector import HumanDetector
+    backend = cfg.get("detector_backend", {})
+    options = dict(
+        backend=backend.get("name", "ultralytics"),
+        imgsz=backend.get("imgsz", 640),
+        int8=backend.get("int8", False),
+        threads=backend.get("threads", 0),
+    )
+    detector = HumanDetector(cfg["yolo_model_path"], cfg["detection_confidence"], **options)
+
+    cascade = cfg.get("cascade", {})
+    if not cascade.get("enabled"):
+        return detector
+    screen_model = cascade.get("screen_model", "hog")
+    if screen_model == "hog":
+        screen = HumanDetector(None, cascade.get("screen_confidence", 0.0), backend="hog",
+                               imgsz=cascade.get("hog_max_width", 640))
+    else:
+        screen = HumanDetector(screen_model, cascade.get("screen_confidence", 0.25), **options)
+    return CascadeDetector(screen, detector, cascade, logger, stats_interval=cfg.get("stats_interval", 30))
+
+class Pipeline:
+    # The camera threads of one process plus the services they share
+    def __init__(self, camera_configs, cfg, detector, alarm, event_db_path, logger, stop_event, worker_id=0,
+                 armed=None, num_workers=1):
+        self.camera_configs = camera_configs
+        self.cfg = cfg
+        self.detector = detector
+        self.alarm = alarm
+        self.event_db_path = event_db_path
+        self.logger = logger
+        self.stop_event = stop_event
+        self.worker_id = worker_id
+        # Processes that actually run cameras (and share the inference budget)
+        self.num_workers = num_workers
+        self.armed = armed
+        self.scheduler = None
+        self.budget = None
+        self.evidence = None
+        self.clips = None
+        self.preview = None
+        self.metrics = None
+        self.camera_threads = []
+
+    def start(self):
+        # --- Optional cross-camera batched inference ---
+        batching = self.cfg.get("inference_batching", {})
+        if batching.get("enabled"):
+            self.scheduler = InferenceScheduler(
+                self.detector, self.logger, self.stop_event,
+                max_batch=batching.get("max_batch", 8),
+                max_wait=batching.get("max_wait_ms", 20) / 1000.0,
+                stats_interval=self.cfg.get("stats_interval", 30),
+            )
+            self.scheduler.start()
+
+        # --- Optional global inference budget (split evenly between worker processes) ---
+        budget_cfg = self.cfg.get("inference_budget", {})
+        if budget_cfg.get("enabled"):
+            self.budget = InferenceBudget(budget_cfg, workers=self.num_workers)
+
+        # --- Evidence writer ---
+        writer_cfg = self.cfg.get("evidence_writer", {})
+        self.evidence = EvidenceWriter(
+            self.cfg["capture_folder"], self.event_db_path, self.logger,
+            workers=writer_cfg.get("workers", 2),
+            queue_size=writer_cfg.get("queue_size", 64),
+            policy=writer_cfg.get("policy", "drop"),
+            flush_interval=writer_cfg.get("flush_interval", 1.0),
+            jpeg_quality=writer_cfg.get("jpeg_quality", 90),
+            stats_interval=self.cfg.get("stats_interval", 30),
+            dedup=writer_cfg.get("dedup"),
+        )
+        self.evidence.start()
+
+        # --- Optional pre/post-alarm clip recording ---
+        clip_cfg = self.cfg.get("clip_recorder", {})
+        if clip_cfg.get("enabled"):
+            self.clips = ClipManager(clip_cfg, self.logger)
+            self.clips.start()
+
+        # --- Optional MJPEG preview server (one port per worker process) ---
+        preview_cfg = self.cfg.get("preview_server", {})
+        if preview_cfg.get("enabled"):
+            self.preview = PreviewServer(
+                preview_cfg.get("host", "127.0.0.1"), preview_cfg.get("port", 8080) + self.worker_id, self.logger,
+                max_fps=preview_cfg.get("max_fps", 5),
+                jpeg_quality=preview_cfg.get("jpeg_quality", 70),
+            )
+            self.preview.start()
+
+        # --- Optional Prometheus metrics endpoint (one port per worker process) ---
+        metrics_cfg = self.cfg.get("metrics_server", {})
+        if metrics_cfg.get("enabled"):
+            self.metrics = MetricsServer(
+                metrics_cfg.get("host", "127.0.0.1"), metrics_cfg.get("port", 9108) + self.worker_id,
+                self.collect_metrics, self.logger,
+            )
+            self.metrics.start()
+
+        # --- Start cameras ---
+        for cam_cfg in self.camera_configs:
+            self.add_camera(cam_cfg)
+
+    def add_camera(self, cam_cfg):
+        if self.budget:
+            self.budget.register(cam_cfg["id"], cam_cfg.get("priority", 1.0))
+        cam_detector = self.scheduler.for_camera(cam_cfg["id"]) if self.scheduler else self.detector
+        cam_thread = CameraHandler(cam_cfg, self.cfg, cam_detector, self.alarm, self.evidence,
+                                   self.logger, self.stop_event, clips=self.clips, preview=self.preview,
+                                   budget=self.budget, armed=self.armed)
+        cam_thread.start()
+        self.camera_threads.append(cam_thread)
+
+    def remove_camera(self, camera_id):
+        for cam_thread in [t for t in self.camera_threads if t.camera_id == camera_id]:
+            cam_thread.stop()
+            self.camera_threads.remove(cam_thread)
+        if self.scheduler:
+            self.scheduler.remove_camera(camera_id)
+        if self.budget:
+            self.budget.unregister(camera_id)
+
+    def reload(self, new_cfg):
+        # Applies a changed config without touching the detector: live values
+        # are updated in place, running cameras get their new settings, and
+        # only new or removed cameras and those whose stream source changed are
+        # (re)started, unless a setting every camera opens its stream with changed
+        for key in RESTART_KEYS:
+            if self.cfg.get(key) != new_cfg.get(key):
+                self.logger.warning(f"Config reload: '{key}' changed, restart to apply it")
+            # Keep describing what is actually running
+            if key in self.cfg:
+                new_cfg[key] = self.cfg[key]
+            else:
+                new_cfg.pop(key, None)
+        restart_all = [key for key in CAPTURE_KEYS if self.cfg.get(key) != new_cfg.get(key)]
+        handler_changed = [key for key in HANDLER_KEYS if self.cfg.get(key) != new_cfg.get(key)]
+
+        old_cameras = {cam_cfg["id"]: cam_cfg for cam_cfg in self.camera_configs}
+        new_cameras = {cam_cfg["id"]: cam_cfg for cam_cfg in new_cfg["cameras"]}
+        running = {t.camera_id for t in self.camera_threads}
+        removed = [cid for cid in old_cameras if cid not in new_cameras]
+        restarted = [cid for cid in new_cameras
+                     if cid in old_cameras and (restart_all or cid not in running or any(
+                         old_cameras[cid].get(key) != new_cameras[cid].get(key) for key in CAMERA_CAPTURE_KEYS))]
+        added = [cid for cid in new_cameras if cid not in old_cameras]
+        updated = [cid for cid in new_cameras
+                   if cid in old_cameras and cid not in restarted
+                   and (handler_changed or old_cameras[cid] != new_cameras[cid])]
+
+        # Camera threads read self.cfg on every frame, so update the same dict
+        # (never cleared, a running thread could see it empty)
+        self.cfg.update(new_cfg)
+        for key in [key for key in self.cfg if key not in new_cfg]:
+            del self.cfg[key]
+        self.camera_configs = new_cfg["cameras"]
+        if hasattr(self.detector, "confidence"):
+            self.detector.confidence = self.cfg["detection_confidence"]
+
+        for cam_thread in self.camera_threads:
+            if cam_thread.camera_id in updated:
+                cam_thread.pending_config = new_cameras[cam_thread.camera_id]
+        for camera_id in removed + restarted:
+            self.remove_camera(camera_id)
+        for camera_id in restarted + added:
+            try:
+                self.add_camera(new_cameras[camera_id])
+            except Exception:
+                self.logger.error(f"Config reload: camera {camera_id} could not be started")
+        self.logger.info(
+            f"Config reloaded: added={added or '-'} removed={removed or '-'} restarted={restarted or '-'} "
+            f"updated={updated or '-'}"
+            + (f" (changed: {', '.join(restart_all)})" if restart_all else "")
+        )
+
+    def collect_metrics(self, writer):
+        for t in list(self.camera_threads):
+            t.collect_metrics(writer)
+        # Anything that keeps its own counters (HumanDetector, not a stand-in)
+        if hasattr(self.detector, "collect_metrics"):
+            self.detector.collect_metrics(writer)
+        if self.evidence:
+            self.evidence.collect_metrics(writer)
+        if hasattr(self.alarm, "collect_metrics"):
+            self.alarm.collect_metrics(writer)
+
+    def all_alive(self):
+        return all(t.is_alive() for t in self.camera_threads)
+
+    def join(self):
+        for t in self.camera_threads:
+            t.join()
+        if self.scheduler:
+            self.scheduler.join()
+        # Cameras are done, so flush whatever evidence is still queued
+        if self.evidence:
+            self.evidence.close()
+        if self.clips:
+            self.clips.close()
+        if self.preview:
+            self.preview.stop()
+        if self.metrics:
+            self.metrics.stop()
@@ -0,0 +1,173 @@
+import re
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import cv2
+from overlay import draw_overlay
+
+class PreviewChannel:
+    # Latest frame of one camera for the MJPEG endpoint. Camera threads only
+    # publish while a client is connected; JPEG encoding happens on the HTTP
+    # side, at most max_fps times per second and once per frame for all clients.
+    def __init__(self, camera_id, max_fps=5, jpeg_quality=70):
+        self.camera_id = camera_id
+        self.min_interval = 1.0 / max_fps if max_fps else 0
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.cond = threading.Condition()
+        self.clients = 0
+        self.frame = None
+        self.humans = []
+        self.drawn = False
+        # Pooled buffer behind frame, held until the next publish or disconnect
+        self.buffer = None
+        self.seq = 0
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.last_encode = 0
+        self.frames_encoded = 0
+
+    @property
+    def active(self):
+        return self.clients > 0
+
+    @property
+    def due(self):
+        # A client is connected and the next encode is not rate-limited away
+        return self.clients > 0 and time.time() >= self.last_encode + self.min_interval
+
+    def publish(self, frame, humans, drawn=False, buffer=None):
+        with self.cond:
+            if self.buffer is not None:
+                self.buffer.release()
+            self.buffer = buffer.retain() if buffer is not None else None
+            self.frame = frame
+            self.humans = humans
+            self.drawn = drawn
+            self.seq += 1
+            self.cond.notify_all()
+
+    def connect(self):
+        with self.cond:
+            self.clients += 1
+
+    def disconnect(self):
+        with self.cond:
+            self.clients -= 1
+            if not self.clients:
+                self.frame = None
+                if self.buffer is not None:
+                    self.buffer.release()
+                    self.buffer = None
+
+    def next_jpeg(self, last_seq, timeout=5.0):
+        # Returns (seq, jpeg) newer than last_seq, or (last_seq, None) on timeout
+        wait = self.last_encode + self.min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > last_seq and self.frame is not None, timeout):
+                return last_seq, None
+            if self.jpeg_seq != self.seq:
+                frame = self.frame if self.drawn else draw_overlay(self.frame.copy(), self.humans, self.camera_id)
+                ok, jpeg = cv2.imencode(".jpg", frame, self.encode_params)
+                if ok:
+                    self.jpeg = jpeg.tobytes()
+                    self.jpeg_seq = self.seq
+                    self.last_encode = time.time()
+                    self.frames_encoded += 1
+            return self.jpeg_seq, self.jpeg
+
+class PreviewServer:
+    # http://host:port/                   index of camera streams
+    # http://host:port/camera/<id>.mjpg   multipart MJPEG stream
+    # http://host:port/camera/<id>.jpg    single snapshot
+    def __init__(self, host, port, logger, max_fps=5, jpeg_quality=70):
+        self.host = host
+        self.port = port
+        self.logger = logger
+        self.max_fps = max_fps
+        self.jpeg_quality = jpeg_quality
+        self.channels = {}
+        self.running = True
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="preview-server", daemon=True)
+
+    def channel(self, camera_id):
+        if camera_id not in self.channels:
+            self.channels[camera_id] = PreviewChannel(camera_id, self.max_fps, self.jpeg_quality)
+        return self.channels[camera_id]
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Preview server listening on http://{self.host}:{self.httpd.server_address[1]}/")
+
+    def stop(self):
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path in ("/", "/index.html"):
+                    return self.send_index()
+                match = re.fullmatch(r"/camera/([^/]+)\.(mjpg|jpg)", self.path)
+                channel = server.channels.get(match.group(1)) if match else None
+                if channel is None:
+                    return self.send_error(404)
+                if match.group(2) == "mjpg":
+                    self.send_stream(channel)
+                else:
+                    self.send_snapshot(channel)
+
+            def send_index(self):
+                items = "".join(f'<h3>{cid}</h3><img src="/camera/{cid}.mjpg">' for cid in server.channels)
+                body = f"<html><body>{items}</body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_snapshot(self, channel):
+                channel.connect()
+                try:
+                    _, jpeg = channel.next_jpeg(channel.jpeg_seq)
+                finally:
+                    channel.disconnect()
+                if jpeg is None:
+                    return self.send_error(503, "No frame available")
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+
+            def send_stream(self, channel):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                channel.connect()
+                seq = 0
+                try:
+                    while server.running:
+                        seq, jpeg = channel.next_jpeg(seq)
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    channel.disconnect()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+class RoiMask:
+    # Per-camera region of interest from include/exclude polygons, given as
+    # [x, y] points in fractions of the frame size so they hold for any stream
+    # resolution. No include polygon means the whole frame. The pixel mask and
+    # its bounding crop are built once per frame shape: only the crop goes to
+    # the detector, and a detection whose foot point (bottom centre) is
+    # outside the mask is dropped.
+    def __init__(self, settings):
+        self.include = [np.array(polygon, np.float64) for polygon in settings.get("include", [])]
+        self.exclude = [np.array(polygon, np.float64) for polygon in settings.get("exclude", [])]
+        self.masks = {}
+        self.dropped = 0
+        self.crop_ratio = 1.0
+
+    def _build(self, shape):
+        h, w = shape[:2]
+        scale = np.array([w, h])
+        # One fillPoly per polygon: a single call fills even-odd, so overlapping
+        # polygons would cancel out where they overlap
+        if self.include:
+            mask = np.zeros((h, w), np.uint8)
+            for polygon in self.include:
+                cv2.fillPoly(mask, [np.round(polygon * scale).astype(np.int32)], 255)
+        else:
+            mask = np.full((h, w), 255, np.uint8)
+        for polygon in self.exclude:
+            cv2.fillPoly(mask, [np.round(polygon * scale).astype(np.int32)], 0)
+        x, y, bw, bh = cv2.boundingRect(mask)
+        entry = (mask, (x, y, x + bw, y + bh))
+        self.masks[(h, w)] = entry
+        self.crop_ratio = bw * bh / (w * h)
+        return entry
+
+    def crop(self, shape):
+        # (x1, y1, x2, y2) bounding box of the ROI; empty when nothing is included
+        entry = self.masks.get(shape[:2]) or self._build(shape)
+        return entry[1]
+
+    def filter(self, boxes, shape):
+        mask = (self.masks.get(shape[:2]) or self._build(shape))[0]
+        h, w = mask.shape
+        kept = []
+        for box in boxes:
+            foot_x = min(max(int((box[0] + box[2]) / 2), 0), w - 1)
+            foot_y = min(max(int(box[3]) - 1, 0), h - 1)
+            if mask[foot_y, foot_x]:
+                kept.append(box)
+        self.dropped += len(boxes) - len(kept)
+        return kept
@@ -0,0 +1,102 @@
+import numpy as np
+from multiprocessing import shared_memory
+from stream_health import STATES
+
+# Header layout (int64): latest sequence number, latest slot index, bytes copied
+# by the writer, then the writer's stream health: state index, reconnects, stalls
+LATEST_SEQ, LATEST_SLOT, BYTES_COPIED, STREAM_STATE, RECONNECTS, STALLS = range(6)
+HEADER_LEN = 6
+
+class SharedFrameRing:
+    # Single-writer ring of preallocated frame slots in shared memory.
+    # The writer decodes straight into a free slot and then publishes it by
+    # bumping the latest-slot index. Readers get a view into the slot, copy it
+    # out, and check afterwards whether the slot was overwritten meanwhile.
+    def __init__(self, name, shape, slots=4, create=False):
+        self.name = name
+        self.shape = tuple(shape)
+        self.slots = max(3, slots)
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = 8 * (HEADER_LEN + 2 * self.slots)
+        size = header_bytes + frame_bytes * self.slots
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_LEN,), np.int64, buf, 0)
+        self.slot_seq = np.ndarray((self.slots,), np.int64, buf, 8 * HEADER_LEN)
+        self.slot_time = np.ndarray((self.slots,), np.float64, buf, 8 * (HEADER_LEN + self.slots))
+        self.frames = np.ndarray((self.slots,) + self.shape, np.uint8, buf, header_bytes)
+        if create:
+            self.header[:] = (0, -1, 0, 0, 0, 0)
+            self.slot_seq[:] = 0
+
+    # --- Writer side ---
+    def begin_write(self):
+        # Never hand out the latest slot, so the newest frame stays readable
+        slot = (int(self.header[LATEST_SEQ]) + 1) % self.slots
+        if slot == self.header[LATEST_SLOT]:
+            slot = (slot + 1) % self.slots
+        self.slot_seq[slot] = -1  # mark as being written
+        return slot, self.frames[slot]
+
+    def publish(self, slot, timestamp):
+        seq = int(self.header[LATEST_SEQ]) + 1
+        self.slot_time[slot] = timestamp
+        self.slot_seq[slot] = seq
+        self.header[LATEST_SLOT] = slot
+        self.header[LATEST_SEQ] = seq
+        return seq
+
+    def add_copied(self, nbytes):
+        self.header[BYTES_COPIED] += nbytes
+
+    def set_health(self, watchdog):
+        self.header[RECONNECTS] = watchdog.reconnects
+        self.header[STALLS] = watchdog.stalls
+        self.header[STREAM_STATE] = STATES.index(watchdog.state)
+
+    # --- Reader side ---
+    def latest_seq(self):
+        return int(self.header[LATEST_SEQ])
+
+    def read_latest(self):
+        # Returns (seq, slot, frame_view, capture_time) or None if nothing valid yet
+        seq = int(self.header[LATEST_SEQ])
+        slot = int(self.header[LATEST_SLOT])
+        if seq == 0 or slot < 0 or int(self.slot_seq[slot]) != seq:
+            return None
+        return seq, slot, self.frames[slot], float(self.slot_time[slot])
+
+    def still_valid(self, slot, seq):
+        # False once the writer has started reusing the slot of a frame being read
+        return int(self.slot_seq[slot]) == seq
+
+    def latest_time(self):
+        slot = int(self.header[LATEST_SLOT])
+        return float(self.slot_time[slot]) if slot >= 0 else 0.0
+
+    def bytes_copied(self):
+        return int(self.header[BYTES_COPIED])
+
+    def health(self):
+        # (stream state index, reconnects, stalls) as last published by the writer
+        return int(self.header[STREAM_STATE]), int(self.header[RECONNECTS]), int(self.header[STALLS])
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed
+        self.header = self.slot_seq = self.slot_time = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a consumer still holds a frame view; the mapping goes with it
+
+    def unlink(self):
+        # Normally the writer unlinks; readers only do it for a writer that died
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,64 @@
+import bisect
+import threading
+from collections import deque
+
+# Upper bounds (seconds) of the histogram buckets exported on /metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class TimingStats:
+    def __init__(self, window=1000, buckets=None):
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Optional fixed-bucket histogram over all samples; the last slot is +Inf
+        self.buckets = tuple(buckets) if buckets else ()
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+
+    def add(self, value):
+        with self.lock:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+            if self.buckets:
+                self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.bucket_counts = [0] * (len(self.buckets) + 1)
+
+    def histogram(self):
+        # (bucket bounds, cumulative counts incl. +Inf, sum, count) snapshot
+        with self.lock:
+            counts = list(self.bucket_counts)
+            total, count = self.total, self.count
+        cumulative = []
+        running = 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return self.buckets, cumulative, total, count
+
+    def percentile(self, p):
+        with self.lock:
+            recent = sorted(self.samples)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(len(recent) * p / 100))]
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, scale=1000.0, unit="ms"):
+        return (f"n={self.count} mean={self.mean() * scale:.1f}{unit} "
+                f"p50={self.percentile(50) * scale:.1f}{unit} "
+                f"p95={self.percentile(95) * scale:.1f}{unit} "
+                f"max={self.max * scale:.1f}{unit}")
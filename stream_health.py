@@ -0,0 +1,80 @@
+import time
+import random
+
+# Capture stream states, in the order they are stored in shared memory
+CONNECTING, LIVE, STALLED, BACKOFF = STATES = ("connecting", "live", "stalled", "backoff")
+
+def effective_state(state, last_frame_time, now, read_timeout):
+    # A live stream that stopped delivering is stalled even while its reader is
+    # still blocked inside cap.read()
+    if state == LIVE and read_timeout and now - last_frame_time > read_timeout:
+        return STALLED
+    return state
+
+class StreamWatchdog:
+    # Health of one capture stream, driven by the loop that reads it. Failed
+    # reads (or none succeeding for read_timeout seconds) mark the stream
+    # stalled; the loop then closes it and calls reconnect(), which sleeps an
+    # exponentially growing, jittered backoff between open attempts, so a dead
+    # camera costs no CPU. The backoff only resets once frames flow again.
+    def __init__(self, settings=None, on_change=None):
+        settings = settings or {}
+        self.read_timeout = settings.get("read_timeout", 10.0)
+        self.max_failed_reads = max(1, settings.get("max_failed_reads", 5))
+        self.backoff_initial = settings.get("backoff_initial", 1.0)
+        self.backoff_max = settings.get("backoff_max", 60.0)
+        self.jitter = settings.get("jitter", 0.3)
+        self.state = CONNECTING
+        self.failed_reads = 0
+        self.failures = 0
+        self.last_frame_time = time.time()
+        self.stalls = 0
+        self.reconnects = 0
+        self.attempts = 0
+        # Called after every state change, e.g. to publish it to another process
+        self.on_change = on_change
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_change is not None:
+                self.on_change(self)
+
+    def frame_read(self):
+        self.set_state(LIVE)
+        self.failed_reads = 0
+        self.failures = 0
+        self.last_frame_time = time.time()
+
+    def read_failed(self):
+        # True once the stream should be closed and reconnected
+        self.failed_reads += 1
+        if (self.failed_reads < self.max_failed_reads
+                and time.time() - self.last_frame_time <= self.read_timeout):
+            return False
+        self.stalls += 1
+        self.set_state(STALLED)
+        return True
+
+    def next_delay(self):
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** self.failures)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reconnect(self, open_stream, wait):
+        # Returns the reopened stream, or None when wait(delay) reports a stop
+        while True:
+            self.set_state(BACKOFF)
+            if wait(self.next_delay()):
+                return None
+            self.failures += 1
+            self.attempts += 1
+            self.set_state(CONNECTING)
+            stream = open_stream()
+            if stream is not None:
+                self.reconnects += 1
+                self.failed_reads = 0
+                self.last_frame_time = time.time()
+                return stream
+
+    def current_state(self):
+        return effective_state(self.state, self.last_frame_time, time.time(), self.read_timeout)
@@ -0,0 +1,94 @@
+import time
+import queue
+from logger import start_log_listener
+from worker import run_worker
+
+class Supervisor:
+    def __init__(self, ctx, cfg, alarm, event_db_path, logger, stop_event):
+        self.ctx = ctx
+        self.cfg = cfg
+        self.alarm = alarm
+        self.event_db_path = event_db_path
+        self.logger = logger
+        self.stop_event = stop_event
+        self.log_queue = ctx.Queue()
+        self.events = ctx.Queue()
+        self.listener = None
+
+        num_workers = max(1, min(cfg["workers"], len(cfg["cameras"])))
+        self.shards = [cfg["cameras"][i::num_workers] for i in range(num_workers)]
+        self.processes = [None] * num_workers
+        self.started_at = [0.0] * num_workers
+        self.restart_at = [0.0] * num_workers
+        self.restarts = [0] * num_workers
+        self.max_backoff = cfg.get("worker_restart_max_backoff", 60)
+
+    def start_worker(self, worker_id):
+        process = self.ctx.Process(
+            target=run_worker,
+            args=(worker_id, len(self.shards), self.shards[worker_id], self.cfg, self.event_db_path,
+                  self.log_queue, self.events, self.stop_event),
+            name=f"camera-worker-{worker_id}",
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.time()
+
+    def run(self):
+        self.listener = start_log_listener(self.log_queue)
+        for worker_id in range(len(self.shards)):
+            self.start_worker(worker_id)
+        self.logger.info(f"Started {len(self.shards)} camera workers. Close any window or press Ctrl+C to quit.")
+
+        while not self.stop_event.is_set():
+            self.drain_events(timeout=0.5)
+            self.check_workers()
+        self.shutdown()
+
+    def drain_events(self, timeout):
+        try:
+            event = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            if event[0] == "alarm":
+                self.alarm.play_alarm(*event[1:])
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def check_workers(self):
+        now = time.time()
+        for worker_id, process in enumerate(self.processes):
+            if process is not None:
+                if process.is_alive() or self.stop_event.is_set():
+                    continue
+                # Back off exponentially on repeated crashes; a worker that ran
+                # for a while before dying starts over from a short delay
+                if now - self.started_at[worker_id] > self.max_backoff:
+                    self.restarts[worker_id] = 0
+                delay = min(self.max_backoff, 2 ** self.restarts[worker_id])
+                self.restarts[worker_id] += 1
+                self.restart_at[worker_id] = now + delay
+                self.processes[worker_id] = None
+                camera_ids = ", ".join(cam_cfg["id"] for cam_cfg in self.shards[worker_id])
+                self.logger.error(f"Worker {worker_id} ({camera_ids}) exited with code "
+                                  f"{process.exitcode}, restarting in {delay}s")
+            elif now >= self.restart_at[worker_id]:
+                self.start_worker(worker_id)
+
+    def shutdown(self):
+        self.stop_event.set()
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout=10)
+            if process.is_alive():
+                self.logger.warning(f"{process.name} did not stop, terminating")
+                process.terminate()
+                process.join()
+        self.drain_events(timeout=0)
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
@@ -0,0 +1,67 @@
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clip_recorder import ClipManager, ClipRecorder
+
+FRAME_BYTES = 10 * 1024
+
+def make_manager(tmp_path, cap_mb=1, pre_roll=4):
+    manager = ClipManager({"folder": str(tmp_path), "pre_roll": pre_roll, "memory_cap_mb": cap_mb},
+                          logging.getLogger("test_clip_recorder"))
+    recorders = [ClipRecorder(manager, f"CAM{i + 1}") for i in range(2)]
+    manager.recorders.extend(recorders)
+    return manager, recorders
+
+def unique_bytes(manager, clips):
+    # What is really held: every distinct frame in a pre-roll or a clip, once
+    frames = {id(jpeg): jpeg for r in manager.recorders for _, jpeg in r.ring}
+    frames.update((id(jpeg), jpeg) for clip in clips for _, jpeg in clip)
+    return sum(len(jpeg) for jpeg in frames.values())
+
+def fill(manager, recorder, start, count, clip=None):
+    for i in range(count):
+        jpeg = bytes(FRAME_BYTES)
+        if manager.store(recorder, start + i * 0.1, jpeg, recording=clip is not None):
+            clip.append((start + i * 0.1, jpeg))
+
+def test_clip_frames_shared_with_the_pre_roll_are_counted_once(tmp_path):
+    manager, (cam1, cam2) = make_manager(tmp_path)
+    fill(manager, cam1, 0, 40)
+    fill(manager, cam2, 0, 40)
+    assert manager.held_bytes == unique_bytes(manager, []) == 80 * FRAME_BYTES
+
+    clip = manager.start_clip(cam1)
+    assert manager.held_bytes == unique_bytes(manager, [clip]) == 80 * FRAME_BYTES
+
+    # 20 more frames: the clip keeps the aged-out pre-roll, 1000 KB in all
+    fill(manager, cam1, 4, 20, clip)
+    assert manager.held_bytes == unique_bytes(manager, [clip])
+    assert manager.clip_frames_dropped == 0
+    assert manager.evicted == 0
+    assert len(clip) == 60
+
+def test_over_the_cap_pre_rolls_go_first_then_clips_skip_frames(tmp_path):
+    manager, (cam1, cam2) = make_manager(tmp_path)
+    fill(manager, cam1, 0, 40)
+    fill(manager, cam2, 0, 40)
+    clip = manager.start_clip(cam1)
+    fill(manager, cam1, 4, 80, clip)
+
+    assert manager.held_bytes == unique_bytes(manager, [clip])
+    assert manager.held_bytes <= manager.memory_cap
+    assert manager.clip_frames_dropped > 0
+    # The other camera's older pre-roll made room before the clip lost any frame
+    assert not cam2.ring and manager.evicted >= 40
+
+    for _, jpeg in clip:
+        manager._drop(jpeg)
+    assert manager.held_bytes == unique_bytes(manager, [])
+
+def test_removing_a_recorder_releases_its_pre_roll(tmp_path):
+    manager, (cam1, cam2) = make_manager(tmp_path)
+    fill(manager, cam1, 0, 10)
+    fill(manager, cam2, 0, 10)
+    manager.remove(cam1)
+    assert manager.held_bytes == unique_bytes(manager, []) == 10 * FRAME_BYTES
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_scheduler import InferenceScheduler
+
+class CountingDetector:
+    def __init__(self):
+        self.batches = []
+
+    def detect_batch_scored(self, frames):
+        self.batches.append(len(frames))
+        return [[] for _ in frames]
+
+def run_cameras(scheduler, camera_ids, frames, interval):
+    def loop(detector):
+        for i in range(frames):
+            detector.detect_scored(i)
+            time.sleep(interval)
+    threads = [threading.Thread(target=loop, args=(scheduler.for_camera(cid),)) for cid in camera_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_idle_cameras_do_not_hold_back_the_batch():
+    stop = threading.Event()
+    detector = CountingDetector()
+    scheduler = InferenceScheduler(detector, logging.getLogger("test_inference_scheduler"), stop, max_wait=0.2)
+    # Four registered cameras, but only one of them has motion
+    for cid in ("CAM2", "CAM3", "CAM4"):
+        scheduler.for_camera(cid)
+    scheduler.start()
+    try:
+        start = time.perf_counter()
+        run_cameras(scheduler, ["CAM1"], 10, 0.01)
+        # Only the very first frames can wait out the deadline
+        assert time.perf_counter() - start < 10 * 0.01 + 2 * 0.2 + 0.3
+        assert scheduler.fill_wait.count == 10
+    finally:
+        stop.set()
+        scheduler.join()
+
+def test_active_cameras_are_batched_together():
+    stop = threading.Event()
+    detector = CountingDetector()
+    scheduler = InferenceScheduler(detector, logging.getLogger("test_inference_scheduler"), stop, max_wait=0.2)
+    scheduler.start()
+    try:
+        run_cameras(scheduler, ["CAM1", "CAM2", "CAM3"], 20, 0.005)
+        assert max(detector.batches) == 3
+        assert sum(detector.batches) == 60
+    finally:
+        stop.set()
+        scheduler.join()
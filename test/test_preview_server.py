@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import logging
+import threading
+import http.client
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preview_server import PreviewServer
+from frame_pool import FramePool
+
+class Publisher(threading.Thread):
+    # Stands in for a camera thread: publishes pooled frames while due
+    def __init__(self, channel):
+        super().__init__(daemon=True)
+        self.channel = channel
+        self.pool = FramePool(max_free=2)
+        self.running = True
+
+    def run(self):
+        i = 0
+        while self.running:
+            if self.channel.due:
+                buffer = self.pool.copy(np.full((120, 160, 3), i % 255, np.uint8))
+                self.channel.publish(buffer.array, [(10, 10, 50, 90, 0.9)], buffer=buffer)
+                buffer.release()
+                i += 1
+            time.sleep(0.01)
+
+def read_part(response):
+    # One multipart part: boundary, headers, JPEG body, trailing CRLF
+    assert response.readline() == b"--frame\r\n"
+    headers = {}
+    while True:
+        line = response.readline()
+        if line == b"\r\n":
+            break
+        name, value = line.decode().split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    assert headers["content-type"] == "image/jpeg"
+    body = response.read(int(headers["content-length"]))
+    assert response.read(2) == b"\r\n"
+    return body
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_mjpeg_stream_framing_and_disconnect():
+    server = PreviewServer("127.0.0.1", 0, logging.getLogger("test_preview_server"), max_fps=20)
+    channel = server.channel("CAM1")
+    server.start()
+    publisher = Publisher(channel)
+    publisher.start()
+    conn = http.client.HTTPConnection("127.0.0.1", server.httpd.server_address[1], timeout=5)
+    try:
+        conn.request("GET", "/camera/CAM1.mjpg")
+        response = conn.getresponse()
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "multipart/x-mixed-replace; boundary=frame"
+        for _ in range(3):
+            jpeg = read_part(response)
+            assert jpeg.startswith(b"\xff\xd8") and jpeg.endswith(b"\xff\xd9")
+        assert channel.clients == 1 and channel.buffer is not None
+
+        # Hanging up releases the client and the frame it was being served
+        response.close()
+        conn.close()
+        assert wait_for(lambda: channel.clients == 0, 5)
+        assert channel.frame is None and channel.buffer is None
+        assert not channel.due
+    finally:
+        publisher.running = False
+        publisher.join()
+        conn.close()
+        server.stop()
+
+def test_unknown_camera_is_404():
+    server = PreviewServer("127.0.0.1", 0, logging.getLogger("test_preview_server"))
+    server.channel("CAM1")
+    server.start()
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", server.httpd.server_address[1], timeout=5)
+        conn.request("GET", "/camera/NOPE.mjpg")
+        assert conn.getresponse().status == 404
+        conn.close()
+    finally:
+        server.stop()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from camera import Camera
+from camera_handler import CameraHandler
+from config_reload import load_config
+from stream_health import LIVE
+
+STREAM_CFG = {"read_timeout": 2, "max_failed_reads": 2, "backoff_initial": 0.2, "backoff_max": 1, "jitter": 0}
+
+class LoopbackStream:
+    # MJPEG over HTTP on 127.0.0.1 that can be killed (open connections are
+    # dropped too) and brought back on the same port, at another size if asked
+    def __init__(self, size=(240, 320)):
+        self.size = size
+        self.port = 0
+        self.server = None
+        self.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/"
+
+    def start(self):
+        stream = self
+        server_stopping = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                i = 0
+                while not server_stopping.is_set():
+                    frame = np.full(stream.size + (3,), (i * 5) % 255, np.uint8)
+                    ok, jpeg = cv2.imencode(".jpg", frame)
+                    try:
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+                                         % len(jpeg) + jpeg.tobytes() + b"\r\n")
+                    except OSError:
+                        return
+                    i += 1
+                    time.sleep(1 / 15)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.server.daemon_threads = True
+        self.server.stopping = server_stopping
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def kill(self):
+        if self.server is None:
+            return
+        self.server.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_camera_comes_back_after_the_stream_restarts():
+    stream = LoopbackStream()
+    camera = Camera(stream.url, stream_cfg=STREAM_CFG)
+    try:
+        assert wait_for(lambda: camera.frames_read > 5 and camera.stream_state == LIVE, 10)
+
+        stream.kill()
+        assert wait_for(lambda: camera.stream_state != LIVE, 10)
+        assert camera.stalls >= 1
+
+        stream.start()
+        frames_before = camera.frames_read
+        assert wait_for(lambda: camera.stream_state == LIVE and camera.frames_read > frames_before + 5, 20)
+        assert camera.reconnects >= 1
+        seq, frame, _ = camera.read_latest(timeout=2)
+        assert frame is not None and frame.shape == (240, 320, 3)
+    finally:
+        stream.kill()
+        camera.release()
+
+class NoDetector:
+    def detect_scored(self, frame):
+        return []
+
+    def detect_batch_scored(self, frames):
+        return [[] for _ in frames]
+
+class NoAlarm:
+    def play_alarm(self, camera_id=None):
+        pass
+
+def test_shared_memory_camera_is_reopened_at_a_new_resolution(tmp_path):
+    cfg = load_config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.yaml"))
+    cfg.update(headless=True, stats_interval=10 ** 9, capture_folder=str(tmp_path),
+               stream_watchdog=STREAM_CFG, shared_memory_capture={"enabled": True, "slots": 3})
+    cfg["motion"]["enabled"] = False
+    stream = LoopbackStream()
+    handler = CameraHandler({"id": "LOOP", "detect_url": stream.url}, cfg, NoDetector(), NoAlarm(), None,
+                            logging.getLogger("test_stream_watchdog"), threading.Event())
+    handler.start()
+    try:
+        assert wait_for(lambda: handler.frames_processed > 5, 15)
+
+        # The ring was sized for 320x240: the capture process gives up and the
+        # handler has to open a new camera for 640x480
+        stream.kill()
+        stream.size = (480, 640)
+        stream.start()
+        assert wait_for(lambda: handler.past_reconnects >= 1, 30)
+        processed = handler.frames_processed
+        assert wait_for(lambda: handler.frames_processed > processed + 5, 15)
+        assert handler.is_alive()
+        assert handler.camera.ring.shape == (480, 640, 3)
+    finally:
+        handler.stop()
+        stream.kill()
@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+
+def tile_rects(shape, tile_size=640, cols=0, rows=0, overlap=0.2):
+    # Overlapping (x1, y1, x2, y2) tiles covering the frame. Without cols/rows
+    # the grid is the smallest one whose tiles are at most tile_size pixels
+    # (the model's input size) with the requested overlap between neighbours.
+    h, w = shape[:2]
+    step = tile_size * (1 - overlap)
+    cols = cols or max(1, int(np.ceil((w - tile_size) / step)) + 1)
+    rows = rows or max(1, int(np.ceil((h - tile_size) / step)) + 1)
+    # Tile edges grow with the overlap so neighbours share overlap x tile width
+    tile_w = min(w, int(np.ceil(w / (cols - (cols - 1) * overlap))))
+    tile_h = min(h, int(np.ceil(h / (rows - (rows - 1) * overlap))))
+    xs = np.linspace(0, w - tile_w, cols).astype(int) if cols > 1 else [0]
+    ys = np.linspace(0, h - tile_h, rows).astype(int) if rows > 1 else [0]
+    return [(int(x), int(y), int(x) + tile_w, int(y) + tile_h) for y in ys for x in xs]
+
+def detect_tiles(detector, frame, rects):
+    # One batched predict over the tiles; boxes come back in frame coordinates
+    crops = [frame[y1:y2, x1:x2] for (x1, y1, x2, y2) in rects]
+    results = detector.detect_batch_scored(crops)
+    return [[(bx1 + x1, by1 + y1, bx2 + x1, by2 + y1, conf) for (bx1, by1, bx2, by2, conf) in boxes]
+            for (x1, y1, _, _), boxes in zip(rects, results)]
+
+def merge_boxes(boxes, iou_threshold=0.45, ios_threshold=0.6):
+    # Cross-tile NMS: a person on a tile seam is found twice, often as two
+    # partial boxes whose IoU is low, so boxes also merge when most of the
+    # smaller one lies inside the other. Merged boxes take the union extent.
+    merged = []
+    for box in sorted(boxes, key=lambda b: b[4], reverse=True):
+        for i, kept in enumerate(merged):
+            ix = max(0, min(box[2], kept[2]) - max(box[0], kept[0]))
+            iy = max(0, min(box[3], kept[3]) - max(box[1], kept[1]))
+            inter = ix * iy
+            if not inter:
+                continue
+            area = (box[2] - box[0]) * (box[3] - box[1])
+            kept_area = (kept[2] - kept[0]) * (kept[3] - kept[1])
+            if (inter / (area + kept_area - inter) >= iou_threshold
+                    or inter / max(1, min(area, kept_area)) >= ios_threshold):
+                merged[i] = (min(box[0], kept[0]), min(box[1], kept[1]),
+                             max(box[2], kept[2]), max(box[3], kept[3]), kept[4])
+                break
+        else:
+            merged.append(tuple(box))
+    return merged
+
+class TileGrid:
+    # Per-camera tiled inference on the full-resolution frame. Each tile keeps
+    # a thumbnail from its last inference with one cell per half of the
+    # smallest person (min_person pixels); a tile where no cell changed by more
+    # than change_threshold reuses its previous boxes instead of going to the
+    # model, up to max_age frames. Tiles that intersect a motion region are
+    # always re-inferred. The grid is rebuilt when the frame size changes.
+    def __init__(self, settings, tile_size=640):
+        self.shape = None
+        self.rects = []
+        self.thumbs = []
+        self.boxes = []
+        self.ages = []
+        self.tiles_run = 0
+        self.tiles_skipped = 0
+        self.configure(settings, tile_size)
+
+    def configure(self, settings, tile_size=640):
+        # Also used by a config reload: thresholds apply in place, a different
+        # grid or cell size rebuilds the grid on the next frame
+        geometry = (settings.get("tile_size", tile_size), settings.get("cols", 0), settings.get("rows", 0),
+                    settings.get("overlap", 0.2), settings.get("min_person", 32))
+        if self.shape is not None and geometry != (self.tile_size, self.cols, self.rows, self.overlap,
+                                                   self.min_person):
+            self.shape = None
+        self.tile_size, self.cols, self.rows, self.overlap, self.min_person = geometry
+        self.change_threshold = settings.get("change_threshold", 12.0)
+        self.max_age = settings.get("max_age", 10)
+        self.merge_iou = settings.get("merge_iou", 0.45)
+
+    def _reset(self, shape):
+        self.shape = shape[:2]
+        self.rects = tile_rects(shape, self.tile_size, self.cols, self.rows, self.overlap)
+        # A person covers at least one whole cell, so its arrival moves that
+        # cell's mean by its full contrast instead of being averaged away
+        cell = max(1, self.min_person // 2)
+        x1, y1, x2, y2 = self.rects[0]
+        self.thumb_size = (max(1, (x2 - x1) // cell), max(1, (y2 - y1) // cell))
+        self.thumbs = [None] * len(self.rects)
+        self.boxes = [[] for _ in self.rects]
+        self.ages = [0] * len(self.rects)
+
+    def detect(self, detector, frame, region=None):
+        # region: (x1, y1, x2, y2) of detected motion in frame coordinates, if any
+        if frame.shape[:2] != self.shape:
+            self._reset(frame.shape)
+        stale, thumbs = [], []
+        for i, (x1, y1, x2, y2) in enumerate(self.rects):
+            thumb = cv2.resize(frame[y1:y2, x1:x2], self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+            self.ages[i] += 1
+            previous = self.thumbs[i]
+            moving = (region is not None and region[0] < x2 and x1 < region[2]
+                      and region[1] < y2 and y1 < region[3])
+            if (previous is None or moving or self.ages[i] > self.max_age
+                    or np.abs(thumb - previous).max() > self.change_threshold):
+                stale.append(i)
+                thumbs.append(thumb)
+        if stale:
+            results = detect_tiles(detector, frame, [self.rects[i] for i in stale])
+            for i, thumb, boxes in zip(stale, thumbs, results):
+                self.thumbs[i] = thumb
+                self.boxes[i] = boxes
+                self.ages[i] = 0
+        self.tiles_run += len(stale)
+        self.tiles_skipped += len(self.rects) - len(stale)
+        return merge_boxes([box for boxes in self.boxes for box in boxes], self.merge_iou)
+
+    def skipped_ratio(self):
+        total = self.tiles_run + self.tiles_skipped
+        return self.tiles_skipped / total if total else 0.0
@@ -0,0 +1,139 @@
+import itertools
+import numpy as np
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+class Track:
+    # Constant-velocity Kalman filter over (cx, cy, w, h, vx, vy); time is in
+    # seconds so dropped or skipped frames don't distort the velocity
+    def __init__(self, track_id, box, now):
+        x1, y1, x2, y2, conf = box
+        w, h = x2 - x1, y2 - y1
+        self.id = track_id
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, w, h, 0.0, 0.0])
+        # Velocity is unknown at birth: allow about one box height per second
+        self.P = np.diag([(0.1 * h) ** 2] * 4 + [float(h) ** 2] * 2)
+        self.conf = conf
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+        self.last_time = now
+
+    def predict(self, now, accel):
+        dt = max(0.0, now - self.last_time)
+        self.last_time = now
+        if dt == 0:
+            return
+        F = np.eye(6)
+        F[0, 4] = F[1, 5] = dt
+        h = max(self.x[3], 1.0)
+        q_pos = (0.5 * accel * h * dt * dt) ** 2
+        q_size = (0.05 * h * dt) ** 2
+        q_vel = (accel * h * dt) ** 2
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + np.diag([q_pos, q_pos, q_size, q_size, q_vel, q_vel])
+
+    def update(self, box, noise):
+        x1, y1, x2, y2, conf = box
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        H = np.eye(4, 6)
+        R = np.eye(4) * (noise * max(z[3], 1.0)) ** 2
+        S = H @ self.P @ H.T + R
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - H @ self.x)
+        self.P = (np.eye(6) - K @ H) @ self.P
+        self.conf = conf
+        self.hits += 1
+        self.misses = 0
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    def uncertainty(self):
+        # Position standard deviation relative to the box height
+        return float(np.sqrt(self.P[0, 0] + self.P[1, 1])) / max(self.x[3], 1.0)
+
+class Tracker:
+    # Keeps person tracks between detections so inference can run only every
+    # detect_interval frames. Detection is requested sooner while a track is
+    # tentative or its predicted position has become too uncertain.
+    def __init__(self, settings, min_hits=2):
+        self.ids = itertools.count(1)
+        self.tracks = []
+        self.configure(settings, min_hits)
+        self.frames_since_detection = self.detect_interval
+
+    def configure(self, settings, min_hits=2):
+        # Also used by a config reload: live tracks are kept
+        self.detect_interval = max(1, settings.get("detect_interval", 4))
+        self.iou_threshold = settings.get("iou_threshold", 0.3)
+        self.min_hits = settings.get("min_hits", min_hits)
+        self.max_misses = settings.get("max_misses", 2)
+        self.max_uncertainty = settings.get("max_uncertainty", 0.5)
+        self.accel = settings.get("acceleration", 2.0)     # box heights per s^2
+        self.measurement_noise = settings.get("measurement_noise", 0.05)
+
+    def predict(self, now):
+        for track in self.tracks:
+            track.predict(now, self.accel)
+
+    def needs_detection(self):
+        if self.frames_since_detection + 1 >= self.detect_interval:
+            return True
+        return any(not t.confirmed or t.misses or t.uncertainty() > self.max_uncertainty for t in self.tracks)
+
+    def skip(self):
+        self.frames_since_detection += 1
+
+    def update(self, detections, now):
+        # Greedy IoU matching; returns the tracks confirmed by this update
+        self.frames_since_detection = 0
+        predicted = [t.box() for t in self.tracks]
+        pairs = sorted(
+            ((iou(predicted[ti], det), ti, di) for ti in range(len(self.tracks)) for di, det in enumerate(detections)),
+            reverse=True,
+        )
+        matched_tracks, matched_dets = set(), set()
+        for overlap, ti, di in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if ti in matched_tracks or di in matched_dets:
+                continue
+            self.tracks[ti].update(detections[di], self.measurement_noise)
+            matched_tracks.add(ti)
+            matched_dets.add(di)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for di, det in enumerate(detections):
+            if di not in matched_dets:
+                self.tracks.append(Track(next(self.ids), det, now))
+
+        confirmed = []
+        for track in self.tracks:
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                confirmed.append(track)
+        return confirmed
+
+    def boxes(self, frame_shape, tracks=None):
+        # Current (propagated) boxes of confirmed tracks as (x1, y1, x2, y2, conf)
+        height, width = frame_shape[:2]
+        out = []
+        for track in tracks if tracks is not None else self.tracks:
+            if not track.confirmed:
+                continue
+            x1, y1, x2, y2 = track.box()
+            x1, y1 = int(min(max(x1, 0), width)), int(min(max(y1, 0), height))
+            x2, y2 = int(min(max(x2, 0), width)), int(min(max(y2, 0), height))
+            if x2 > x1 and y2 > y1:
+                out.append((x1, y1, x2, y2, track.conf))
+        return out
@@ -0,0 +1,46 @@
+import sys
+import signal
+import threading
+from logger import setup_worker_logger
+from pipeline import build_detector, Pipeline
+
+class QueueAlarm:
+    # Alarms are played by the supervisor; workers only report them
+    def __init__(self, events):
+        self.events = events
+
+    def play_alarm(self, camera_id=None):
+        self.events.put(("alarm", camera_id))
+
+def run_worker(worker_id, num_workers, camera_configs, cfg, event_db_path, log_queue, events, stop_event):
+    # Ctrl+C goes to the whole process group; let the supervisor handle it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger = setup_worker_logger(log_queue)
+    camera_ids = ", ".join(cam_cfg["id"] for cam_cfg in camera_configs)
+    logger.info(f"Worker {worker_id} starting cameras: {camera_ids}")
+
+    detector = build_detector(cfg, logger)
+
+    # Cameras stop on a worker-local event so a crashed worker can shut down
+    # its own threads without stopping the other workers
+    local_stop = threading.Event()
+    pipeline = Pipeline(camera_configs, cfg, detector, QueueAlarm(events), event_db_path, logger, local_stop,
+                        worker_id=worker_id, num_workers=num_workers)
+    pipeline.start()
+
+    crashed = False
+    while not stop_event.wait(0.5):
+        if local_stop.is_set():
+            # A camera window was closed: stop everything, like the threaded mode
+            stop_event.set()
+            break
+        if not pipeline.all_alive():
+            logger.error(f"Worker {worker_id}: a camera thread died unexpectedly")
+            crashed = True
+            break
+
+    local_stop.set()
+    pipeline.join()
+    logger.info(f"Worker {worker_id} stopped")
+    if crashed:
+        sys.exit(1)